@@ -0,0 +1,44 @@
+"""
+Arranque en frío: precarga de dependencias pesadas en el master de gunicorn
+y perfil de arranque (tiempo de imports y tiempo hasta la primera respuesta).
+
+El tiempo hasta la primera respuesta lo registra MetricasMiddleware; ambos
+se exportan en /metrics como `librujula_arranque_segundos`.
+"""
+import importlib
+import time
+
+
+# Se importan en el master antes del fork para que los workers los compartan (copy-on-write)
+MODULOS_PESADOS = ('recomendaciones.views', 'aiohttp', 'requests', 'numpy')
+
+
+def calentar():
+    """
+    Importa las vistas y las dependencias pesadas y resuelve una petición
+    interna barata (/metrics) para dejar calientes middleware, vistas y renderers.
+    """
+    from django.db import connections
+    from django.test import Client
+
+    from recomendaciones.metricas import INICIO_PROCESO, fijar
+
+    tiempos = {}
+    for modulo in MODULOS_PESADOS:
+        inicio = time.perf_counter()
+        importlib.import_module(modulo)
+        tiempos[modulo] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    Client().get('/metrics')
+    tiempos['peticion_calentamiento'] = time.perf_counter() - inicio
+
+    # Las conexiones abiertas en el master no deben heredarse en los workers
+    connections.close_all()
+
+    for etapa, segundos in tiempos.items():
+        fijar('arranque_segundos', segundos, etapa=etapa)
+    fijar('arranque_segundos', time.time() - INICIO_PROCESO, etapa='hasta_calentado')
+
+    desglose = ', '.join(f'{etapa} {segundos * 1000:.0f}ms' for etapa, segundos in tiempos.items())
+    print(f"⏱️ Arranque: calentado en {time.time() - INICIO_PROCESO:.2f}s desde el inicio ({desglose})")
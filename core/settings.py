@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "recomendaciones.metricas.MetricasMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     'corsheaders.middleware.CorsMiddleware', 
@@ -107,6 +108,16 @@ else:
     
 
 
+# Django REST Framework
+# El renderer JSON registra el tiempo de serialización en las métricas
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "recomendaciones.renderers.JSONRendererMedido",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -165,4 +176,138 @@ CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOWED_ORIGINS = [
     # "http://localhost:5173",
     # "https://librujula.vercel.app" 
-]
\ No newline at end of file
+]
+
+# ====================================================================
+# APIS EXTERNAS
+# ====================================================================
+
+# API key opcional de Google Books (sube la cuota diaria); se lee del entorno
+GOOGLE_BOOKS_API_KEY = os.environ.get('GOOGLE_BOOKS_API_KEY')
+
+
+# ====================================================================
+# CACHE
+# ====================================================================
+
+# 'default': respuestas del upstream (LocMemCache por proceso, 300 entradas como máximo).
+# 'perfiles': perfiles de sesión (perfil.py) aparte, para que rotar `?sesion=` no desaloje
+# las respuestas cacheadas; cada perfil ocupa 128 bytes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'perfiles': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'perfiles',
+        'TIMEOUT': 1800,  # TTL 'usuario'
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('PERFILES_MAX_ENTRADAS', '5000'))},
+    },
+}
+
+
+# ====================================================================
+# INSTANTÁNEA DE CACHE
+# ====================================================================
+
+# Fichero donde se vuelca la cache caliente para sobrevivir a reinicios (sin ruta = desactivado)
+CACHE_SNAPSHOT_PATH = os.environ.get('CACHE_SNAPSHOT_PATH')
+CACHE_SNAPSHOT_INTERVALO = int(os.environ.get('CACHE_SNAPSHOT_INTERVALO', '300'))  # segundos
+CACHE_SNAPSHOT_MAX_ENTRADAS = 250  # LocMemCache guarda como máximo 300 entradas
+
+
+# ====================================================================
+# CO-OCURRENCIAS
+# ====================================================================
+
+# Directorio del log de consultas y del modelo item-item (sin ruta = desactivado).
+# El modelo se actualiza con `python manage.py construir_coocurrencias`.
+COOCURRENCIAS_DIR = os.environ.get('COOCURRENCIAS_DIR')
+
+
+# ====================================================================
+# CATÁLOGO
+# ====================================================================
+
+# Catálogo columnar de libros conocidos compartido por los workers con mmap (sin valor = desactivado)
+CATALOGO_DIR = os.environ.get('CATALOGO_DIR')
+# Cada cuánto se construye una versión nueva con las altas pendientes (segundos, 0 = nunca)
+CATALOGO_INTERVALO = int(os.environ.get('CATALOGO_INTERVALO', '300'))
+
+
+# ====================================================================
+# SERIES
+# ====================================================================
+
+# Índice persistente de series (SQLite): miembros y siguiente volumen sin consultar al upstream
+SERIES_SQLITE_PATH = os.environ.get('SERIES_SQLITE_PATH')
+
+
+# ====================================================================
+# CONTROL DE ADMISIÓN
+# ====================================================================
+
+# Degradar: las recomendaciones se sirven solo con cache y datos locales. Se cuentan las demás
+# peticiones en vuelo del proceso (la que se evalúa no), así que con N hilos de gunicorn el
+# máximo alcanzable es N-1: por defecto se degrada cuando todos los demás hilos están ocupados
+# (o hay peticiones esperando hilo).
+# Rechazar (503 + Retry-After): con ADMISION_RECHAZAR_EN_COLA peticiones aceptadas por el worker
+# esperando un hilo libre (por defecto, una tanda completa de hilos).
+ADMISION_DEGRADAR_EN_VUELO = int(os.environ.get(
+    'ADMISION_DEGRADAR_EN_VUELO', max(1, int(os.environ.get('GUNICORN_THREADS', '4')) - 1)
+))
+ADMISION_RECHAZAR_EN_COLA = int(os.environ.get(
+    'ADMISION_RECHAZAR_EN_COLA', os.environ.get('GUNICORN_THREADS', '4')
+))
+# Espera antes de llegar al worker según la cabecera X-Request-Start (segundos). Solo activar
+# detrás de un proxy que la fije en cada petición (fly.toml): si no, la envía el cliente.
+ADMISION_USAR_X_REQUEST_START = os.environ.get('ADMISION_USAR_X_REQUEST_START', '0') == '1'
+ADMISION_DEGRADAR_ESPERA = float(os.environ.get('ADMISION_DEGRADAR_ESPERA', '1.0'))
+ADMISION_RECHAZAR_ESPERA = float(os.environ.get('ADMISION_RECHAZAR_ESPERA', '5.0'))
+ADMISION_RETRY_AFTER = int(os.environ.get('ADMISION_RETRY_AFTER', '2'))
+
+
+# ====================================================================
+# TENDENCIAS
+# ====================================================================
+
+# Cada cuánto se precalienta la cache con los libros en tendencia (segundos, 0 = nunca)
+TENDENCIAS_PRECALENTAR_INTERVALO = int(os.environ.get('TENDENCIAS_PRECALENTAR_INTERVALO', '300'))
+
+
+# ====================================================================
+# PORTADAS
+# ====================================================================
+
+# URL pública del proxy de portadas (ej. https://<app>.fly.dev/api/portada). Sin valor, las
+# recomendaciones llevan las URLs originales de Google Books / Open Library.
+PORTADAS_PROXY_URL = os.environ.get('PORTADAS_PROXY_URL')
+# Cache en disco de las portadas y sus variantes (por defecto dentro del proyecto)
+PORTADAS_DIR = os.environ.get('PORTADAS_DIR')
+# Tamaño máximo de esa cache (bytes): cada PORTADAS_PODA_INTERVALO segundos se borra lo usado
+# hace más tiempo. Comparte el volumen /data con la instantánea, los modelos y las SQLite
+PORTADAS_MAX_BYTES = int(os.environ.get('PORTADAS_MAX_BYTES', str(512 * 1024 * 1024)))
+PORTADAS_PODA_INTERVALO = int(os.environ.get('PORTADAS_PODA_INTERVALO', '3600'))
+
+
+# ====================================================================
+# COLA DE ESCRITURA EN SEGUNDO PLANO
+# ====================================================================
+
+# Escrituras de cache, log de consultas y enriquecimiento fuera del camino de la petición
+# (0 = se ejecutan en línea, como antes)
+COLA_ESCRITURA = os.environ.get('COLA_ESCRITURA', '1') == '1'
+COLA_HILOS = int(os.environ.get('COLA_HILOS', '2'))
+# Diario SQLite de la cola: cada trabajo se guarda al encolarlo y se borra al terminarlo,
+# y al arrancar se reencola lo que dejaron workers apagados o caídos
+# (sin valor, lo pendiente solo está en memoria y se pierde si el worker cae)
+COLA_SQLITE_PATH = os.environ.get('COLA_SQLITE_PATH')
+
+
+
+# ====================================================================
+# MÉTRICAS
+# ====================================================================
+
+# Cabecera Server-Timing con el desglose por etapa (SERVER_TIMING=1 para activarla)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
\ No newline at end of file
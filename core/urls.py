@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include  
 
+from recomendaciones.metricas import vista_metricas
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('recomendaciones.urls')),
+    path('metrics', vista_metricas),
 ]
\ No newline at end of file
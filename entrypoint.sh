@@ -3,9 +3,29 @@
 # Salir inmediatamente si un comando falla (importante para migraciones)
 set -e
 
-echo "Running Django migrations..."
-python manage.py migrate
+# Instante de inicio para el perfil de arranque (tiempo hasta la primera respuesta)
+export LIBRUJULA_INICIO=$(date +%s.%N)
+
+# MIGRATE_ON_BOOT: "1" migra siempre, "0" nunca (las aplica el release_command de Fly),
+# "check" (por defecto) solo migra si hay migraciones pendientes
+case "${MIGRATE_ON_BOOT:-check}" in
+    1)
+        echo "Running Django migrations..."
+        python manage.py migrate --noinput
+        ;;
+    0)
+        echo "Skipping Django migrations (applied at release)."
+        ;;
+    *)
+        if python manage.py migrate --check > /dev/null 2>&1; then
+            echo "Schema up to date, skipping migrations."
+        else
+            echo "Running Django migrations..."
+            python manage.py migrate --noinput
+        fi
+        ;;
+esac
 
 echo "Starting Gunicorn server..."
 # exec reemplaza el proceso actual con Gunicorn, asegurando que sea el proceso principal del contenedor.
-exec python -m gunicorn core.wsgi:application --bind 0.0.0.0:8080 --workers 1 --threads 1
\ No newline at end of file
+exec python -m gunicorn core.wsgi:application -c gunicorn.conf.py
\ No newline at end of file
@@ -4,6 +4,16 @@ import './App.css'
 // 💥 FIX CRUCIAL: Capturamos la variable de entorno definida en Vercel
 const API_BASE_URL = import.meta.env.VITE_API_URL;
 
+// Identificador anónimo de sesión: el backend personaliza las recomendaciones con las consultas anteriores
+const obtenerSesion = () => {
+  let sesion = localStorage.getItem('librujula_sesion');
+  if (!sesion) {
+    sesion = crypto.randomUUID();
+    localStorage.setItem('librujula_sesion', sesion);
+  }
+  return sesion;
+}
+
 function App() {
   const [libroInput, setLibroInput] = useState('')
   const [recomendaciones, setRecomendaciones] = useState([])
@@ -32,7 +42,7 @@ function App() {
 
     try {
       // 💥 CORRECCIÓN: Usamos la variable de entorno para construir la URL completa de Fly.io
-      const fullUrl = `${API_BASE_URL}/api/recomendar/?libro=${encodeURIComponent(libroInput)}`;
+      const fullUrl = `${API_BASE_URL}/api/recomendar/?libro=${encodeURIComponent(libroInput)}&sesion=${obtenerSesion()}`;
       
       const respuesta = await fetch(fullUrl);
       const datos = await respuesta.json();
@@ -0,0 +1,63 @@
+"""
+Configuración de gunicorn optimizada para arranques en frío (auto_stop_machines).
+
+Con preload_app la aplicación se carga y se calienta una sola vez en el master;
+los workers se crean por fork y heredan módulos, URLconf y la cache restaurada
+desde la instantánea (recomendaciones/instantanea.py).
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('GUNICORN_PORT', '8080')}"
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
+# Varios hilos: mientras una petición espera al upstream otras se atienden, y el control
+# de admisión (recomendaciones/admision.py) ve cuántas hay en vuelo para degradar o descartar
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+preload_app = True
+
+
+def when_ready(server):
+    # Con preload_app la aplicación ya está cargada aquí y los workers aún no existen
+    from core.arranque import calentar
+    from recomendaciones.instantanea import restaurar
+
+    restauradas = restaurar()
+    if restauradas:
+        print(f"♻️ Cache restaurada desde la instantánea: {restauradas} entradas")
+    calentar()
+
+
+def post_fork(server, worker):
+    from recomendaciones import admision, cola
+    from recomendaciones.catalogo import iniciar_construccion_periodica
+    from recomendaciones.instantanea import iniciar_volcado_periodico
+    from recomendaciones.portadas import iniciar_poda_periodica
+    from recomendaciones.tendencias import iniciar_precalentamiento_periodico
+
+    # El control de admisión mira cuántas peticiones esperan un hilo libre en este worker
+    admision.registrar_worker(worker)
+    restaurados = cola.restaurar()
+    if restaurados:
+        print(f"♻️ Cola: {restaurados} trabajos pendientes reencolados")
+    iniciar_volcado_periodico()
+    iniciar_precalentamiento_periodico()
+    iniciar_construccion_periodica()
+    iniciar_poda_periodica()
+
+
+def worker_exit(server, worker):
+    # Último volcado al apagar (auto-stop, despliegue o reinicio)
+    from recomendaciones import cola
+    from recomendaciones.instantanea import volcar
+
+    # Primero la cola: sus escrituras de cache deben entrar en la instantánea
+    try:
+        pendientes = cola.detener()
+        if pendientes:
+            print(f"💾 Cola: {pendientes} trabajos pendientes quedan en SQLite para el próximo arranque")
+    except Exception as e:
+        print(f"⚠️ Error deteniendo la cola de escritura: {e}")
+
+    try:
+        volcar()
+    except Exception as e:
+        print(f"⚠️ Error volcando la instantánea de cache: {e}")
@@ -0,0 +1,152 @@
+"""
+Control de admisión ante picos de tráfico.
+
+Con timeouts de upstream de 10 s, una ráfaga se convierte en una cola en la
+que todas las peticiones acaban caducando. Antes de ejecutar una vista se
+mira la carga del proceso:
+
+- Otras peticiones en vuelo en el proceso (con N hilos de gunicorn, como
+  mucho N-1: la que se evalúa aún no cuenta).
+- Peticiones en cola: las que el worker gthread de gunicorn ya aceptó y
+  esperan un hilo libre (`registrar_worker`, desde post_fork). Fuera de
+  gunicorn es siempre 0.
+- Espera en cola: solo con ADMISION_USAR_X_REQUEST_START, lo que indica la
+  cabecera `X-Request-Start` (t=<epoch> en s, ms o µs) que pone el proxy.
+  Desactivado por defecto: sin un proxy que la fije, cualquier cliente
+  podría enviarla.
+
+Con todos los demás hilos ocupados (ADMISION_DEGRADAR_EN_VUELO), peticiones
+en cola o esperas de más de ADMISION_DEGRADAR_ESPERA la petición se sirve en
+modo degradado (`modo_degradado()`: solo cache y datos locales, sin fallback
+ni fan-out de Open Library; la vista lo marca en la respuesta). Con
+ADMISION_RECHAZAR_EN_COLA peticiones en cola o esperas de más de
+ADMISION_RECHAZAR_ESPERA se descarta con 503 + Retry-After, así el servicio
+sigue respondiendo en vez de hundirse.
+"""
+import functools
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.response import Response
+
+from .metricas import fijar, incrementar
+
+
+NORMAL = 'normal'
+DEGRADADO = 'degradado'
+RECHAZADO = 'rechazado'
+
+_lock = threading.Lock()
+_en_vuelo = 0
+_degradado = ContextVar('admision_degradado', default=False)
+_worker = None  # Worker de gunicorn de este proceso (registrar_worker)
+
+
+def _umbral(nombre, por_defecto):
+    return getattr(settings, nombre, por_defecto)
+
+
+def modo_degradado():
+    """
+    True si la petición en curso se está sirviendo en modo degradado.
+    """
+    return _degradado.get()
+
+
+def registrar_worker(worker):
+    """
+    Anota el worker gthread de gunicorn: en la cola de su pool de hilos esperan
+    las peticiones aceptadas mientras todos los hilos están ocupados. Con otro
+    tipo de worker la cola cuenta siempre 0.
+    """
+    global _worker
+    _worker = worker
+
+
+def peticiones_en_cola():
+    """
+    Peticiones aceptadas por el worker que aún esperan un hilo libre (0 fuera de gunicorn).
+    """
+    # El pool se crea al iniciar el worker, después de post_fork: se busca en cada llamada
+    cola = getattr(getattr(_worker, 'tpool', None), '_work_queue', None)
+    if cola is None:
+        return 0
+    return cola.qsize()
+
+
+def espera_en_cola(request):
+    """
+    Segundos que la petición esperó antes de llegar a la vista (0 si no se confía
+    en `X-Request-Start` o el proxy no la envía).
+    """
+    if not _umbral('ADMISION_USAR_X_REQUEST_START', False):
+        return 0.0
+
+    cabecera = request.META.get('HTTP_X_REQUEST_START', '')
+    valor = cabecera[2:] if cabecera.startswith('t=') else cabecera
+    try:
+        inicio = float(valor)
+    except ValueError:
+        return 0.0
+
+    # Se admite epoch en segundos, milisegundos o microsegundos
+    while inicio > 1e11:
+        inicio /= 1000
+    return max(0.0, time.time() - inicio)
+
+
+def evaluar(en_vuelo, en_cola, espera):
+    if (en_cola >= _umbral('ADMISION_RECHAZAR_EN_COLA', 4)
+            or espera >= _umbral('ADMISION_RECHAZAR_ESPERA', 5.0)):
+        return RECHAZADO
+    if (en_vuelo >= _umbral('ADMISION_DEGRADAR_EN_VUELO', 3) or en_cola > 0
+            or espera >= _umbral('ADMISION_DEGRADAR_ESPERA', 1.0)):
+        return DEGRADADO
+    return NORMAL
+
+
+def respuesta_saturado():
+    """
+    503 con Retry-After cuando el servicio descarta la petición por carga.
+    """
+    return Response(
+        {"error": "El servicio está saturado. Inténtalo de nuevo en unos segundos."},
+        status=503,
+        headers={"Retry-After": str(max(1, int(_umbral('ADMISION_RETRY_AFTER', 2))))}
+    )
+
+
+def controlar_admision(permitir_degradado=True):
+    """
+    Decorador de vista (debajo de @api_view). Sin `permitir_degradado`, lo que
+    se serviría degradado se rechaza (vistas sin versión barata, ej. el lote).
+    """
+    def decorador(vista):
+        @functools.wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            global _en_vuelo
+
+            with _lock:
+                decision = evaluar(_en_vuelo, peticiones_en_cola(), espera_en_cola(request))
+                if decision == DEGRADADO and not permitir_degradado:
+                    decision = RECHAZADO
+                if decision != RECHAZADO:
+                    _en_vuelo += 1
+                    fijar('admision_en_vuelo', _en_vuelo)
+            incrementar('admision_total', vista=vista.__name__, decision=decision)
+
+            if decision == RECHAZADO:
+                return respuesta_saturado()
+
+            token = _degradado.set(decision == DEGRADADO)
+            try:
+                return vista(request, *args, **kwargs)
+            finally:
+                _degradado.reset(token)
+                with _lock:
+                    _en_vuelo -= 1
+                    fijar('admision_en_vuelo', _en_vuelo)
+        return envoltura
+    return decorador
@@ -0,0 +1,54 @@
+"""
+Medición de throughput, latencia (p50/p99) y memoria pico de una función.
+"""
+import gc
+import time
+import tracemalloc
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, int(round(p / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+
+def medir_funcion(fn, iteraciones, preparar=None, calentamiento=2):
+    """
+    Ejecuta `fn` `iteraciones` veces (tras `calentamiento` ejecuciones descartadas).
+    `preparar` se llama antes de cada ejecución y queda fuera del tiempo medido.
+    La memoria pico se mide en una ejecución aparte con tracemalloc para no distorsionar los tiempos.
+    """
+    for _ in range(calentamiento):
+        if preparar:
+            preparar()
+        fn()
+
+    tiempos = []
+    gc.collect()
+    for _ in range(iteraciones):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+
+    if preparar:
+        preparar()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    tiempos.sort()
+    total = sum(tiempos)
+    return {
+        'iteraciones': iteraciones,
+        'ops_por_segundo': iteraciones / total if total else 0.0,
+        'p50_ms': percentil(tiempos, 50) * 1000,
+        'p99_ms': percentil(tiempos, 99) * 1000,
+        'memoria_pico_kb': pico / 1024,
+    }
@@ -0,0 +1,223 @@
+"""
+Transporte HTTP falso que reproduce respuestas grabadas de Google Books y
+Open Library, tanto para `requests.get` como para `aiohttp.ClientSession`.
+Permite medir el pipeline completo sin salir a internet.
+"""
+import asyncio
+import copy
+import json
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+import requests
+
+
+GRABACIONES = Path(__file__).resolve().parent / 'grabaciones'
+
+GRABACION_GOOGLE_BUSQUEDA = 'google_busqueda'
+GRABACION_GOOGLE_VOLUMEN = 'google_volumen'
+GRABACION_OPEN_LIBRARY = 'openlibrary_busqueda'
+GRABACION_OPEN_LIBRARY_OBRA = 'openlibrary_obra'
+GRABACION_OPEN_LIBRARY_RATINGS = 'openlibrary_ratings'
+
+_RUTA_VOLUMEN = re.compile(r'/books/v1/volumes/[^/?]+$')
+_RUTA_OBRA = re.compile(r'/works/[^/]+\.json$')
+_RUTA_RATINGS = re.compile(r'/works/[^/]+/ratings\.json$')
+
+
+def cargar_grabacion(nombre):
+    with open(GRABACIONES / f'{nombre}.json', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def escalar_google(data, factor):
+    """
+    Multiplica los `items` de una búsqueda de Google Books por `factor`
+    (copias con ID y título distintos, como ediciones diferentes).
+    """
+    if factor <= 1:
+        return data
+    items = []
+    for copia in range(factor):
+        for item in data['items']:
+            nuevo = copy.deepcopy(item)
+            if copia:
+                nuevo['id'] = f"{item['id']}{copia:03d}"
+                nuevo['volumeInfo']['title'] = f"{item['volumeInfo']['title']} (ed. {copia})"
+            items.append(nuevo)
+    return {**data, 'items': items}
+
+
+def escalar_open_library(data, factor):
+    if factor <= 1:
+        return data
+    docs = []
+    for copia in range(factor):
+        for doc in data['docs']:
+            nuevo = copy.deepcopy(doc)
+            if copia:
+                nuevo['key'] = f"{doc['key']}{copia:03d}"
+                nuevo['title'] = f"{doc['title']} (ed. {copia})"
+            docs.append(nuevo)
+    return {**data, 'docs': docs}
+
+
+class GrabacionesEscaladas:
+    """
+    Payloads grabados, ya escalados y serializados una sola vez.
+    """
+
+    def __init__(self, escala=1):
+        self.payloads = {
+            GRABACION_GOOGLE_BUSQUEDA: escalar_google(cargar_grabacion(GRABACION_GOOGLE_BUSQUEDA), escala),
+            GRABACION_GOOGLE_VOLUMEN: cargar_grabacion(GRABACION_GOOGLE_VOLUMEN),
+            GRABACION_OPEN_LIBRARY: escalar_open_library(cargar_grabacion(GRABACION_OPEN_LIBRARY), escala),
+            GRABACION_OPEN_LIBRARY_OBRA: cargar_grabacion(GRABACION_OPEN_LIBRARY_OBRA),
+            GRABACION_OPEN_LIBRARY_RATINGS: cargar_grabacion(GRABACION_OPEN_LIBRARY_RATINGS),
+        }
+        self.cuerpos = {
+            nombre: json.dumps(data, ensure_ascii=False).encode('utf-8')
+            for nombre, data in self.payloads.items()
+        }
+
+    def para_url(self, url):
+        if _RUTA_RATINGS.search(url):
+            return GRABACION_OPEN_LIBRARY_RATINGS
+        if _RUTA_OBRA.search(url):
+            return GRABACION_OPEN_LIBRARY_OBRA
+        if 'openlibrary.org' in url:
+            return GRABACION_OPEN_LIBRARY
+        if _RUTA_VOLUMEN.search(url):
+            return GRABACION_GOOGLE_VOLUMEN
+        return GRABACION_GOOGLE_BUSQUEDA
+
+
+class RespuestaGrabada:
+    """
+    Imita lo que el pipeline usa de `requests.Response` y de `aiohttp.ClientResponse`.
+    El JSON se decodifica en cada llamada, como haría la respuesta real.
+    """
+
+    def __init__(self, cuerpo, latencia=0.0, status=200):
+        self.content = cuerpo
+        self.status = self.status_code = status
+        self.headers = {'Content-Type': 'application/json; charset=UTF-8'}
+        self._latencia = latencia
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} (grabación)')
+
+    def json(self, **kwargs):
+        return json.loads(self.content)
+
+    # --- interfaz aiohttp ---
+
+    async def __aenter__(self):
+        if self._latencia:
+            await asyncio.sleep(self._latencia)
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def read(self):
+        return self.content
+
+    async def text(self, **kwargs):
+        return self.content.decode('utf-8')
+
+
+class _ClientSessionGrabada:
+
+    def __init__(self, grabaciones, latencia, contador):
+        self._grabaciones = grabaciones
+        self._latencia = latencia
+        self._contador = contador
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def close(self):
+        pass
+
+    def get(self, url, params=None, **kwargs):
+        self._contador['async'] += 1
+        nombre = self._grabaciones.para_url(url)
+        respuesta = RespuestaGrabada(self._grabaciones.cuerpos[nombre], self._latencia)
+
+        async def _json(**kw):
+            return json.loads(respuesta.content)
+
+        respuesta.json = _json
+        return respuesta
+
+
+@contextmanager
+def transporte_grabado(escala=1, latencia=0.0):
+    """
+    Sustituye `requests.get` y `aiohttp.ClientSession` por el transporte grabado.
+    Produce un dict con el número de peticiones síncronas/asíncronas servidas.
+    """
+    grabaciones = GrabacionesEscaladas(escala)
+    contador = {'sync': 0, 'async': 0}
+
+    def _get(url, params=None, timeout=None, **kwargs):
+        contador['sync'] += 1
+        if latencia:
+            time.sleep(latencia)
+        return RespuestaGrabada(grabaciones.cuerpos[grabaciones.para_url(url)])
+
+    def _session(*args, **kwargs):
+        return _ClientSessionGrabada(grabaciones, latencia, contador)
+
+    with mock.patch('requests.get', _get), mock.patch('aiohttp.ClientSession', _session):
+        yield contador
+
+
+def grabar(titulo, timeout=15):
+    """
+    Graba respuestas reales para `titulo` (requiere red) y sobrescribe las grabaciones.
+    """
+    busqueda = requests.get(
+        'https://www.googleapis.com/books/v1/volumes',
+        params={'q': titulo, 'maxResults': 40, 'langRestrict': 'es'}, timeout=timeout
+    )
+    busqueda.raise_for_status()
+    data = busqueda.json()
+    if not data.get('items'):
+        raise ValueError(f"Google Books no devolvió resultados para {titulo!r}")
+
+    volumen = requests.get(
+        f"https://www.googleapis.com/books/v1/volumes/{data['items'][0]['id']}", timeout=timeout
+    )
+    volumen.raise_for_status()
+
+    autores = data['items'][0]['volumeInfo'].get('authors') or [titulo]
+    open_library = requests.get(
+        'https://openlibrary.org/search.json',
+        params={'q': f'author:"{autores[0]}"', 'limit': 25, 'language': 'spa'}, timeout=timeout
+    )
+    open_library.raise_for_status()
+    docs = open_library.json().get('docs') or [{}]
+
+    grabaciones = [
+        (GRABACION_GOOGLE_BUSQUEDA, data),
+        (GRABACION_GOOGLE_VOLUMEN, volumen.json()),
+        (GRABACION_OPEN_LIBRARY, open_library.json()),
+    ]
+    if docs[0].get('key'):
+        for nombre, sufijo in ((GRABACION_OPEN_LIBRARY_OBRA, '.json'), (GRABACION_OPEN_LIBRARY_RATINGS, '/ratings.json')):
+            resp = requests.get(f"https://openlibrary.org{docs[0]['key']}{sufijo}", timeout=timeout)
+            resp.raise_for_status()
+            grabaciones.append((nombre, resp.json()))
+
+    for nombre, contenido in grabaciones:
+        with open(GRABACIONES / f'{nombre}.json', 'w', encoding='utf-8') as f:
+            json.dump(contenido, f, ensure_ascii=False, indent=1)
@@ -0,0 +1,77 @@
+"""
+Registro compacto de un libro candidato.
+
+Se crea una sola vez al recibir los datos del upstream (views.normalizar_google /
+views.normalizar_open_library), viaja por scoring, enriquecimiento y diversidad
+sin copiarse, y se serializa directamente en la respuesta con `a_respuesta()`
+(renderers.JSONRendererMedido y json_rapido.dumps lo reconocen).
+
+Con __slots__ cada candidato ocupa una fracción de lo que ocupan el dict de
+Google Books anidado y el dict de respuesta que se construía a partir de él.
+"""
+
+LONGITUD_DESCRIPCION = 150  # Caracteres de la descripción en la respuesta
+
+
+class Candidato:
+
+    __slots__ = (
+        # Datos del libro
+        'id', 'titulo', 'autores', 'categorias', 'descripcion', 'fecha', 'idioma',
+        'rating', 'num_ratings', 'imagen',
+        # Campos precalculados al crearlo (scoring, filtros y diversidad)
+        'autor', 'titulo_norm', 'categorias_min', 'serie_norm', 'anio', 'decada',
+        # IDs de las otras ediciones fusionadas en este candidato (duplicados.py)
+        'alias',
+        # Ya se le buscaron descripción y ratings en Open Library (views.aplicar_enriquecimiento)
+        'enriquecido',
+        # Score interno (nunca se serializa)
+        'score',
+    )
+
+    def __init__(self, id, titulo, autores, categorias, descripcion, fecha, idioma, rating, num_ratings, imagen,
+                 titulo_norm, serie_norm):
+        self.id = id
+        self.titulo = titulo
+        self.autores = autores
+        self.categorias = categorias
+        self.descripcion = descripcion
+        self.fecha = fecha
+        self.idioma = idioma
+        self.rating = rating
+        self.num_ratings = num_ratings
+        self.imagen = imagen
+
+        self.autor = autores[0] if autores else 'Autor desconocido'
+        self.titulo_norm = titulo_norm
+        self.categorias_min = tuple(categoria.lower() for categoria in categorias)
+        self.serie_norm = serie_norm
+        anio = fecha[:4]
+        self.anio = int(anio) if anio.isdigit() else None
+        self.decada = (self.anio // 10) * 10 if self.anio else None
+        self.alias = ()
+        self.enriquecido = False
+        self.score = 0.0
+
+    def __repr__(self):
+        return f"<Candidato {self.id} {self.titulo!r} score={self.score:.1f}>"
+
+    def a_respuesta(self):
+        """
+        Formato del candidato en la respuesta de la API.
+        """
+        descripcion = self.descripcion or 'Sin descripción disponible'
+        if len(descripcion) > LONGITUD_DESCRIPCION:
+            descripcion = descripcion[:LONGITUD_DESCRIPCION - 3] + "..."
+
+        return {
+            "titulo": self.titulo,
+            "autor": self.autor,
+            "descripcion": descripcion,
+            "imagen": self.imagen,
+            "puntuacion": self.rating,
+            "num_ratings": self.num_ratings,
+            "año_publicacion": self.fecha,
+            "categorias": list(self.categorias),
+            "id": self.id,
+        }
@@ -0,0 +1,343 @@
+"""
+Catálogo de libros conocidos en columnas de NumPy abiertas con mmap.
+
+Todos los workers abren los mismos ficheros de solo lectura, así que el
+catálogo ocupa memoria una sola vez (la cache de páginas del sistema) y
+consultarlo no deserializa nada:
+
+    ids.npy           IDs de volumen (bytes de ancho fijo, ordenados: búsqueda binaria)
+    titulos.npy       títulos normalizados concatenados (UTF-8) + titulos_idx.npy (offsets)
+    autores.npy       ID del autor principal (hash de 64 bits del nombre normalizado)
+    categorias.npy    bitset de 64 bits de las categorías (feature hashing)
+    anios.npy         año de publicación (0 = desconocido)
+    ratings.npy       rating medio
+    num_ratings.npy   número de ratings
+
+1. Alta: tras puntuar (y enriquecer) los candidatos, los que traen datos nuevos
+   se encolan (cola.py, coalescidos por ID) y se añaden a `pendientes.jsonl`.
+2. Construcción: un hilo por worker (solo uno construye a la vez, con flock)
+   fusiona lo pendiente en una versión nueva, la publica y vacía el log si ya
+   no queda nada sin fusionar (versiones.py, como coocurrencias.py).
+3. Servicio: `completar()` rellena en bloque los ratings y el año que les
+   faltan a los candidatos (ej. los de Open Library ya enriquecidos una vez).
+
+Directorio: settings.CATALOGO_DIR (None = desactivado).
+"""
+import hashlib
+import json
+import os
+import zlib
+
+from django.conf import settings
+
+from .cola import encolar, manejador
+from .metricas import incrementar
+from .versiones import (
+    VERSIONES_CONSERVADAS, Recargable, anotar_en_log, cerrojo, compactar_log, iniciar_hilo_periodico,
+    leer_version, nueva_version, offset_vigente, podar_versiones, publicar_version,
+)
+
+
+ANCHO_ID = 40  # Bytes de cada ID (el máximo que acepta VOLUME_ID_RE)
+
+PENDIENTES = 'pendientes.jsonl'
+CERROJO = 'construir.lock'
+
+COLUMNAS = ('ids', 'titulos_idx', 'titulos', 'autores', 'categorias', 'anios', 'ratings', 'num_ratings')
+
+
+def _directorio():
+    return getattr(settings, 'CATALOGO_DIR', None)
+
+
+def id_autor(autor):
+    """
+    ID estable (entre procesos y versiones) del autor: hash de 64 bits del nombre normalizado.
+    """
+    if not autor:
+        return 0
+    resumen = hashlib.blake2b(autor.strip().lower().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(resumen, 'little')
+
+
+def bits_categorias(categorias):
+    bits = 0
+    for categoria in categorias:
+        bits |= 1 << (zlib.crc32(categoria.encode('utf-8')) % 64)
+    return bits
+
+
+# ============================================
+# ALTA DE LIBROS
+# ============================================
+
+def anotar(candidatos):
+    """
+    Encola el alta (o actualización) de los candidatos que el catálogo no tiene
+    o de los que ahora se sabe más (ratings o año).
+    """
+    directorio = _directorio()
+    if not directorio or not candidatos:
+        return 0
+
+    catalogo = obtener_catalogo()
+    filas = catalogo.filas([c.id for c in candidatos]) if catalogo is not None else [-1] * len(candidatos)
+
+    anotados = 0
+    for candidato, fila in zip(candidatos, filas):
+        if not candidato.id or not candidato.titulo or len(candidato.id.encode('utf-8')) > ANCHO_ID:
+            continue
+        if fila >= 0 and (
+            int(catalogo.num_ratings[fila]) >= (candidato.num_ratings or 0)
+            and (int(catalogo.anios[fila]) or None) == candidato.anio
+        ):
+            continue
+
+        registro = [
+            candidato.id, candidato.titulo_norm, candidato.autor, list(candidato.categorias_min),
+            candidato.anio or 0, float(candidato.rating or 0), int(candidato.num_ratings or 0),
+        ]
+        encolar('catalogo', candidato.id, (directorio, registro))
+        anotados += 1
+    return anotados
+
+
+@manejador('catalogo')
+def _escribir_pendientes(items):
+    por_directorio = {}
+    for _, (directorio, registro) in items:
+        por_directorio.setdefault(directorio, []).append(json.dumps(registro, ensure_ascii=False))
+
+    for directorio, lineas in por_directorio.items():
+        try:
+            anotar_en_log(os.path.join(directorio, PENDIENTES), lineas)
+        except OSError as e:
+            print(f"⚠️ No se pudieron anotar {len(lineas)} libros en el catálogo: {e}")
+
+
+# ============================================
+# CONSTRUCCIÓN
+# ============================================
+
+def _cargar_registros(ruta_version):
+    """
+    {id: [titulo_norm, id_autor, bits_categorias, año, rating, num_ratings]} y offset de la versión.
+    """
+    if not ruta_version:
+        return {}, 0
+
+    catalogo = Catalogo(ruta_version)
+    with open(os.path.join(ruta_version, 'estado.json'), encoding='utf-8') as f:
+        estado = json.load(f)
+
+    registros = {}
+    for fila in range(len(catalogo)):
+        registros[catalogo.ids[fila].decode('utf-8')] = [
+            catalogo.titulo(fila), int(catalogo.autores[fila]), int(catalogo.categorias[fila]),
+            int(catalogo.anios[fila]), float(catalogo.ratings[fila]), int(catalogo.num_ratings[fila]),
+        ]
+    return registros, estado['offset']
+
+
+def _fusionar_pendientes(ruta_log, registros, offset):
+    """
+    Aplica las altas nuevas del log (desde `offset`). Un dato vacío no pisa uno conocido.
+    Retorna el offset nuevo.
+    """
+    if not os.path.exists(ruta_log):
+        return offset
+    offset = offset_vigente(ruta_log, offset)
+
+    with open(ruta_log, 'rb') as f:
+        f.seek(offset)
+        for linea in f:
+            if not linea.endswith(b'\n'):
+                # Línea a medio escribir: se procesará en la siguiente construcción
+                break
+            offset += len(linea)
+            try:
+                volume_id, titulo_norm, autor, categorias, anio, rating, num_ratings = json.loads(linea)
+            except ValueError:
+                continue
+
+            actual = registros.get(volume_id)
+            nuevo = [titulo_norm or '', id_autor(autor), bits_categorias(categorias), anio, rating, num_ratings]
+            if actual is not None:
+                if not num_ratings:
+                    nuevo[4], nuevo[5] = actual[4], actual[5]
+                for i in (0, 1, 2, 3):
+                    nuevo[i] = nuevo[i] or actual[i]
+            registros[volume_id] = nuevo
+    return offset
+
+
+def _escribir_version(ruta, registros, offset):
+    import numpy as np
+
+    ids = sorted(registros)
+    filas = [registros[volume_id] for volume_id in ids]
+    titulos = [fila[0].encode('utf-8') for fila in filas]
+
+    titulos_idx = np.zeros(len(titulos) + 1, dtype=np.int64)
+    np.cumsum([len(titulo) for titulo in titulos], out=titulos_idx[1:])
+
+    columnas = {
+        'ids': np.array([volume_id.encode('utf-8') for volume_id in ids], dtype=f'S{ANCHO_ID}'),
+        'titulos_idx': titulos_idx,
+        'titulos': np.frombuffer(b''.join(titulos), dtype=np.uint8),
+        'autores': np.array([fila[1] for fila in filas], dtype=np.uint64),
+        'categorias': np.array([fila[2] for fila in filas], dtype=np.uint64),
+        'anios': np.array([fila[3] for fila in filas], dtype=np.int16),
+        'ratings': np.array([fila[4] for fila in filas], dtype=np.float32),
+        'num_ratings': np.array([fila[5] for fila in filas], dtype=np.uint32),
+    }
+
+    os.makedirs(ruta)
+    for nombre, columna in columnas.items():
+        np.save(os.path.join(ruta, f'{nombre}.npy'), columna)
+    _escribir_estado(ruta, offset, len(ids))
+
+
+def _escribir_estado(ruta, offset, libros):
+    temporal = os.path.join(ruta, 'estado.json.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump({'offset': offset, 'libros': libros}, f)
+    os.replace(temporal, os.path.join(ruta, 'estado.json'))
+
+
+def construir(directorio=None):
+    """
+    Fusiona las altas pendientes en una versión nueva del catálogo.
+    Retorna (versión, libros) o (versión vigente, 0) si no había nada nuevo.
+    """
+    directorio = directorio or _directorio()
+    if not directorio:
+        return None, 0
+
+    version_anterior = leer_version(directorio)
+    registros, offset_inicial = _cargar_registros(
+        os.path.join(directorio, version_anterior) if version_anterior else None
+    )
+    offset = _fusionar_pendientes(os.path.join(directorio, PENDIENTES), registros, offset_inicial)
+    if offset == offset_inicial:
+        return version_anterior, 0
+
+    version = nueva_version()
+    _escribir_version(os.path.join(directorio, version), registros, offset)
+    publicar_version(directorio, version)
+    compactar_log(
+        os.path.join(directorio, PENDIENTES), offset,
+        lambda: _escribir_estado(os.path.join(directorio, version), 0, len(registros))
+    )
+
+    return version, len(registros)
+
+
+def construir_si_libre(directorio=None, conservar=VERSIONES_CONSERVADAS):
+    """
+    Como construir(), pero solo si ningún otro proceso está construyendo (flock);
+    si lo hay, retorna None. Tras una versión nueva poda las antiguas.
+    """
+    directorio = directorio or _directorio()
+    if not directorio:
+        return None, 0
+
+    with cerrojo(os.path.join(directorio, CERROJO)) as libre:
+        if not libre:
+            return None
+        version, libros = construir(directorio)
+        if libros:
+            podar_versiones(directorio, version, conservar)
+        return version, libros
+
+
+def iniciar_construccion_periodica(intervalo=None):
+    """
+    Construye una versión nueva cada `intervalo` segundos en cada worker; el flock evita construcciones simultáneas.
+    """
+    intervalo = intervalo if intervalo is not None else getattr(settings, 'CATALOGO_INTERVALO', 300)
+    if not _directorio():
+        return None
+    return iniciar_hilo_periodico('construir-catalogo', intervalo, construir_si_libre, 'construyendo el catálogo')
+
+
+# ============================================
+# SERVICIO (mmap, sin deserializar)
+# ============================================
+
+class Catalogo:
+
+    def __init__(self, ruta):
+        import numpy as np
+
+        self._np = np
+        for nombre in COLUMNAS:
+            setattr(self, nombre, np.load(os.path.join(ruta, f'{nombre}.npy'), mmap_mode='r'))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def filas(self, ids):
+        """
+        Fila de cada ID (o -1 si no está), con una sola búsqueda binaria vectorizada.
+        """
+        np = self._np
+        if not len(self.ids) or not ids:
+            return np.full(len(ids), -1, dtype=np.int64)
+
+        claves = np.array([(volume_id or '').encode('utf-8') for volume_id in ids], dtype=object)
+        # IDs más largos que la columna no pueden estar (se truncarían y podrían confundirse)
+        validos = np.array([len(clave) <= ANCHO_ID for clave in claves], dtype=bool)
+        claves = np.where(validos, claves, b'').astype(f'S{ANCHO_ID}')
+
+        posiciones = np.minimum(np.searchsorted(self.ids, claves), len(self.ids) - 1)
+        encontrados = validos & (self.ids[posiciones] == claves)
+        return np.where(encontrados, posiciones, -1)
+
+    def titulo(self, fila):
+        inicio, fin = int(self.titulos_idx[fila]), int(self.titulos_idx[fila + 1])
+        return self.titulos[inicio:fin].tobytes().decode('utf-8')
+
+
+_vigente = Recargable(_directorio, Catalogo, 'el catálogo')
+
+
+def obtener_catalogo():
+    """
+    Catálogo vigente (o None). Comprueba si hay versión nueva como mucho cada RECARGA_SEGUNDOS.
+    """
+    return _vigente.obtener()
+
+
+def completar(candidatos):
+    """
+    Rellena los ratings y el año que les faltan a los candidatos con lo que sabe
+    el catálogo. Retorna cuántos candidatos se completaron.
+    """
+    catalogo = obtener_catalogo()
+    if catalogo is None or not candidatos:
+        return 0
+
+    filas = catalogo.filas([c.id for c in candidatos])
+    completados = 0
+    for candidato, fila in zip(candidatos, filas):
+        if fila < 0:
+            continue
+
+        cambiado = False
+        num_ratings = int(catalogo.num_ratings[fila])
+        if num_ratings and not candidato.num_ratings:
+            candidato.rating = round(float(catalogo.ratings[fila]), 2)
+            candidato.num_ratings = num_ratings
+            cambiado = True
+        anio = int(catalogo.anios[fila])
+        if anio and candidato.anio is None:
+            candidato.anio = anio
+            candidato.decada = (anio // 10) * 10
+            candidato.fecha = candidato.fecha or str(anio)
+            cambiado = True
+        completados += cambiado
+
+    if completados:
+        incrementar('catalogo_completados_total', completados)
+    return completados
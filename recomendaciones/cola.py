@@ -0,0 +1,376 @@
+"""
+Cola de trabajo en segundo plano (write-behind).
+
+El camino de la petición solo encola; un hilo despachador junta el trabajo
+pendiente en lotes y lo reparte por tipo en un pool de hilos acotado:
+escrituras de cache, log de consultas, enriquecimiento de Open Library,
+revalidación de entradas a punto de caducar...
+
+- Coalescencia: una clave (tipo, clave) pendiente se sustituye por la más
+  reciente (clave None = trabajo sin coalescer, ej. líneas de log).
+- Acotada: con PENDIENTES_MAX trabajos pendientes se ejecuta en línea
+  (contrapresión en vez de perder escrituras).
+- Persistencia opcional (diario): con settings.COLA_SQLITE_PATH un hilo aparte
+  anota en SQLite, en una transacción cada INTERVALO_DIARIO segundos, lo que
+  se encoló y borra lo que ya se hizo. La petición nunca toca el disco; una
+  caída (OOM, kill -9) pierde como mucho lo encolado en ese último intervalo.
+  Al arrancar, cada worker reencola lo que dejaron los procesos que ya no existen.
+
+Cada módulo registra sus manejadores con @manejador('tipo'); un manejador
+recibe la lista de (clave, carga) de su lote.
+"""
+import itertools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .metricas import incrementar
+
+
+LOTE_MAX = 100
+PENDIENTES_MAX = 2000
+ESPERA_LOTE = 0.02  # Segundos que espera el despachador para juntar más trabajo
+INTERVALO_DIARIO = 0.2  # Segundos entre escrituras del diario en SQLite
+
+_manejadores = {}
+_pendientes = OrderedDict()  # (tipo, clave) -> (carga, id de la fila en SQLite o None)
+_condicion = threading.Condition()
+_secuencia = itertools.count()
+_SIN_CLAVE = '\x00cola-'  # Prefijo de las claves internas de los trabajos que no se coalescen
+_en_curso = 0
+_hilo = None
+_pool = None
+_diario = None
+_por_anotar = {}  # (tipo, clave interna) -> clave original: cargas que aún no están en SQLite
+_terminados = []  # Filas de SQLite de trabajos ya hechos, pendientes de borrar
+_local = threading.local()
+
+
+def manejador(tipo):
+    def registrar(funcion):
+        _manejadores[tipo] = funcion
+        return funcion
+    return registrar
+
+
+def activa():
+    return getattr(settings, 'COLA_ESCRITURA', True)
+
+
+def _ejecutar(tipo, items):
+    funcion = _manejadores.get(tipo)
+    if funcion is None:
+        print(f"⚠️ Cola: no hay manejador para '{tipo}' ({len(items)} trabajos descartados)")
+        return
+    try:
+        funcion(items)
+        incrementar('cola_trabajos_total', len(items), tipo=tipo, resultado='ok')
+    except Exception as e:
+        incrementar('cola_trabajos_total', len(items), tipo=tipo, resultado='error')
+        print(f"⚠️ Cola: error procesando '{tipo}': {e}")
+
+
+def _hilos_en_marcha():
+    return (_hilo is not None and _hilo.is_alive()
+            and (not _ruta() or (_diario is not None and _diario.is_alive())))
+
+
+def _asegurar_hilo():
+    global _hilo, _pool, _diario
+    if _hilos_en_marcha():
+        return
+    with _condicion:
+        if _hilo is None or not _hilo.is_alive():
+            _pool = ThreadPoolExecutor(max_workers=getattr(settings, 'COLA_HILOS', 2), thread_name_prefix='cola')
+            _hilo = threading.Thread(target=_despachar, name='cola-despachador', daemon=True)
+            _hilo.start()
+        if _ruta() and (_diario is None or not _diario.is_alive()):
+            _diario = threading.Thread(target=_escribir_diario, name='cola-diario', daemon=True)
+            _diario.start()
+
+
+def _despachar():
+    global _en_curso
+    while True:
+        with _condicion:
+            while not _pendientes:
+                _condicion.wait()
+        time.sleep(ESPERA_LOTE)
+
+        with _condicion:
+            lote = [_pendientes.popitem(last=False) for _ in range(min(LOTE_MAX, len(_pendientes)))]
+            _en_curso += 1
+
+        grupos = defaultdict(list)
+        for (tipo, clave), (carga, _) in lote:
+            grupos[tipo].append((clave, carga))
+        try:
+            wait([_pool.submit(_ejecutar, tipo, items) for tipo, items in grupos.items()])
+        finally:
+            with _condicion:
+                # El hilo del diario borra sus filas (nunca este hilo: no hace E/S de SQLite)
+                _terminados.extend(fila for _, (_, fila) in lote if fila is not None)
+                _en_curso -= 1
+                _condicion.notify_all()
+
+
+def encolar(tipo, clave, carga):
+    """
+    Añade trabajo a la cola (o lo ejecuta en línea si la cola está desactivada o llena).
+    Solo toca memoria: el diario de SQLite lo escribe otro hilo.
+    """
+    if not activa():
+        _ejecutar(tipo, [(clave, carga)])
+        return
+
+    _asegurar_hilo()
+    with _condicion:
+        lleno = len(_pendientes) >= PENDIENTES_MAX
+        if not lleno:
+            if clave is None:
+                anterior, clave_interna = None, f'{_SIN_CLAVE}{next(_secuencia)}'
+            else:
+                anterior, clave_interna = _pendientes.pop((tipo, clave), None), clave
+            # Si coalesce con un trabajo ya anotado, el diario actualiza su fila
+            _pendientes[(tipo, clave_interna)] = (carga, anterior[1] if anterior else None)
+            if _diario is not None:
+                _por_anotar[(tipo, clave_interna)] = clave
+            _condicion.notify()
+
+    if lleno:
+        incrementar('cola_trabajos_total', tipo=tipo, resultado='en_linea')
+        _ejecutar(tipo, [(clave, carga)])
+
+
+def esperar(timeout=5.0):
+    """
+    Espera a que la cola se vacíe. Retorna True si se vació a tiempo.
+    """
+    limite = time.time() + timeout
+    with _condicion:
+        while _pendientes or _en_curso:
+            restante = limite - time.time()
+            if restante <= 0:
+                return False
+            _condicion.wait(restante)
+    return True
+
+
+def pendientes():
+    return len(_pendientes)
+
+
+def _tras_fork():
+    # Los hilos no sobreviven a fork: el hijo arranca los suyos al encolar
+    global _condicion, _hilo, _pool, _diario, _en_curso
+    # Las filas de SQLite de lo heredado son del padre: el hijo no las toca
+    for clave, (carga, _) in _pendientes.items():
+        _pendientes[clave] = (carga, None)
+    _por_anotar.clear()
+    del _terminados[:]
+    _condicion = threading.Condition()
+    _hilo = None
+    _pool = None
+    _diario = None
+    _en_curso = 0
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+
+# ============================================
+# PERSISTENCIA (SQLite, opcional)
+# ============================================
+
+def _ruta():
+    return getattr(settings, 'COLA_SQLITE_PATH', None)
+
+
+def _conexion(ruta):
+    # Una conexión por hilo y proceso (no se pueden compartir tras un fork)
+    conexion = getattr(_local, 'conexion', None)
+    if conexion is not None and _local.clave == (ruta, os.getpid()):
+        return conexion
+
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    conexion = sqlite3.connect(ruta, timeout=5)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    # NORMAL en WAL: sobrevive a la caída del proceso (no a la del sistema) sin fsync por trabajo
+    conexion.execute("PRAGMA synchronous=NORMAL")
+    conexion.execute(
+        "CREATE TABLE IF NOT EXISTS pendientes "
+        "(id INTEGER PRIMARY KEY, dueno INTEGER, tipo TEXT, clave BLOB, carga BLOB)"
+    )
+    _local.conexion, _local.clave = conexion, (ruta, os.getpid())
+    return conexion
+
+
+def _escribir_diario():
+    while True:
+        time.sleep(INTERVALO_DIARIO)
+        try:
+            volcar_diario()
+        except Exception as e:
+            print(f"⚠️ Cola: error escribiendo el diario: {e}")
+
+
+def volcar_diario():
+    """
+    Anota en SQLite (en una sola transacción) lo encolado desde la última vez y
+    borra lo ya hecho. Retorna el número de trabajos anotados.
+    """
+    ruta = _ruta()
+    with _condicion:
+        if not ruta:
+            _por_anotar.clear()
+            del _terminados[:]
+            return 0
+        por_anotar = [(k, clave, _pendientes[k]) for k, clave in _por_anotar.items() if k in _pendientes]
+        terminados = list(_terminados)
+        _por_anotar.clear()
+        del _terminados[:]
+    if not por_anotar and not terminados:
+        return 0
+
+    nuevas = {}
+    try:
+        conexion = _conexion(ruta)
+        with conexion:
+            for k, clave, (carga, fila) in por_anotar:
+                try:
+                    datos = pickle.dumps(carga, pickle.HIGHEST_PROTOCOL)
+                except Exception as e:
+                    # Se queda solo en memoria: se pierde si el proceso cae antes de hacerlo
+                    print(f"⚠️ Cola: trabajo '{k[0]}' no serializable: {e}")
+                    continue
+                if fila is not None:
+                    conexion.execute("UPDATE pendientes SET carga = ? WHERE id = ?", (datos, fila))
+                else:
+                    nuevas[k] = conexion.execute(
+                        "INSERT INTO pendientes (dueno, tipo, clave, carga) VALUES (?, ?, ?, ?)",
+                        (os.getpid(), k[0], pickle.dumps(clave), datos)
+                    ).lastrowid
+            conexion.executemany("DELETE FROM pendientes WHERE id = ?", [(fila,) for fila in terminados])
+    except sqlite3.Error as e:
+        print(f"⚠️ Cola: no se pudo escribir el diario: {e}")
+        with _condicion:
+            for k, clave, _ in por_anotar:
+                _por_anotar.setdefault(k, clave)
+            _terminados.extend(terminados)
+        return 0
+
+    with _condicion:
+        for k, fila in nuevas.items():
+            actual = _pendientes.get(k)
+            if actual is None:
+                # Ya se despachó sin fila: la que se acaba de crear sobra
+                _terminados.append(fila)
+            else:
+                # Si entretanto se coalesció otra carga, sigue en _por_anotar y se actualizará esta fila
+                _pendientes[k] = (actual[0], fila)
+    return len(por_anotar)
+
+
+def _olvidar(filas):
+    # Solo al restaurar; en marcha las filas se borran desde el diario
+    ruta = _ruta()
+    if not ruta or not filas:
+        return
+    try:
+        conexion = _conexion(ruta)
+        with conexion:
+            conexion.executemany("DELETE FROM pendientes WHERE id = ?", [(fila,) for fila in filas])
+    except sqlite3.Error as e:
+        # Se volverán a ejecutar al reencolarse (los manejadores son idempotentes)
+        print(f"⚠️ Cola: no se pudieron borrar {len(filas)} trabajos terminados: {e}")
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def detener(timeout=5.0):
+    """
+    Al apagar el worker: intenta vaciar la cola y pone el diario al día. Retorna
+    el número de trabajos que quedan pendientes (guardados en SQLite si hay persistencia).
+    """
+    vacia = esperar(timeout)
+    if not _ruta():
+        if not vacia:
+            print(f"⚠️ Cola: {pendientes()} trabajos pendientes se pierden al apagar")
+        return 0
+
+    volcar_diario()
+    return 0 if vacia else pendientes()
+
+
+def restaurar():
+    """
+    Al arrancar el worker: reencola los trabajos que dejaron procesos que ya no
+    existen (apagados con trabajo pendiente o caídos) y los pasa a su nombre.
+    """
+    ruta = _ruta()
+    if not ruta or not os.path.exists(ruta):
+        return 0
+
+    # Primero se borra lo ya hecho por este proceso, si lo hay
+    volcar_diario()
+    propio = os.getpid()
+    conexion = _conexion(ruta)
+    # BEGIN IMMEDIATE: si varios workers arrancan a la vez, solo uno se queda con cada trabajo
+    with conexion:
+        conexion.execute("BEGIN IMMEDIATE")
+        # Un PID propio en la tabla es de un arranque anterior: este proceso aún no ha encolado nada
+        duenos = [
+            dueno for (dueno,) in conexion.execute("SELECT DISTINCT dueno FROM pendientes")
+            if dueno == propio or not _vivo(dueno)
+        ]
+        filas = []
+        for dueno in duenos:
+            filas += conexion.execute(
+                "SELECT id, tipo, clave, carga FROM pendientes WHERE dueno = ? ORDER BY id", (dueno,)
+            ).fetchall()
+            conexion.execute("UPDATE pendientes SET dueno = ? WHERE dueno = ?", (propio, dueno))
+
+    restaurados = 0
+    for fila, tipo, clave, carga in sorted(filas):
+        try:
+            clave, carga = pickle.loads(clave), pickle.loads(carga)
+        except Exception as e:
+            print(f"⚠️ Cola: trabajo '{tipo}' ilegible, se descarta: {e}")
+            _olvidar([fila])
+            continue
+        _reencolar(tipo, clave, carga, fila)
+        restaurados += 1
+    return restaurados
+
+
+def _reencolar(tipo, clave, carga, fila):
+    # Como encolar, pero conservando la fila que ya existe en SQLite
+    if not activa():
+        _ejecutar(tipo, [(clave, carga)])
+        _olvidar([fila])
+        return
+
+    _asegurar_hilo()
+    with _condicion:
+        if clave is None:
+            clave = f'{_SIN_CLAVE}{next(_secuencia)}'
+        anterior = _pendientes.pop((tipo, clave), None)
+        if anterior and anterior[1] is not None:
+            _terminados.append(anterior[1])
+        _pendientes[(tipo, clave)] = (carga, fila)
+        _condicion.notify()
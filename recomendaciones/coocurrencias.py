@@ -0,0 +1,291 @@
+"""
+Modelo item-item de co-ocurrencia construido a partir del log de consultas.
+
+1. Registro: cada recomendación con libro fuente identificado añade una línea
+   al log (`consultas.jsonl`) con un identificador anónimo del cliente, el ID
+   del volumen y su volumeInfo recortado.
+2. Construcción (offline, `manage.py construir_coocurrencias`): lee solo lo
+   nuevo del log, empareja los libros que un mismo cliente consulta seguidos
+   (ventana de tiempo) y suma esos pares a la matriz existente. La matriz es
+   CSR simétrica en arrays de NumPy (`indptr`, `indices`, `pesos`) y cada
+   versión se publica como se describe en versiones.py (directorio propio y
+   puntero `ACTUAL` atómico). Lo ya consumido del log se descarta.
+3. Servicio: los arrays se abren con mmap (sin cargarlos en memoria) y
+   `vecinos()` da candidatos y una señal de scoring sin tocar la red.
+
+Directorio: settings.COOCURRENCIAS_DIR (None = desactivado).
+"""
+import hashlib
+import json
+import os
+import time
+
+from django.conf import settings
+
+from .cola import encolar, manejador
+from .versiones import (
+    Recargable, anotar_en_log, compactar_log, leer_version, nueva_version, offset_vigente, publicar_version,
+)
+
+
+VENTANA_SESION = 1800  # Segundos entre consultas de un cliente para considerarlas de la misma sesión
+PREVIOS_POR_CLIENTE = 5  # Consultas previas con las que se empareja cada nueva
+MAX_VECINOS = 50  # Vecinos que se guardan por libro (los de más peso)
+
+LOG = 'consultas.jsonl'
+
+
+def _directorio():
+    return getattr(settings, 'COOCURRENCIAS_DIR', None)
+
+
+# ============================================
+# REGISTRO DE CONSULTAS
+# ============================================
+
+def identificador_cliente(request):
+    """
+    Hash corto e irreversible de IP + User-Agent (no se guarda ningún dato personal).
+    """
+    ip = request.META.get('HTTP_FLY_CLIENT_IP') or request.META.get('REMOTE_ADDR', '')
+    agente = request.META.get('HTTP_USER_AGENT', '')
+    return hashlib.blake2b(
+        f"{ip}|{agente}".encode('utf-8'), digest_size=8, key=settings.SECRET_KEY.encode('utf-8')[:64]
+    ).hexdigest()
+
+
+def registrar_consulta(request, volume_id, volume_info):
+    directorio = _directorio()
+    if not directorio or not volume_id:
+        return
+
+    linea = json.dumps({
+        't': round(time.time(), 1),
+        'c': identificador_cliente(request),
+        'id': volume_id,
+        'info': volume_info,
+    }, ensure_ascii=False)
+    # La escritura en disco se hace en segundo plano, por lotes
+    encolar('consulta', None, (directorio, linea))
+
+
+@manejador('consulta')
+def _escribir_consultas(items):
+    por_directorio = {}
+    for _, (directorio, linea) in items:
+        por_directorio.setdefault(directorio, []).append(linea)
+
+    for directorio, lineas in por_directorio.items():
+        try:
+            anotar_en_log(os.path.join(directorio, LOG), lineas)
+        except OSError as e:
+            print(f"⚠️ No se pudieron registrar {len(lineas)} consultas: {e}")
+
+
+# ============================================
+# CONSTRUCCIÓN (OFFLINE)
+# ============================================
+
+def _cargar_estado(ruta_version):
+    """
+    Estado de la versión anterior: offset del log, libros y últimas consultas por cliente.
+    """
+    import numpy as np
+
+    if not ruta_version:
+        vacio = np.zeros(0, dtype=np.int64)
+        return {'offset': 0, 'ids': [], 'infos': [], 'previos': {}}, (np.zeros(1, dtype=np.int64), vacio, np.zeros(0, dtype=np.float32))
+
+    with open(os.path.join(ruta_version, 'estado.json'), encoding='utf-8') as f:
+        estado = json.load(f)
+    with open(os.path.join(ruta_version, 'items.json'), encoding='utf-8') as f:
+        items = json.load(f)
+    estado['ids'] = [item['id'] for item in items]
+    estado['infos'] = [item['info'] for item in items]
+    matriz = tuple(np.load(os.path.join(ruta_version, f'{nombre}.npy')) for nombre in ('indptr', 'indices', 'pesos'))
+    return estado, matriz
+
+
+def _pares_nuevos(ruta_log, estado, indice):
+    """
+    Lee el log desde el offset guardado y devuelve los pares (fila, columna) nuevos.
+    """
+    filas, columnas = [], []
+    previos = estado['previos']
+
+    if not os.path.exists(ruta_log):
+        return filas, columnas
+
+    estado['offset'] = offset_vigente(ruta_log, estado['offset'])
+    with open(ruta_log, 'rb') as f:
+        f.seek(estado['offset'])
+        for linea in f:
+            if not linea.endswith(b'\n'):
+                # Línea a medio escribir: se procesará en la siguiente construcción
+                break
+            estado['offset'] += len(linea)
+            try:
+                evento = json.loads(linea)
+            except ValueError:
+                continue
+
+            volume_id = evento['id']
+            if volume_id not in indice:
+                indice[volume_id] = len(estado['ids'])
+                estado['ids'].append(volume_id)
+                estado['infos'].append(evento.get('info') or {})
+            actual = indice[volume_id]
+
+            recientes = [
+                (t, i) for t, i in previos.get(evento['c'], [])
+                if evento['t'] - t <= VENTANA_SESION and i != actual
+            ]
+            for _, anterior in recientes:
+                filas += (actual, anterior)
+                columnas += (anterior, actual)
+            previos[evento['c']] = (recientes + [(evento['t'], actual)])[-PREVIOS_POR_CLIENTE:]
+
+    # Solo se conservan los clientes con sesión aún abierta
+    ahora = time.time()
+    estado['previos'] = {
+        cliente: eventos for cliente, eventos in previos.items()
+        if eventos and ahora - eventos[-1][0] <= VENTANA_SESION
+    }
+    return filas, columnas
+
+
+def _fusionar_csr(matriz, filas, columnas, num_items):
+    """
+    Suma los pares nuevos a la matriz CSR existente y poda a MAX_VECINOS por fila.
+    """
+    import numpy as np
+
+    indptr, indices, pesos = matriz
+    filas_previas = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+
+    todas_filas = np.concatenate([filas_previas, np.asarray(filas, dtype=np.int64)])
+    todas_columnas = np.concatenate([indices.astype(np.int64), np.asarray(columnas, dtype=np.int64)])
+    todos_pesos = np.concatenate([pesos.astype(np.float32), np.ones(len(filas), dtype=np.float32)])
+
+    # Sumar duplicados (misma fila y columna)
+    claves = todas_filas * num_items + todas_columnas
+    unicas, inversa = np.unique(claves, return_inverse=True)
+    pesos_sumados = np.bincount(inversa, weights=todos_pesos).astype(np.float32)
+    filas_u, columnas_u = np.divmod(unicas, num_items)
+
+    # Podar: dentro de cada fila, quedarse con los MAX_VECINOS de más peso
+    orden = np.lexsort((-pesos_sumados, filas_u))
+    filas_u, columnas_u, pesos_sumados = filas_u[orden], columnas_u[orden], pesos_sumados[orden]
+    inicio_fila = np.searchsorted(filas_u, filas_u, side='left')
+    conservar = (np.arange(len(filas_u)) - inicio_fila) < MAX_VECINOS
+    filas_u, columnas_u, pesos_sumados = filas_u[conservar], columnas_u[conservar], pesos_sumados[conservar]
+
+    nuevo_indptr = np.zeros(num_items + 1, dtype=np.int64)
+    np.cumsum(np.bincount(filas_u, minlength=num_items), out=nuevo_indptr[1:])
+    return nuevo_indptr, columnas_u.astype(np.int32), pesos_sumados
+
+
+def _escribir_estado(ruta, offset, previos):
+    temporal = os.path.join(ruta, 'estado.json.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump({'offset': offset, 'previos': previos}, f)
+    os.replace(temporal, os.path.join(ruta, 'estado.json'))
+
+
+def construir(directorio=None):
+    """
+    Actualiza el modelo de forma incremental con lo nuevo del log.
+    Retorna (versión, número de pares nuevos) o (None, 0) si no había nada que hacer.
+    """
+    import numpy as np
+
+    directorio = directorio or _directorio()
+    if not directorio:
+        return None, 0
+
+    version_anterior = leer_version(directorio)
+    ruta_anterior = os.path.join(directorio, version_anterior) if version_anterior else None
+    estado, matriz = _cargar_estado(ruta_anterior)
+    offset_inicial = estado['offset']
+    ruta_log = os.path.join(directorio, LOG)
+
+    indice = {volume_id: i for i, volume_id in enumerate(estado['ids'])}
+    filas, columnas = _pares_nuevos(ruta_log, estado, indice)
+    if estado['offset'] == offset_inicial:
+        return version_anterior, 0
+
+    indptr, indices, pesos = _fusionar_csr(matriz, filas, columnas, len(estado['ids']))
+
+    version = nueva_version()
+    ruta = os.path.join(directorio, version)
+    os.makedirs(ruta)
+    np.save(os.path.join(ruta, 'indptr.npy'), indptr)
+    np.save(os.path.join(ruta, 'indices.npy'), indices)
+    np.save(os.path.join(ruta, 'pesos.npy'), pesos)
+    with open(os.path.join(ruta, 'items.json'), 'w', encoding='utf-8') as f:
+        json.dump([{'id': i, 'info': info} for i, info in zip(estado['ids'], estado['infos'])], f, ensure_ascii=False)
+    _escribir_estado(ruta, estado['offset'], estado['previos'])
+
+    publicar_version(directorio, version)
+    compactar_log(ruta_log, estado['offset'], lambda: _escribir_estado(ruta, 0, estado['previos']))
+
+    return version, len(filas)
+
+
+# ============================================
+# SERVICIO (mmap, sin red)
+# ============================================
+
+class ModeloCoocurrencias:
+
+    def __init__(self, ruta):
+        import numpy as np
+
+        self.indptr = np.load(os.path.join(ruta, 'indptr.npy'), mmap_mode='r')
+        self.indices = np.load(os.path.join(ruta, 'indices.npy'), mmap_mode='r')
+        self.pesos = np.load(os.path.join(ruta, 'pesos.npy'), mmap_mode='r')
+        with open(os.path.join(ruta, 'items.json'), encoding='utf-8') as f:
+            self.items = json.load(f)
+        self.indice = {item['id']: i for i, item in enumerate(self.items)}
+
+    def vecinos(self, volume_id, limite):
+        fila = self.indice.get(volume_id)
+        if fila is None:
+            return []
+
+        inicio, fin = int(self.indptr[fila]), int(self.indptr[fila + 1])
+        if inicio == fin:
+            return []
+
+        # Las filas se guardan ordenadas por peso descendente
+        columnas = self.indices[inicio:min(fin, inicio + limite)]
+        pesos = self.pesos[inicio:min(fin, inicio + limite)]
+        maximo = float(pesos[0])
+        return [
+            (self.items[int(columna)], float(peso) / maximo)
+            for columna, peso in zip(columnas, pesos)
+        ]
+
+
+_vigente = Recargable(_directorio, ModeloCoocurrencias, 'el modelo de co-ocurrencias')
+
+
+def obtener_modelo():
+    """
+    Modelo vigente (o None). Comprueba si hay versión nueva como mucho cada RECARGA_SEGUNDOS.
+    """
+    return _vigente.obtener()
+
+
+def vecinos(volume_id, limite=20):
+    """
+    Libros que suelen consultarse junto a `volume_id`: lista de
+    (item en formato Google Books, peso normalizado 0-1).
+    """
+    modelo = obtener_modelo()
+    if modelo is None or not volume_id:
+        return []
+    return [
+        ({'id': item['id'], 'volumeInfo': item['info']}, peso)
+        for item, peso in modelo.vecinos(volume_id, limite)
+    ]
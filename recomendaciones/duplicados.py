@@ -0,0 +1,181 @@
+"""
+Colapso de duplicados entre fuentes antes del scoring.
+
+El mismo libro llega varias veces: por la búsqueda de autor, la de categoría y
+la de keywords, con IDs de Google distintos para cada edición, y además como
+obra de Open Library (`/works/...`). Aquí se agrupan y se fusionan en un solo
+candidato, así que se puntúa menos y no ocupan varias plazas del resultado.
+
+- Huella exacta: autor normalizado (tokens ordenados, así "Ruiz Zafón, Carlos"
+  = "Carlos Ruiz Zafón") + título normalizado sin artículo inicial ni
+  paréntesis finales (edición, colección o serie) + los números del título
+  completo (así "Saga (Tomo 1)" y "Saga (Tomo 2)" no coinciden).
+- Casi duplicados: entre libros del mismo autor, MinHash de los trigramas del
+  título; dos títulos con similitud de Jaccard estimada >= UMBRAL_SIMILITUD son
+  el mismo libro ("El juego del ángel" / "Juego del ángel"), salvo que sus
+  números difieran (tomos de una serie: "Tomo 2" / "Tomo 3").
+- Fusión: una copia del candidato más completo (ID de Google antes que obra
+  de OL) rellena con lo mejor del resto: descripción más larga, ratings con
+  más votos, portada, año y categorías. Los IDs absorbidos quedan en `alias`
+  (ej. para la señal de co-ocurrencias). Los candidatos del grupo no se tocan.
+"""
+import copy
+import re
+import unicodedata
+import zlib
+from functools import lru_cache
+
+
+NUM_PERMUTACIONES = 32
+TAMANO_SHINGLE = 3
+UMBRAL_SIMILITUD = 0.7
+
+ARTICULOS = {'el', 'la', 'los', 'las', 'un', 'una', 'lo'}
+_PARENTESIS_FINAL = re.compile(r'\s*[\(\[][^\)\]]*[\)\]]\s*$')
+_NO_ALFANUMERICO = re.compile(r'[^a-z0-9 ]+')
+# Romanos bien formados hasta 399: "ii", "xiv"... (no palabras como "civil" o "vicio")
+_NUMERO = re.compile(r'^(\d+|(?=[ivxlc])c{0,3}(xc|xl|l?x{0,3})(ix|iv|v?i{0,3}))$')
+
+_coeficientes = None
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '').encode('ASCII', 'ignore').decode('ascii')
+    return ' '.join(_NO_ALFANUMERICO.sub(' ', texto.lower()).split())
+
+
+def clave_autor(autores):
+    if not autores:
+        return ''
+    return ' '.join(sorted(_normalizar(autores[0]).split()))
+
+
+@lru_cache(maxsize=8192)
+def clave_titulo(titulo):
+    titulo = titulo or ''
+    # Los paréntesis finales son edición, colección o serie: "Dune (Edición ilustrada)"
+    while True:
+        recortado = _PARENTESIS_FINAL.sub('', titulo)
+        if recortado == titulo or not recortado:
+            break
+        titulo = recortado
+    palabras = _normalizar(titulo).split()
+    if len(palabras) > 1 and palabras[0] in ARTICULOS:
+        palabras = palabras[1:]
+    return ' '.join(palabras)
+
+
+@lru_cache(maxsize=8192)
+def numeros(titulo):
+    """
+    Números (arábigos o romanos) del título completo.
+    """
+    return frozenset(palabra for palabra in _normalizar(titulo).split() if _NUMERO.match(palabra))
+
+
+def _hashes_permutacion():
+    # Hashing multiplicativo (a * x + b, módulo 2**64, 32 bits altos) con coeficientes fijos
+    global _coeficientes
+    if _coeficientes is None:
+        import numpy as np
+
+        generador = np.random.default_rng(20240611)
+        a = generador.integers(1, 2 ** 63, NUM_PERMUTACIONES, dtype=np.uint64) * 2 + 1
+        b = generador.integers(0, 2 ** 63, NUM_PERMUTACIONES, dtype=np.uint64)
+        _coeficientes = (a[:, None], b[:, None])
+    return _coeficientes
+
+
+@lru_cache(maxsize=8192)
+def firma_minhash(titulo):
+    """
+    Firma MinHash (NUM_PERMUTACIONES valores) de los trigramas de un título ya normalizado.
+    """
+    import numpy as np
+
+    texto = f' {titulo} '
+    shingles = {texto[i:i + TAMANO_SHINGLE] for i in range(max(1, len(texto) - TAMANO_SHINGLE + 1))}
+    x = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+    a, b = _hashes_permutacion()
+    firma = ((a * x + b) >> np.uint64(32)).min(axis=1)
+    firma.flags.writeable = False
+    return firma
+
+
+def similitud(firma_a, firma_b):
+    """
+    Jaccard estimada: fracción de permutaciones con el mismo mínimo.
+    """
+    return float((firma_a == firma_b).mean())
+
+
+def _riqueza(candidato):
+    return (
+        not candidato.id.startswith('/works/'),
+        bool(candidato.descripcion),
+        candidato.num_ratings or 0,
+        bool(candidato.imagen),
+        len(candidato.categorias),
+    )
+
+
+def fusionar(grupo):
+    """
+    Un candidato nuevo con lo mejor de cada uno del grupo. Los del grupo no se
+    modifican: pueden seguir referenciados (ej. en los resultados por fuente del lote).
+    """
+    original = max(grupo, key=_riqueza)
+    base = copy.copy(original)
+    for otro in grupo:
+        if otro is original:
+            continue
+        if len(otro.descripcion or '') > len(base.descripcion or ''):
+            base.descripcion = otro.descripcion
+        if (otro.num_ratings or 0) > (base.num_ratings or 0):
+            base.rating, base.num_ratings = otro.rating, otro.num_ratings
+        if not base.imagen and otro.imagen:
+            base.imagen = otro.imagen
+        if base.anio is None and otro.anio is not None:
+            base.fecha, base.anio, base.decada = otro.fecha, otro.anio, otro.decada
+        nuevas = [c for c in otro.categorias if c.lower() not in base.categorias_min]
+        if nuevas:
+            base.categorias = list(base.categorias) + nuevas
+            base.categorias_min = base.categorias_min + tuple(c.lower() for c in nuevas)
+        base.score = max(base.score, otro.score)
+        base.alias = base.alias + tuple(i for i in (otro.id,) + otro.alias if i != base.id and i not in base.alias)
+    return base
+
+
+def colapsar(candidatos):
+    """
+    Agrupa los candidatos que son el mismo libro y retorna uno por grupo
+    (en el orden de su primera aparición).
+    """
+    grupos = []
+    grupo_por_clave = {}
+    firmas_por_autor = {}  # autor -> [(firma, números del título, índice de grupo)]
+
+    for candidato in candidatos:
+        autor = clave_autor(candidato.autores)
+        titulo = clave_titulo(candidato.titulo)
+        nums = numeros(candidato.titulo)
+        # Sin autor no hay forma fiable de saber si es el mismo libro: solo el mismo ID
+        clave = (autor, titulo, nums) if autor and titulo else ('', candidato.id, nums)
+
+        indice = grupo_por_clave.get(clave)
+        if indice is None and autor and titulo:
+            firma = firma_minhash(titulo)
+            for firma_grupo, nums_grupo, indice_grupo in firmas_por_autor.get(autor, ()):
+                if nums == nums_grupo and similitud(firma, firma_grupo) >= UMBRAL_SIMILITUD:
+                    indice = indice_grupo
+                    break
+            if indice is None:
+                firmas_por_autor.setdefault(autor, []).append((firma, nums, len(grupos)))
+
+        if indice is None:
+            indice = len(grupos)
+            grupos.append([])
+        grupo_por_clave[clave] = indice
+        grupos[indice].append(candidato)
+
+    return [grupo[0] if len(grupo) == 1 else fusionar(grupo) for grupo in grupos]
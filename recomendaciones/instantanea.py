@@ -0,0 +1,146 @@
+"""
+Instantánea persistente de la cache caliente.
+
+La cache es LocMemCache (en proceso), así que cada reinicio o auto-stop la
+vacía. Este módulo lleva la cuenta de aciertos y expiración de cada clave
+escrita por `cache_inteligente` y, periódicamente y al apagar el worker,
+vuelca las entradas más usadas (con su TTL restante) a un fichero
+comprimido. Al arrancar se restauran en bloque antes de servir tráfico.
+
+Ruta y frecuencia: settings.CACHE_SNAPSHOT_PATH (None = desactivado) y
+settings.CACHE_SNAPSHOT_INTERVALO.
+"""
+import os
+import pickle
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .versiones import iniciar_hilo_periodico
+
+
+FORMATO_VERSION = 1
+TTL_MINIMO = 60  # No merece la pena guardar entradas a punto de expirar (segundos)
+
+_lock = threading.Lock()
+_registro = {}  # cache_key -> [aciertos, expira_en]
+
+
+def _max_entradas():
+    return getattr(settings, 'CACHE_SNAPSHOT_MAX_ENTRADAS', 250)
+
+
+def anotar_escritura(cache_key, ttl):
+    with _lock:
+        entrada = _registro.get(cache_key)
+        if entrada is None:
+            _registro[cache_key] = [0, time.time() + ttl]
+            if len(_registro) > 4 * _max_entradas():
+                _podar()
+        else:
+            entrada[1] = time.time() + ttl
+
+
+def anotar_acierto(cache_key):
+    with _lock:
+        entrada = _registro.get(cache_key)
+        if entrada is not None:
+            entrada[0] += 1
+
+
+def segundos_restantes(cache_key):
+    """
+    TTL que le queda a una clave escrita por `cache_inteligente` (None si no consta).
+    """
+    entrada = _registro.get(cache_key)
+    return entrada[1] - time.time() if entrada else None
+
+
+def _podar():
+    """
+    Deja el registro en el doble del máximo: primero quita lo expirado y luego lo menos usado.
+    """
+    ahora = time.time()
+    for clave in [c for c, (_, expira) in _registro.items() if expira <= ahora]:
+        del _registro[clave]
+    exceso = len(_registro) - 2 * _max_entradas()
+    if exceso > 0:
+        for clave, _ in sorted(_registro.items(), key=lambda e: e[1][0])[:exceso]:
+            del _registro[clave]
+
+
+def volcar(ruta=None):
+    """
+    Escribe las entradas más usadas y vigentes en `ruta` de forma atómica.
+    Retorna el número de entradas guardadas.
+    """
+    ruta = ruta or getattr(settings, 'CACHE_SNAPSHOT_PATH', None)
+    if not ruta:
+        return 0
+
+    ahora = time.time()
+    with _lock:
+        candidatas = sorted(
+            ((clave, aciertos, expira) for clave, (aciertos, expira) in _registro.items()
+             if expira - ahora > TTL_MINIMO),
+            key=lambda e: e[1], reverse=True
+        )[:_max_entradas()]
+
+    valores = cache.get_many([clave for clave, _, _ in candidatas])
+    entradas = [
+        (clave, aciertos, expira, valores[clave])
+        for clave, aciertos, expira in candidatas if clave in valores
+    ]
+
+    datos = zlib.compress(pickle.dumps((FORMATO_VERSION, entradas), pickle.HIGHEST_PROTOCOL), 6)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(temporal, 'wb') as f:
+        f.write(datos)
+    os.replace(temporal, ruta)
+    return len(entradas)
+
+
+def restaurar(ruta=None):
+    """
+    Carga la instantánea en la cache con el TTL que le quedaba a cada entrada.
+    Retorna el número de entradas restauradas.
+    """
+    ruta = ruta or getattr(settings, 'CACHE_SNAPSHOT_PATH', None)
+    if not ruta or not os.path.exists(ruta):
+        return 0
+
+    try:
+        with open(ruta, 'rb') as f:
+            version, entradas = pickle.loads(zlib.decompress(f.read()))
+    except Exception as e:
+        print(f"⚠️ Instantánea de cache ilegible ({ruta}): {e}")
+        return 0
+    if version != FORMATO_VERSION:
+        return 0
+
+    ahora = time.time()
+    restauradas = 0
+    for clave, aciertos, expira, valor in entradas:
+        ttl = int(expira - ahora)
+        if ttl <= 0:
+            continue
+        cache.set(clave, valor, ttl)
+        with _lock:
+            _registro[clave] = [aciertos, expira]
+        restauradas += 1
+    return restauradas
+
+
+def iniciar_volcado_periodico(intervalo=None):
+    """
+    Hilo daemon que vuelca la instantánea cada `intervalo` segundos.
+    Debe llamarse en cada worker (tras el fork), no en el master.
+    """
+    intervalo = intervalo or getattr(settings, 'CACHE_SNAPSHOT_INTERVALO', 300)
+    if not getattr(settings, 'CACHE_SNAPSHOT_PATH', None):
+        return None
+    return iniciar_hilo_periodico('instantanea-cache', intervalo, volcar, 'volcando la instantánea de cache')
@@ -0,0 +1,97 @@
+"""
+Capa JSON intercambiable: usa orjson si está instalado y la librería estándar si no.
+
+Se usa para decodificar las respuestas de Google Books / Open Library, para
+renderizar las respuestas de la API (renderers.JSONRendererMedido) y, con
+`recortar_respuesta`, para quedarse solo con los campos que usa el pipeline
+antes de guardar nada en cache (menos memoria y menos pickle por entrada).
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+BACKEND = 'orjson' if orjson else 'json'
+
+# Campos de volumeInfo que lee el pipeline (scoring, filtros y respuesta)
+CAMPOS_VOLUME_INFO = (
+    'title', 'authors', 'categories', 'description', 'publishedDate',
+    'language', 'averageRating', 'ratingsCount',
+)
+CAMPOS_IMAGE_LINKS = ('thumbnail', 'smallThumbnail')
+
+# Campos de los docs de Open Library que usa normalizar_open_library
+CAMPOS_OPEN_LIBRARY = (
+    'key', 'title', 'author_name', 'subject', 'first_publish_year', 'cover_i', 'language',
+    'ratings_average', 'ratings_count',
+)
+
+
+def loads(datos):
+    if orjson:
+        return orjson.loads(datos)
+    return json.loads(datos)
+
+
+def por_defecto(obj):
+    """
+    Tipos propios que se serializan directamente (ej. candidatos.Candidato).
+    """
+    if hasattr(obj, 'a_respuesta'):
+        return obj.a_respuesta()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """
+    Serializa a bytes UTF-8 compactos.
+    """
+    if orjson:
+        return orjson.dumps(obj, default=por_defecto)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=por_defecto).encode('utf-8')
+
+
+def _recortar_volumen(item):
+    info = item.get('volumeInfo')
+    if not isinstance(info, dict):
+        return {'id': item.get('id')}
+
+    recortado = {campo: info[campo] for campo in CAMPOS_VOLUME_INFO if campo in info}
+    imagenes = info.get('imageLinks')
+    if imagenes:
+        recortado['imageLinks'] = {campo: imagenes[campo] for campo in CAMPOS_IMAGE_LINKS if campo in imagenes}
+    return {'id': item.get('id'), 'volumeInfo': recortado}
+
+
+def recortar_respuesta(data):
+    """
+    Reduce una respuesta de Google Books (búsqueda o volumen) o de Open Library
+    a los campos que usa el pipeline. Cualquier otra forma se devuelve intacta.
+    """
+    if not isinstance(data, dict):
+        return data
+    if 'items' in data:
+        return {'items': [_recortar_volumen(item) for item in data['items'] or []]}
+    if 'volumeInfo' in data:
+        return _recortar_volumen(data)
+    if 'docs' in data:
+        return {'docs': [
+            {campo: doc[campo] for campo in CAMPOS_OPEN_LIBRARY if campo in doc}
+            for doc in data['docs'] or []
+        ]}
+    # Obra de Open Library (/works/<id>.json) y sus ratings (/works/<id>/ratings.json)
+    if str(data.get('key', '')).startswith('/works/'):
+        return {'key': data['key'], 'description': data.get('description', '')}
+    if 'summary' in data:
+        return {'summary': data['summary']}
+    return data
+
+
+def decodificar_upstream(cuerpo):
+    """
+    Decodifica el cuerpo de una respuesta del upstream y lo recorta.
+    """
+    return recortar_respuesta(loads(cuerpo))
@@ -0,0 +1,202 @@
+"""
+Control de tráfico hacia las APIs externas (Google Books, Open Library).
+
+- Límite de peticiones por segundo y host, compartido por las rutas síncrona
+  y asíncrona: un token bucket por host en memoria del proceso (capacidad =
+  ráfaga de un segundo), tras un lock. No usa la cache de Django para no
+  desplazar entradas reales de la LocMemCache; el límite es por proceso.
+- El trabajo en segundo plano (precalentar tendencias) solo gasta tokens si
+  queda al menos la mitad del bucket y nunca espera: el tráfico interactivo
+  conserva margen.
+- Si una petición no consigue token, queda anotado en `anotar_limitadas()`
+  para que la vista responda 503 + Retry-After en vez de "sin resultados".
+- Backoff ante 429 (y 503 con `Retry-After`) respetando `Retry-After`.
+  Un 503 sin él no es limitación: Google responde así a IDs de volumen
+  inexistentes y cualquier cliente podría abrir el circuito con IDs al azar.
+- Circuit breaker: mientras el host está limitado no se le envían
+  peticiones y el pipeline trabaja solo con lo cacheado y lo local.
+"""
+import contextlib
+import email.utils
+import os
+import threading
+import time
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Peticiones por segundo por host
+LIMITES_POR_HOST = {
+    'www.googleapis.com': 5,
+    'openlibrary.org': 3,
+}
+LIMITE_POR_DEFECTO = 5
+
+# Máximo que una petición espera un token antes de rendirse (segundos)
+ESPERA_MAXIMA = 2.0
+
+# Backoff exponencial cuando el upstream no envía Retry-After (segundos)
+BACKOFF_BASE = 30
+BACKOFF_MAX = 900
+
+STATUS_LIMITADO = 429
+
+_lock = threading.Lock()
+_buckets = {}  # host -> (tokens, momento del último relleno en time.monotonic())
+_limitadas = ContextVar('limitador_limitadas', default=None)
+_segundo_plano = ContextVar('limitador_segundo_plano', default=False)
+
+
+def host_de(url):
+    return urlsplit(url).hostname or ''
+
+
+def parametros_con_clave(url, params):
+    """
+    Añade la API key de Google Books (si está configurada) solo al enviar la petición,
+    para que nunca forme parte de las claves de cache.
+    """
+    api_key = getattr(settings, 'GOOGLE_BOOKS_API_KEY', None)
+    if api_key and host_de(url) == 'www.googleapis.com':
+        return {**params, 'key': api_key}
+    return params
+
+
+def segundos_bloqueo(host):
+    """
+    Segundos que faltan para que se cierre el circuito del host (0 si está cerrado).
+    """
+    hasta = cache.get(f'rl_bloqueo_{host}') or 0
+    return max(0.0, hasta - time.time())
+
+
+def circuito_abierto(host):
+    return segundos_bloqueo(host) > 0
+
+
+def reservar_token(host, espera_maxima=ESPERA_MAXIMA):
+    """
+    Reserva un token del bucket del host. Retorna los segundos que hay que esperar
+    antes de enviar (0 = ya), o None si el circuito está abierto o la espera
+    superaría `espera_maxima` (0 = solo si hay token ya, para peticiones prescindibles).
+    """
+    if circuito_abierto(host):
+        _anotar_limitada(host)
+        return None
+
+    tasa = LIMITES_POR_HOST.get(host, LIMITE_POR_DEFECTO)
+    minimo = tasa / 2 if _segundo_plano.get() else 0
+    if minimo:
+        espera_maxima = 0
+
+    with _lock:
+        ahora = time.monotonic()
+        tokens, ultimo = _buckets.get(host, (tasa, ahora))
+        tokens = min(tasa, tokens + (ahora - ultimo) * tasa)
+        # Los tokens pueden quedar en negativo: son reservas de peticiones que esperan su turno
+        espera = max(0.0, (1 + minimo - tokens) / tasa)
+        if espera > espera_maxima:
+            _buckets[host] = (tokens, ahora)
+            espera = None
+        else:
+            _buckets[host] = (tokens - 1, ahora)
+
+    if espera is None:
+        _anotar_limitada(host)
+    return espera
+
+
+def _anotar_limitada(host):
+    limitadas = _limitadas.get()
+    if limitadas is not None:
+        limitadas.append(host)
+
+
+@contextlib.contextmanager
+def anotar_limitadas():
+    """
+    Dentro del bloque, cada petición que el limitador no deja pasar añade su host
+    a la lista que produce: así la vista distingue "upstream limitado" de "sin resultados".
+    """
+    limitadas = []
+    token = _limitadas.set(limitadas)
+    try:
+        yield limitadas
+    finally:
+        _limitadas.reset(token)
+
+
+def hubo_limitacion():
+    """
+    True si dentro del anotar_limitadas() en curso el limitador rechazó alguna petición.
+    """
+    return bool(_limitadas.get())
+
+
+@contextlib.contextmanager
+def en_segundo_plano():
+    """
+    Peticiones prescindibles (ej. precalentar): solo con medio bucket libre y sin esperar.
+    """
+    token = _segundo_plano.set(True)
+    try:
+        yield
+    finally:
+        _segundo_plano.reset(token)
+
+
+def segundos_hasta_token(host):
+    """
+    Segundos hasta que el host vuelva a aceptar peticiones (circuito o bucket).
+    """
+    tasa = LIMITES_POR_HOST.get(host, LIMITE_POR_DEFECTO)
+    with _lock:
+        tokens, ultimo = _buckets.get(host, (tasa, time.monotonic()))
+    tokens = min(tasa, tokens + (time.monotonic() - ultimo) * tasa)
+    return max(segundos_bloqueo(host), (1 - tokens) / tasa, 0.0)
+
+
+def _tras_fork():
+    # El lock podía estar tomado por otro hilo del padre en el momento del fork
+    global _lock
+    _lock = threading.Lock()
+    _buckets.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_tras_fork)
+
+
+def _parsear_retry_after(valor):
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = email.utils.parsedate_to_datetime(valor)
+        return max(0.0, fecha.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def registrar_respuesta(host, status, retry_after=None):
+    """
+    Actualiza el circuit breaker con el status de una respuesta del upstream.
+    """
+    if status == STATUS_LIMITADO or (status == 503 and retry_after):
+        fallos = (cache.get(f'rl_fallos_{host}') or 0) + 1
+        espera = _parsear_retry_after(retry_after)
+        if espera is None:
+            espera = min(BACKOFF_BASE * 2 ** (fallos - 1), BACKOFF_MAX)
+        espera = min(espera, BACKOFF_MAX)
+
+        cache.set(f'rl_bloqueo_{host}', time.time() + espera, int(espera) + 1)
+        cache.set(f'rl_fallos_{host}', fallos, BACKOFF_MAX * 2)
+        print(f"⚠️ {host} respondió {status}: circuito abierto durante {espera:.0f}s")
+    elif status < 400 and cache.get(f'rl_fallos_{host}'):
+        cache.delete(f'rl_fallos_{host}')
@@ -0,0 +1,169 @@
+"""
+Benchmark offline del pipeline de recomendación.
+
+Reproduce respuestas grabadas de Google Books / Open Library (recomendaciones/bench/grabaciones)
+a escala realista y multiplicada, y mide la vista completa y las funciones del hot path.
+
+    python manage.py benchmark
+    python manage.py benchmark --escalas 1 100 --iteraciones 30 --json resultados.json
+    python manage.py benchmark --grabar "La sombra del viento"   # requiere red
+"""
+import json
+import pickle
+import warnings
+
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from recomendaciones import cola, json_rapido, views
+from recomendaciones.bench import transporte
+from recomendaciones.bench.medicion import medir_funcion
+
+
+class Command(BaseCommand):
+    help = "Mide throughput, latencia p50/p99 y memoria pico del pipeline sin acceso a red."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=20)
+        parser.add_argument('--escalas', type=int, nargs='+', default=[1, 100],
+                            help="Multiplicadores del volumen de candidatos de las grabaciones.")
+        parser.add_argument('--latencia-ms', type=float, default=0.0,
+                            help="Latencia simulada por petición al upstream.")
+        parser.add_argument('--json', dest='salida_json',
+                            help="Guarda los resultados en un fichero JSON para comparar entre versiones.")
+        parser.add_argument('--grabar', metavar='TITULO',
+                            help="Graba nuevas respuestas reales para TITULO y termina.")
+
+    def handle(self, *args, **options):
+        if options['grabar']:
+            try:
+                transporte.grabar(options['grabar'])
+            except Exception as e:
+                raise CommandError(f"No se pudieron grabar las respuestas: {e}")
+            self.stdout.write(self.style.SUCCESS(f"Grabaciones actualizadas en {transporte.GRABACIONES}"))
+            return
+
+        warnings.simplefilter('ignore', CacheKeyWarning)
+        resultados = {}
+        for escala in options['escalas']:
+            resultados[f'x{escala}'] = self._ejecutar_escala(
+                escala, options['iteraciones'], options['latencia_ms'] / 1000
+            )
+
+        self._imprimir(resultados)
+        if options['salida_json']:
+            with open(options['salida_json'], 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, indent=2)
+
+    def _ejecutar_escala(self, escala, iteraciones, latencia):
+        grabaciones = transporte.GrabacionesEscaladas(escala)
+        volumen = grabaciones.payloads[transporte.GRABACION_GOOGLE_VOLUMEN]
+        libro_fuente = volumen['volumeInfo']
+        consulta = libro_fuente['title']
+        autor_fuente = libro_fuente['authors'][0]
+        categorias_fuente = libro_fuente.get('categories', [])
+        descripcion_fuente = libro_fuente.get('description', '')
+        fecha_fuente = libro_fuente.get('publishedDate', '')[:4]
+
+        ol_data = grabaciones.payloads[transporte.GRABACION_OPEN_LIBRARY]
+        google_data = grabaciones.payloads[transporte.GRABACION_GOOGLE_BUSQUEDA]
+        candidatos = views.normalizar_google(google_data) + views.normalizar_open_library(ol_data)
+        titulos = [c.titulo or '' for c in candidatos]
+
+        procesados = views._process_and_score_candidates(
+            candidatos, libro_fuente, autor_fuente, categorias_fuente, descripcion_fuente,
+            fecha_fuente, views.normalizar_texto(consulta), views.normalizar_texto(consulta), True
+        )
+        procesados.sort(key=lambda x: x.score, reverse=True)
+
+        factory = RequestFactory()
+
+        def vista():
+            response = views.recomendar_libros(factory.get('/api/recomendar/', {'libro': consulta}))
+            response.render()
+            if response.status_code != 200:
+                raise CommandError(f"La vista respondió {response.status_code}: {response.content[:200]!r}")
+
+        def vaciar_cache():
+            # Las escrituras de cache van por la cola: que no caigan tras el clear
+            cola.esperar()
+            cache.clear()
+
+        resultados = {}
+        with transporte.transporte_grabado(escala, latencia) as contador:
+            resultados['recomendar_libros (cache fría)'] = medir_funcion(
+                vista, iteraciones, preparar=vaciar_cache
+            )
+            cola.esperar()
+            peticiones_por_vista = (contador['sync'] + contador['async']) / (iteraciones + 3)
+            resultados['recomendar_libros (cache caliente)'] = medir_funcion(vista, iteraciones)
+
+        resultados['calcular_score_avanzado_v2'] = medir_funcion(
+            lambda: [
+                views.calcular_score_avanzado_v2(
+                    c, libro_fuente, autor_fuente, categorias_fuente, descripcion_fuente, fecha_fuente
+                )
+                for c in candidatos
+            ],
+            iteraciones
+        )
+        resultados['asegurar_diversidad_avanzada'] = medir_funcion(
+            lambda: views.asegurar_diversidad_avanzada(procesados), iteraciones
+        )
+        resultados['normalizar_google'] = medir_funcion(
+            lambda: views.normalizar_google(google_data), iteraciones
+        )
+        resultados['normalizar_open_library'] = medir_funcion(
+            lambda: views.normalizar_open_library(ol_data), iteraciones
+        )
+        resultados['detectar_serie'] = medir_funcion(
+            lambda: [views.detectar_serie(t) for t in titulos], iteraciones
+        )
+
+        resultados.update(self._medir_json(grabaciones, procesados, iteraciones))
+
+        for nombre in resultados:
+            resultados[nombre]['candidatos'] = len(candidatos)
+        resultados['recomendar_libros (cache fría)']['peticiones_upstream'] = round(peticiones_por_vista, 1)
+        return resultados
+
+    def _medir_json(self, grabaciones, procesados, iteraciones):
+        """
+        Codec JSON: librería estándar frente a json_rapido sobre las grabaciones de Google Books,
+        y coste de la entrada de cache (pickle) con el payload completo frente al recortado.
+        """
+        cuerpo = grabaciones.cuerpos[transporte.GRABACION_GOOGLE_BUSQUEDA]
+        completo = json.loads(cuerpo)
+        recortado = json_rapido.decodificar_upstream(cuerpo)
+        respuesta = {"recomendaciones": procesados}
+        backend = json_rapido.BACKEND
+
+        return {
+            'json decodificar (stdlib)': medir_funcion(lambda: json.loads(cuerpo), iteraciones),
+            f'json decodificar+recortar ({backend})': medir_funcion(
+                lambda: json_rapido.decodificar_upstream(cuerpo), iteraciones
+            ),
+            'json renderizar (stdlib)': medir_funcion(
+                lambda: json.dumps(respuesta, ensure_ascii=False, default=json_rapido.por_defecto).encode('utf-8'),
+                iteraciones
+            ),
+            f'json renderizar ({backend})': medir_funcion(lambda: json_rapido.dumps(respuesta), iteraciones),
+            'cache pickle (payload completo)': medir_funcion(
+                lambda: pickle.dumps(completo, pickle.HIGHEST_PROTOCOL), iteraciones
+            ),
+            'cache pickle (payload recortado)': medir_funcion(
+                lambda: pickle.dumps(recortado, pickle.HIGHEST_PROTOCOL), iteraciones
+            ),
+        }
+
+    def _imprimir(self, resultados):
+        for escala, medidas in resultados.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\nEscala {escala}"))
+            self.stdout.write(f"{'benchmark':<38}{'cand.':>7}{'ops/s':>11}{'p50 ms':>10}{'p99 ms':>10}{'pico KB':>11}")
+            for nombre, m in medidas.items():
+                self.stdout.write(
+                    f"{nombre:<38}{m['candidatos']:>7}{m['ops_por_segundo']:>11.1f}"
+                    f"{m['p50_ms']:>10.2f}{m['p99_ms']:>10.2f}{m['memoria_pico_kb']:>11.0f}"
+                )
@@ -0,0 +1,38 @@
+"""
+Fusiona las altas pendientes en una versión nueva del catálogo. Los workers ya lo
+hacen periódicamente (settings.CATALOGO_INTERVALO); esto sirve para forzarlo:
+
+    python manage.py construir_catalogo
+    python manage.py construir_catalogo --conservar 1
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from recomendaciones import catalogo
+from recomendaciones.versiones import VERSIONES_CONSERVADAS
+
+
+class Command(BaseCommand):
+    help = "Construye una versión nueva del catálogo columnar con las altas pendientes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directorio', help="Por defecto settings.CATALOGO_DIR.")
+        parser.add_argument('--conservar', type=int, default=VERSIONES_CONSERVADAS,
+                            help="Versiones antiguas que se mantienen (los workers pueden tenerlas abiertas con mmap).")
+
+    def handle(self, *args, **options):
+        directorio = options['directorio'] or catalogo._directorio()
+        if not directorio:
+            raise CommandError("Configura CATALOGO_DIR o pasa --directorio.")
+
+        # Con el mismo flock que los workers: nunca dos construcciones a la vez
+        resultado = catalogo.construir_si_libre(directorio, options['conservar'])
+        if resultado is None:
+            raise CommandError("Otro proceso está construyendo el catálogo; inténtalo en unos segundos.")
+        version, libros = resultado
+        if not version:
+            self.stdout.write("No hay altas pendientes: no hay nada que construir.")
+            return
+        if not libros:
+            self.stdout.write(f"Catálogo {version} al día.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Catálogo {version}: {libros} libros."))
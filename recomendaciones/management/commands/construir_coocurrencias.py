@@ -0,0 +1,33 @@
+"""
+Construye (o actualiza de forma incremental) el modelo de co-ocurrencias a partir
+del log de consultas. Pensado para ejecutarse periódicamente fuera del servidor:
+
+    python manage.py construir_coocurrencias
+    python manage.py construir_coocurrencias --conservar 2
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from recomendaciones import coocurrencias
+from recomendaciones.versiones import VERSIONES_CONSERVADAS, podar_versiones
+
+
+class Command(BaseCommand):
+    help = "Actualiza la matriz CSR de co-ocurrencias con las consultas nuevas del log."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directorio', help="Por defecto settings.COOCURRENCIAS_DIR.")
+        parser.add_argument('--conservar', type=int, default=VERSIONES_CONSERVADAS,
+                            help="Versiones antiguas que se mantienen (los workers pueden tenerlas abiertas con mmap).")
+
+    def handle(self, *args, **options):
+        directorio = options['directorio'] or coocurrencias._directorio()
+        if not directorio:
+            raise CommandError("Configura COOCURRENCIAS_DIR o pasa --directorio.")
+
+        version, pares = coocurrencias.construir(directorio)
+        if not version:
+            self.stdout.write("El log está vacío: no hay nada que construir.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Modelo {version}: {pares} pares nuevos."))
+
+        podar_versiones(directorio, version, options['conservar'])
@@ -0,0 +1,208 @@
+"""
+Instrumentación ligera del pipeline de recomendación.
+
+- `medir(etapa)` cronometra una etapa: alimenta un histograma global
+  (exportado en formato Prometheus en /metrics) y la lista de spans de
+  la petición en curso (cabecera `Server-Timing` opcional).
+- Contadores de aciertos/fallos de cache y bytes/peticiones al upstream.
+
+También guarda el perfil de arranque en frío: la fase de calentamiento
+(core/arranque.py) y el tiempo hasta la primera respuesta, medidos desde
+LIBRUJULA_INICIO (lo fija entrypoint.sh) o desde que se importa el módulo.
+
+Las métricas son por proceso (gunicorn con --workers 1). El coste por
+span es un perf_counter y una actualización bajo lock, así que se puede
+dejar activo en producción.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_histogramas = {}  # etapa -> [conteos por bucket, suma, total]
+_contadores = {}  # (nombre, labels) -> valor
+_indicadores = {}  # (nombre, labels) -> valor (gauges)
+_spans = ContextVar('metricas_spans', default=None)
+
+INICIO_PROCESO = float(os.environ.get('LIBRUJULA_INICIO') or time.time())
+_primera_respuesta_registrada = False
+
+
+def observar(etapa, segundos):
+    with _lock:
+        histograma = _histogramas.get(etapa)
+        if histograma is None:
+            histograma = _histogramas[etapa] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        histograma[0][bisect.bisect_left(BUCKETS, segundos)] += 1
+        histograma[1] += segundos
+        histograma[2] += 1
+
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((etapa, segundos))
+
+
+@contextmanager
+def medir(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(etapa, time.perf_counter() - inicio)
+
+
+def incrementar(nombre, valor=1, **labels):
+    clave = (nombre, tuple(sorted(labels.items())))
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+
+
+def fijar(nombre, valor, **labels):
+    clave = (nombre, tuple(sorted(labels.items())))
+    with _lock:
+        _indicadores[clave] = valor
+
+
+# Prefijos cuya segunda parte es un identificador (ej. la sesión en 'perfil_<sesion>'):
+# la etiqueta es solo el prefijo, o cada sesión crearía un contador nuevo
+PREFIJOS_CON_ID = {'perfil'}
+
+
+def registrar_cache(cache_key, hit):
+    """
+    Acierto/fallo de cache agrupado por prefijo de la clave (ej. 'google_autor', 'ol_search').
+    """
+    partes = cache_key.split('_', 2)
+    fuente = partes[0] if partes[0] in PREFIJOS_CON_ID else '_'.join(partes[:2])
+    incrementar('cache_total', fuente=fuente, resultado='hit' if hit else 'miss')
+
+
+def etapa_upstream(host):
+    """
+    Nombre de etapa para las peticiones a un host (ej. 'upstream_googleapis').
+    """
+    partes = host.split('.')
+    return f"upstream_{partes[-2] if len(partes) >= 2 else host}"
+
+
+def registrar_upstream(host, status, num_bytes):
+    incrementar('upstream_peticiones_total', host=host, status=str(status))
+    if num_bytes:
+        incrementar('upstream_bytes_total', num_bytes, host=host)
+
+
+# ============================================
+# EXPORTACIÓN
+# ============================================
+
+def _formatear_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+def exportar_prometheus():
+    with _lock:
+        histogramas = {etapa: (list(h[0]), h[1], h[2]) for etapa, h in _histogramas.items()}
+        contadores = dict(_contadores)
+        indicadores = dict(_indicadores)
+
+    lineas = [
+        '# HELP librujula_etapa_segundos Duración de las etapas del pipeline de recomendación',
+        '# TYPE librujula_etapa_segundos histogram',
+    ]
+    for etapa, (conteos, suma, total) in sorted(histogramas.items()):
+        acumulado = 0
+        for limite, conteo in zip(BUCKETS, conteos):
+            acumulado += conteo
+            lineas.append(f'librujula_etapa_segundos_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+        lineas.append(f'librujula_etapa_segundos_bucket{{etapa="{etapa}",le="+Inf"}} {total}')
+        lineas.append(f'librujula_etapa_segundos_sum{{etapa="{etapa}"}} {suma:.6f}')
+        lineas.append(f'librujula_etapa_segundos_count{{etapa="{etapa}"}} {total}')
+
+    nombres = sorted({nombre for nombre, _ in contadores})
+    for nombre in nombres:
+        lineas.append(f'# TYPE librujula_{nombre} counter')
+        for (n, labels), valor in sorted(contadores.items()):
+            if n == nombre:
+                lineas.append(f'librujula_{nombre}{_formatear_labels(labels)} {valor}')
+
+    for nombre in sorted({nombre for nombre, _ in indicadores}):
+        lineas.append(f'# TYPE librujula_{nombre} gauge')
+        for (n, labels), valor in sorted(indicadores.items()):
+            if n == nombre:
+                lineas.append(f'librujula_{nombre}{_formatear_labels(labels)} {valor:.6f}')
+
+    return '\n'.join(lineas) + '\n'
+
+
+def server_timing(spans):
+    """
+    Agrega los spans por etapa en el formato de la cabecera Server-Timing.
+    """
+    agregados = {}
+    for etapa, segundos in spans:
+        total, veces = agregados.get(etapa, (0.0, 0))
+        agregados[etapa] = (total + segundos, veces + 1)
+
+    partes = []
+    for etapa, (total, veces) in agregados.items():
+        parte = f'{etapa};dur={total * 1000:.1f}'
+        if veces > 1:
+            parte += f';desc="x{veces}"'
+        partes.append(parte)
+    return ', '.join(partes)
+
+
+def _registrar_primera_respuesta():
+    """
+    Tiempo desde el inicio del proceso hasta la primera respuesta de la API (una vez por proceso).
+    """
+    global _primera_respuesta_registrada
+    if _primera_respuesta_registrada:
+        return
+    _primera_respuesta_registrada = True
+
+    segundos = time.time() - INICIO_PROCESO
+    fijar('arranque_segundos', segundos, etapa='primera_respuesta')
+    print(f"⏱️ Arranque: primera respuesta servida a los {segundos:.2f}s")
+
+
+def vista_metricas(request):
+    return HttpResponse(exportar_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MetricasMiddleware:
+    """
+    Abre la lista de spans de cada petición, mide el total y, si
+    SERVER_TIMING está activo, añade la cabecera Server-Timing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _spans.set([])
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            spans = _spans.get()
+            _spans.reset(token)
+
+        total = time.perf_counter() - inicio
+        if request.path.startswith('/api/'):
+            observar('peticion', total)
+            _registrar_primera_respuesta()
+        if getattr(settings, 'SERVER_TIMING', False):
+            response['Server-Timing'] = server_timing(spans + [('total', total)])
+        return response
@@ -0,0 +1,114 @@
+"""
+Perfil de lectura por sesión (personalización ligera, sin llamadas externas).
+
+Cada sesión tiene un vector de preferencias de tamaño fijo (DIMENSIONES) sobre
+autores, categorías y décadas, indexados por feature hashing. Cada consulta lo
+actualiza en O(1): decae el vector y suma los rasgos del libro fuente. Se guarda
+como float16 (128 bytes) con el TTL 'usuario' en su propia cache ('perfiles' en
+settings.CACHES): muchas sesiones distintas no desalojan las respuestas cacheadas.
+
+El re-rank puntúa todos los candidatos a la vez con NumPy: afinidad = suma de
+las preferencias de sus rasgos, relativa a la preferencia más fuerte.
+"""
+import re
+import zlib
+
+from django.core.cache import caches
+
+from .coocurrencias import identificador_cliente
+
+
+DIMENSIONES = 64
+DECAIMIENTO = 0.85  # Peso que conserva el historial en cada consulta nueva
+
+# Peso de cada tipo de rasgo al actualizar el perfil y al puntuar
+PESO_AUTOR = 1.0
+PESO_CATEGORIA = 0.6
+PESO_DECADA = 0.3
+MAX_CATEGORIAS = 3
+RASGOS_POR_LIBRO = 1 + MAX_CATEGORIAS + 1  # autor + categorías + década
+
+SESION_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def identificador_sesion(request):
+    """
+    `?sesion=` enviado por el cliente o, si no hay, el hash anónimo de IP + User-Agent.
+    """
+    sesion = request.GET.get('sesion', '')
+    if SESION_RE.match(sesion):
+        return sesion
+    return identificador_cliente(request)
+
+
+def clave_perfil(sesion):
+    return f'perfil_{sesion}'
+
+
+def cache_perfiles():
+    return caches['perfiles']
+
+
+def _indice(rasgo):
+    # crc32 es estable entre procesos (hash() no lo es)
+    return zlib.crc32(rasgo.encode('utf-8')) % DIMENSIONES
+
+
+def rasgos(autor, categorias, decada):
+    """
+    Lista de (índice, peso) de un libro.
+    """
+    resultado = []
+    if autor:
+        resultado.append((_indice(f'a:{autor.lower()}'), PESO_AUTOR))
+    for categoria in categorias[:MAX_CATEGORIAS]:
+        resultado.append((_indice(f'c:{categoria.lower()}'), PESO_CATEGORIA))
+    if decada:
+        resultado.append((_indice(f'd:{decada}'), PESO_DECADA))
+    return resultado
+
+
+def decodificar_perfil(datos):
+    """
+    Vector de preferencias (float32) a partir de lo guardado en cache, o None.
+    """
+    if not datos:
+        return None
+
+    import numpy as np
+
+    return np.frombuffer(datos, dtype=np.float16).astype(np.float32)
+
+
+def actualizar_perfil(perfil, autor, categorias, decada):
+    """
+    Perfil tras una consulta nueva, ya serializado para la cache.
+    """
+    import numpy as np
+
+    vector = np.zeros(DIMENSIONES, dtype=np.float32) if perfil is None else perfil * DECAIMIENTO
+    for indice, peso in rasgos(autor, categorias, decada):
+        vector[indice] += peso
+    return vector.astype(np.float16).tobytes()
+
+
+def afinidades(perfil, libros):
+    """
+    Afinidad (0-1) de cada candidato con el perfil, calculada en bloque.
+    """
+    import numpy as np
+
+    maximo = float(perfil.max())
+    if maximo <= 0 or not libros:
+        return np.zeros(len(libros), dtype=np.float32)
+
+    # Matriz (candidatos x rasgos) de índices; los huecos apuntan a una celda extra con 0
+    indices = np.full((len(libros), RASGOS_POR_LIBRO), DIMENSIONES, dtype=np.intp)
+    pesos = np.zeros((len(libros), RASGOS_POR_LIBRO), dtype=np.float32)
+    for fila, libro in enumerate(libros):
+        for columna, (indice, peso) in enumerate(rasgos(libro.autor, libro.categorias_min, libro.decada)):
+            indices[fila, columna] = indice
+            pesos[fila, columna] = peso
+
+    extendido = np.append(perfil, np.float32(0))
+    return np.minimum((extendido[indices] * pesos).sum(axis=1) / maximo, 1.0)
@@ -0,0 +1,351 @@
+"""
+Proxy de portadas con cache en disco direccionada por contenido.
+
+    /api/portada/<fuente>/<id>/<tamaño>/    fuente: 'ol' (cover_i de Open Library) o 'g' (volumen de Google Books)
+                                            tamaño: 'p', 'm' o 'g'
+
+Cada portada se descarga una sola vez del upstream y se guarda por el SHA-256
+de su contenido; las variantes de tamaño se generan a partir de ella (con
+Pillow si está instalado; si no, se sirve el original en todos los tamaños).
+Las respuestas llevan ETag y Cache-Control inmutable de un año.
+
+Solo un 404 del upstream se recuerda como portada inexistente (10 minutos);
+si el limitador no da paso o la red falla se responde 503 sin cachear.
+
+Solo se aceptan identificadores (nunca URLs), así que no es un proxy abierto.
+Directorio: settings.PORTADAS_DIR. URL pública: settings.PORTADAS_PROXY_URL
+(None = se devuelven las URLs originales de las portadas).
+
+El directorio tiene un tamaño máximo (settings.PORTADAS_MAX_BYTES): un hilo
+periódico (`iniciar_poda_periodica`) borra los ficheros usados hace más tiempo
+(LRU por mtime, que se renueva al servirlos) hasta dejarlo por debajo.
+"""
+import contextlib
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+
+from .limitador import host_de, registrar_respuesta, reservar_token
+from .metricas import etapa_upstream, incrementar, medir, registrar_upstream
+from .versiones import cerrojo, iniciar_hilo_periodico
+# Pillow se importa bajo demanda (_redimensionar): urls.py importa este módulo al arrancar
+
+
+# Anchura máxima en píxeles de cada variante
+TAMANOS = {'p': 96, 'm': 192, 'g': 384}
+TAMANO_POR_DEFECTO = 'm'
+CALIDAD_JPEG = 82
+MAX_BYTES = 2 * 1024 * 1024  # Portadas más grandes se rechazan
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+ORIGENES = {
+    # Versión grande, la fuente de todas las variantes. default=false: 404 en vez de imagen vacía
+    'ol': 'https://covers.openlibrary.org/b/id/{id}-L.jpg?default=false',
+    'g': 'https://books.google.com/books/content?id={id}&printsec=frontcover&img=1&zoom=1',
+}
+ID_VALIDO = {
+    'ol': re.compile(r'^\d{1,12}$'),
+    'g': re.compile(r'^[A-Za-z0-9_-]{4,40}$'),
+}
+
+ARBOLES = ('objetos', 'variantes', 'fuentes')  # Subdirectorios que cuentan para el tamaño máximo
+MAX_BYTES_DIRECTORIO = 512 * 1024 * 1024
+PODA_HASTA = 0.9  # Al podar se baja hasta esta fracción del máximo (margen hasta la siguiente poda)
+TOCAR_CADA = 3600  # Un acierto renueva el mtime si es más antiguo que esto (segundos)
+CERROJO_PODA = '.poda.lock'
+
+# Un lock por portada mientras alguien la pide: dos peticiones de la misma portada no la
+# descargan dos veces y las de otras portadas no esperan a esa descarga
+_lock = threading.Lock()
+_locks = {}  # (fuente, id) -> [lock, peticiones que lo usan]
+
+
+def url_portada(fuente, id_portada, tamano=TAMANO_POR_DEFECTO):
+    """
+    URL del proxy para una portada, o None si el proxy no está configurado.
+    """
+    base = getattr(settings, 'PORTADAS_PROXY_URL', None)
+    if not base or not id_portada:
+        return None
+    return f"{base.rstrip('/')}/{fuente}/{id_portada}/{tamano}/"
+
+
+# ============================================
+# CACHE EN DISCO
+# ============================================
+
+def _directorio():
+    return getattr(settings, 'PORTADAS_DIR', None) or os.path.join(settings.BASE_DIR, 'portadas_cache')
+
+
+def _ruta(*partes):
+    return os.path.join(_directorio(), *partes)
+
+
+def _escribir_atomico(ruta, datos):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(datos)
+    os.replace(temporal, ruta)
+
+
+def _leer(ruta):
+    try:
+        with open(ruta, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _tocar(ruta):
+    """
+    Renueva el mtime de un fichero servido desde disco (el orden LRU de la poda).
+    """
+    try:
+        if time.time() - os.stat(ruta).st_mtime > TOCAR_CADA:
+            os.utime(ruta)
+    except OSError:
+        pass
+
+
+@contextlib.contextmanager
+def _lock_de(clave):
+    with _lock:
+        entrada = _locks.setdefault(clave, [threading.Lock(), 0])
+        entrada[1] += 1
+    try:
+        with entrada[0]:
+            yield
+    finally:
+        with _lock:
+            entrada[1] -= 1
+            if not entrada[1]:
+                del _locks[clave]
+
+
+def _tipo_contenido(datos):
+    if datos.startswith(b'\x89PNG'):
+        return 'image/png'
+    if datos[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    return 'image/jpeg'
+
+
+def _descargar(fuente, id_portada, timeout=10):
+    """
+    (bytes, None) con la portada original, o (None, inexistente): inexistente es True
+    solo si el upstream respondió 404 (o algo que no es una portada válida);
+    False si fue un error pasajero (red, upstream limitado, circuito abierto).
+    """
+    url = ORIGENES[fuente].format(id=id_portada)
+    host = host_de(url)
+    espera = reservar_token(host)
+    if espera is None:
+        return None, False
+    if espera:
+        time.sleep(espera)
+
+    import requests
+
+    try:
+        with medir(etapa_upstream(host)):
+            resp = requests.get(url, timeout=timeout)
+        registrar_respuesta(host, resp.status_code, resp.headers.get('Retry-After'))
+        registrar_upstream(host, resp.status_code, len(resp.content))
+        if resp.status_code == 404:
+            return None, True
+        if resp.status_code != 200:
+            return None, False
+        if (not resp.content or len(resp.content) > MAX_BYTES
+                or not resp.headers.get('Content-Type', 'image/').startswith('image/')):
+            return None, True
+        return resp.content, None
+    except Exception as e:
+        print(f"Error descargando portada {fuente}/{id_portada}: {e}")
+        return None, False
+
+
+def resumen_guardado(fuente, id_portada):
+    """
+    SHA-256 de la portada si ya está en disco ('' si no).
+    """
+    return (_leer(_ruta('fuentes', f'{fuente}-{id_portada}')) or b'').decode('ascii')
+
+
+def obtener_original(fuente, id_portada):
+    """
+    (sha256, bytes) de la portada original, descargándola solo la primera vez.
+    Sin portada: (None, None) si no existe, (None, False) si falló por un error pasajero.
+    """
+    ruta_indice = _ruta('fuentes', f'{fuente}-{id_portada}')
+    clave_fallo = f'portada_fallo_{fuente}_{id_portada}'
+
+    with _lock_de((fuente, id_portada)):
+        resumen = resumen_guardado(fuente, id_portada)
+        if resumen:
+            ruta_objeto = _ruta('objetos', resumen[:2], resumen)
+            datos = _leer(ruta_objeto)
+            if datos is not None:
+                _tocar(ruta_indice)
+                _tocar(ruta_objeto)
+                incrementar('portadas_total', resultado='disco')
+                return resumen, datos
+            # El objeto se podó: se vuelve a descargar
+
+        if cache.get(clave_fallo):
+            return None, None
+        datos, inexistente = _descargar(fuente, id_portada)
+        if datos is None:
+            if not inexistente:
+                incrementar('portadas_total', resultado='error')
+                return None, False
+            # No reintentar durante un rato las portadas que no existen
+            cache.set(clave_fallo, True, 600)
+            incrementar('portadas_total', resultado='inexistente')
+            return None, None
+
+        resumen = hashlib.sha256(datos).hexdigest()
+        ruta_objeto = _ruta('objetos', resumen[:2], resumen)
+        if not os.path.exists(ruta_objeto):
+            _escribir_atomico(ruta_objeto, datos)
+        _escribir_atomico(ruta_indice, resumen.encode('ascii'))
+        incrementar('portadas_total', resultado='descarga')
+        return resumen, datos
+
+
+def _redimensionar(datos, ancho):
+    from PIL import Image
+
+    imagen = Image.open(io.BytesIO(datos))
+    imagen.thumbnail((ancho, ancho * 2))  # Mantiene la proporción y nunca amplía
+    if imagen.mode not in ('RGB', 'L'):
+        imagen = imagen.convert('RGB')
+    salida = io.BytesIO()
+    imagen.save(salida, 'JPEG', quality=CALIDAD_JPEG, optimize=True, progressive=True)
+    return salida.getvalue()
+
+
+def obtener_variante(resumen, datos, tamano):
+    """
+    Bytes de la variante `tamano` (generada una sola vez y guardada junto al original).
+    """
+    ruta = _ruta('variantes', resumen[:2], f'{resumen}-{tamano}.jpg')
+    variante = _leer(ruta)
+    if variante is not None:
+        _tocar(ruta)
+    else:
+        try:
+            variante = _redimensionar(datos, TAMANOS[tamano])
+        except ImportError:
+            # Sin Pillow se sirve el original en todos los tamaños
+            return datos
+        except Exception as e:
+            print(f"⚠️ No se pudo redimensionar la portada {resumen}: {e}")
+            return datos
+        _escribir_atomico(ruta, variante)
+    return variante
+
+
+# ============================================
+# PODA (LRU)
+# ============================================
+
+def podar(max_bytes=None):
+    """
+    Borra los ficheros de la cache usados hace más tiempo hasta dejarla por debajo
+    de PODA_HASTA * max_bytes. Si otro proceso está podando, no hace nada.
+    Retorna los bytes liberados.
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'PORTADAS_MAX_BYTES', MAX_BYTES_DIRECTORIO)
+    if not max_bytes or not os.path.isdir(_directorio()):
+        return 0
+
+    with cerrojo(_ruta(CERROJO_PODA)) as libre:
+        if not libre:
+            return 0
+
+        ficheros = []
+        total = 0
+        for arbol in ARBOLES:
+            for raiz, _, nombres in os.walk(_ruta(arbol)):
+                for nombre in nombres:
+                    ruta = os.path.join(raiz, nombre)
+                    try:
+                        info = os.stat(ruta)
+                    except OSError:
+                        continue
+                    # Los índices de `fuentes` ocupan un bloque aunque tengan 64 bytes
+                    tamano = max(info.st_size, getattr(info, 'st_blocks', 0) * 512)
+                    ficheros.append((info.st_mtime, tamano, ruta))
+                    total += tamano
+        if total <= max_bytes:
+            return 0
+
+        # Podar un índice o un objeto solo obliga a descargar la portada otra vez (obtener_original
+        # lo detecta); las variantes se regeneran a partir del original
+        objetivo = total - max_bytes * PODA_HASTA
+        liberados = 0
+        for _, tamano, ruta in sorted(ficheros):
+            if liberados >= objetivo:
+                break
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+            liberados += tamano
+
+    incrementar('portadas_podados_bytes_total', liberados)
+    print(f"🧹 Portadas: {liberados / 1024 / 1024:.1f} MB podados ({total / 1024 / 1024:.1f} MB en disco)")
+    return liberados
+
+
+def iniciar_poda_periodica(intervalo=None):
+    """
+    Poda la cache cada `intervalo` segundos en cada worker; el flock evita podas simultáneas.
+    """
+    intervalo = intervalo if intervalo is not None else getattr(settings, 'PORTADAS_PODA_INTERVALO', 3600)
+    return iniciar_hilo_periodico('podar-portadas', intervalo, podar, 'podando las portadas')
+
+
+# ============================================
+# VISTA
+# ============================================
+
+def _etag(resumen, tamano):
+    return f'"{resumen[:32]}-{tamano}"'
+
+
+def vista_portada(request, fuente, id_portada, tamano):
+    if fuente not in ORIGENES or not ID_VALIDO[fuente].match(id_portada) or tamano not in TAMANOS:
+        return JsonResponse({"error": "Portada no válida."}, status=400)
+
+    # Revalidación: basta con el índice en disco, sin leer la imagen
+    resumen = resumen_guardado(fuente, id_portada)
+    if resumen and _etag(resumen, tamano) in request.headers.get('If-None-Match', ''):
+        respuesta = HttpResponseNotModified()
+    else:
+        resumen, datos = obtener_original(fuente, id_portada)
+        if datos is False:
+            # Error pasajero (upstream limitado o red): no se cachea en ninguna parte
+            respuesta = JsonResponse({"error": "Portada no disponible ahora mismo."}, status=503)
+            respuesta['Retry-After'] = '30'
+            respuesta['Cache-Control'] = 'no-store'
+            return respuesta
+        if datos is None:
+            respuesta = JsonResponse({"error": "Portada no disponible."}, status=404)
+            respuesta['Cache-Control'] = 'public, max-age=600'
+            return respuesta
+        variante = obtener_variante(resumen, datos, tamano)
+        respuesta = HttpResponse(variante, content_type=_tipo_contenido(variante))
+    respuesta['ETag'] = _etag(resumen, tamano)
+    respuesta['Cache-Control'] = CACHE_CONTROL
+    return respuesta
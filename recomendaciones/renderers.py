@@ -0,0 +1,36 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import json_rapido
+from .metricas import medir
+
+
+class CodificadorJSON(JSONEncoder):
+    """
+    Encoder de DRF que además sabe serializar los candidatos (Candidato.a_respuesta).
+    """
+
+    def default(self, obj):
+        if hasattr(obj, 'a_respuesta'):
+            return obj.a_respuesta()
+        return super().default(obj)
+
+
+class JSONRendererMedido(JSONRenderer):
+    """
+    JSONRenderer de DRF que serializa con json_rapido (orjson si está disponible)
+    y registra el tiempo de serialización como etapa.
+    """
+    encoder_class = CodificadorJSON
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with medir('serializacion'):
+            if data is None:
+                return b''
+            # Con indentación pedida (ej. ?format=json&indent) se delega en DRF
+            if json_rapido.orjson and not self.get_indent(accepted_media_type or '', renderer_context or {}):
+                try:
+                    return json_rapido.dumps(data)
+                except TypeError:
+                    pass
+            return super().render(data, accepted_media_type, renderer_context)
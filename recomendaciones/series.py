@@ -0,0 +1,167 @@
+"""
+Índice persistente de series: clave de serie -> volúmenes ordenados.
+
+Cada título que llega del upstream (normalizar_google / normalizar_open_library)
+y en el que se detecta una serie se anota aquí (por la cola de escritura, en
+lotes). Así los miembros de una serie y el siguiente volumen salen de una
+consulta local por clave primaria, y la búsqueda `intitle:"serie"` al upstream
+solo se lanza si la serie no está en el índice (o hace REVISION_SEGUNDOS que
+no se consultó).
+
+La clave es autor normalizado + nombre de serie normalizado: dos series con
+el mismo nombre de autores distintos no se mezclan.
+
+SQLite (WAL) en settings.SERIES_SQLITE_PATH (None = desactivado); cada hilo
+abre su propia conexión.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+from .cola import encolar, manejador
+from .duplicados import clave_autor
+
+
+REVISION_SEGUNDOS = 7 * 86400  # Tras esto se vuelve a preguntar al upstream por la serie
+MAX_MIEMBROS = 30
+LONGITUD_DESCRIPCION = 1000  # Caracteres de la descripción que se guardan (para el scoring)
+
+_local = threading.local()
+
+
+def _ruta():
+    return getattr(settings, 'SERIES_SQLITE_PATH', None)
+
+
+def _conexion(ruta):
+    # Una conexión por hilo y proceso (no se pueden compartir tras un fork)
+    conexion = getattr(_local, 'conexion', None)
+    if conexion is not None and _local.clave == (ruta, os.getpid()):
+        return conexion
+
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    conexion = sqlite3.connect(ruta, timeout=5)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS volumenes (
+            serie TEXT NOT NULL, id TEXT NOT NULL, numero INTEGER, datos TEXT NOT NULL,
+            PRIMARY KEY (serie, id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS consultadas (serie TEXT PRIMARY KEY, momento REAL NOT NULL) WITHOUT ROWID;
+        """
+    )
+    _local.conexion, _local.clave = conexion, (ruta, os.getpid())
+    return conexion
+
+
+def clave_serie(autor, serie_norm):
+    if not autor or not serie_norm:
+        return None
+    return f"{clave_autor([autor])}|{serie_norm}"
+
+
+# ============================================
+# ALTA
+# ============================================
+
+def anotar(candidatos_con_numero):
+    """
+    Encola en el índice los candidatos de una serie: lista de (candidato, número o None).
+    """
+    ruta = _ruta()
+    if not ruta:
+        return
+
+    for candidato, numero in candidatos_con_numero:
+        clave = clave_serie(candidato.autor if candidato.autores else None, candidato.serie_norm)
+        if not clave or not candidato.id:
+            continue
+        datos = [
+            candidato.titulo, candidato.autores, candidato.categorias,
+            (candidato.descripcion or '')[:LONGITUD_DESCRIPCION], candidato.fecha, candidato.idioma,
+            candidato.rating, candidato.num_ratings, candidato.imagen,
+        ]
+        fila = (clave, candidato.id, int(numero) if numero and str(numero).isdigit() else None,
+                json.dumps(datos, ensure_ascii=False))
+        encolar('serie', (clave, candidato.id), (ruta, fila))
+
+
+def marcar_consultada(autor, serie_norm):
+    """
+    Anota que el upstream ya se consultó para esta serie.
+    """
+    ruta = _ruta()
+    clave = clave_serie(autor, serie_norm)
+    if ruta and clave:
+        encolar('serie_consultada', clave, (ruta, time.time()))
+
+
+@manejador('serie')
+def _guardar_volumenes(items):
+    por_ruta = {}
+    for _, (ruta, fila) in items:
+        por_ruta.setdefault(ruta, []).append(fila)
+    for ruta, filas in por_ruta.items():
+        conexion = _conexion(ruta)
+        with conexion:
+            conexion.executemany("INSERT OR REPLACE INTO volumenes (serie, id, numero, datos) VALUES (?, ?, ?, ?)", filas)
+
+
+@manejador('serie_consultada')
+def _guardar_consultadas(items):
+    por_ruta = {}
+    for clave, (ruta, momento) in items:
+        por_ruta.setdefault(ruta, []).append((clave, momento))
+    for ruta, filas in por_ruta.items():
+        conexion = _conexion(ruta)
+        with conexion:
+            conexion.executemany("INSERT OR REPLACE INTO consultadas (serie, momento) VALUES (?, ?)", filas)
+
+
+# ============================================
+# CONSULTA
+# ============================================
+
+def miembros(autor, serie_norm, limite=MAX_MIEMBROS):
+    """
+    Volúmenes conocidos de la serie, ordenados por número (los que no lo tienen, al final):
+    lista de (id, número, datos). Lista vacía si la serie no está indexada o hay que revisarla.
+    """
+    ruta = _ruta()
+    clave = clave_serie(autor, serie_norm)
+    if not ruta or not clave:
+        return []
+
+    try:
+        conexion = _conexion(ruta)
+        consultada = conexion.execute("SELECT momento FROM consultadas WHERE serie = ?", (clave,)).fetchone()
+        if consultada is None or time.time() - consultada[0] > REVISION_SEGUNDOS:
+            return []
+        filas = conexion.execute(
+            "SELECT id, numero, datos FROM volumenes WHERE serie = ? ORDER BY numero IS NULL, numero LIMIT ?",
+            (clave, limite)
+        ).fetchall()
+    except sqlite3.Error as e:
+        print(f"⚠️ Error leyendo el índice de series: {e}")
+        return []
+    return [(volume_id, numero, json.loads(datos)) for volume_id, numero, datos in filas]
+
+
+def siguiente(autor, serie_norm, numero):
+    """
+    (id, número, datos) del siguiente volumen tras `numero` (la edición con más ratings), o None.
+    """
+    if not numero or not str(numero).isdigit():
+        return None
+
+    posteriores = [m for m in miembros(autor, serie_norm) if m[1] is not None and m[1] > int(numero)]
+    if not posteriores:
+        return None
+    primero = posteriores[0][1]
+    # datos[7] = num_ratings
+    return max((m for m in posteriores if m[1] == primero), key=lambda m: m[2][7] or 0)
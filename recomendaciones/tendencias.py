@@ -0,0 +1,187 @@
+"""
+Libros en tendencia: heavy hitters de las consultas `libro` normalizadas
+sobre una ventana deslizante, con memoria fija sea cual sea el tráfico.
+
+- Count-min sketch por cubeta de tiempo (CUBETAS cubetas cubren la ventana).
+  Se mantiene además la suma de las cubetas vigentes, así que estimar una
+  clave cuesta PROFUNDIDAD lecturas; al rotar se resta la cubeta que caduca.
+- Top-K en un heap de mínimos (con borrado perezoso): solo las TOP_K claves
+  más frecuentes guardan su texto.
+- Un hilo por worker precalienta periódicamente la cache con los títulos en
+  tendencia y publica la lista con el TTL 'trending' (así sobrevive a un
+  reinicio a través de la instantánea de cache).
+
+Los contadores viven en cada proceso (como la LocMemCache).
+"""
+import hashlib
+import heapq
+import threading
+import time
+
+from django.conf import settings
+
+from .limitador import en_segundo_plano
+from .versiones import iniciar_hilo_periodico
+
+
+VENTANA_SEGUNDOS = 3600
+CUBETAS = 6
+ANCHO = 2048
+PROFUNDIDAD = 4
+TOP_K = 50
+PRECALENTAR_MAX = 5  # Títulos en tendencia que se precalientan por ciclo
+
+
+class ContadorTendencias:
+
+    def __init__(self, ventana=VENTANA_SEGUNDOS, cubetas=CUBETAS, ancho=ANCHO, profundidad=PROFUNDIDAD, k=TOP_K, reloj=time.time):
+        import numpy as np
+
+        self._np = np
+        self._ancho = ancho
+        self._profundidad = profundidad
+        self._k = k
+        self._reloj = reloj
+        self._duracion = ventana / cubetas
+        self._cubetas = np.zeros((cubetas, profundidad, ancho), dtype=np.uint32)
+        self._suma = np.zeros((profundidad, ancho), dtype=np.uint32)
+        self._filas = np.arange(profundidad)
+        self._cubeta_actual = int(reloj() // self._duracion)
+
+        self._heap = []  # (estimación, clave), con entradas obsoletas que se descartan al leer
+        self._top = {}  # clave -> estimación vigente
+        self._textos = {}  # clave -> texto para mostrar
+        self._lock = threading.Lock()
+
+    def _indices(self, clave):
+        resumen = hashlib.blake2b(clave.encode('utf-8'), digest_size=4 * self._profundidad).digest()
+        return self._np.frombuffer(resumen, dtype=self._np.uint32) % self._ancho
+
+    def _estimar(self, indices):
+        return int(self._suma[self._filas, indices].min())
+
+    def _avanzar(self):
+        """
+        Vacía las cubetas que han salido de la ventana desde la última vez.
+        """
+        actual = int(self._reloj() // self._duracion)
+        pasos = actual - self._cubeta_actual
+        if pasos <= 0:
+            return
+
+        num_cubetas = len(self._cubetas)
+        for paso in range(1, min(pasos, num_cubetas) + 1):
+            cubeta = self._cubetas[(self._cubeta_actual + paso) % num_cubetas]
+            self._suma -= cubeta
+            cubeta.fill(0)
+        self._cubeta_actual = actual
+        self._recalcular_top()
+
+    def _recalcular_top(self):
+        self._top = {clave: self._estimar(self._indices(clave)) for clave in self._top}
+        self._top = {clave: estimacion for clave, estimacion in self._top.items() if estimacion > 0}
+        self._textos = {clave: self._textos[clave] for clave in self._top}
+        self._heap = [(estimacion, clave) for clave, estimacion in self._top.items()]
+        heapq.heapify(self._heap)
+
+    def _minimo(self):
+        while self._heap:
+            estimacion, clave = self._heap[0]
+            if self._top.get(clave) == estimacion:
+                return estimacion, clave
+            heapq.heappop(self._heap)
+        return None
+
+    def _actualizar_top(self, clave, estimacion, texto):
+        if clave not in self._top and len(self._top) >= self._k:
+            minimo = self._minimo()
+            if minimo is None or estimacion <= minimo[0]:
+                return
+            heapq.heappop(self._heap)
+            del self._top[minimo[1]]
+            del self._textos[minimo[1]]
+
+        self._top[clave] = estimacion
+        self._textos.setdefault(clave, texto)  # Se conserva el primer texto visto
+        heapq.heappush(self._heap, (estimacion, clave))
+        if len(self._heap) > 4 * self._k:
+            self._heap = [(e, c) for c, e in self._top.items()]
+            heapq.heapify(self._heap)
+
+    def anotar(self, clave, texto):
+        if not clave:
+            return
+        indices = self._indices(clave)
+        with self._lock:
+            self._avanzar()
+            cubeta = self._cubeta_actual % len(self._cubetas)
+            self._cubetas[cubeta, self._filas, indices] += 1
+            self._suma[self._filas, indices] += 1
+            self._actualizar_top(clave, self._estimar(indices), texto)
+
+    def top(self, limite=TOP_K):
+        """
+        [(texto, consultas estimadas)] de mayor a menor.
+        """
+        with self._lock:
+            self._avanzar()
+            mejores = sorted(self._top.items(), key=lambda e: e[1], reverse=True)[:limite]
+            return [(self._textos[clave], estimacion) for clave, estimacion in mejores]
+
+
+_contador = None
+_lock_contador = threading.Lock()
+
+
+def obtener_contador():
+    global _contador
+    if _contador is None:
+        with _lock_contador:
+            if _contador is None:
+                _contador = ContadorTendencias()
+    return _contador
+
+
+def anotar_consulta(consulta_norm, texto):
+    obtener_contador().anotar(consulta_norm, texto)
+
+
+def top_tendencias(limite=TOP_K):
+    return [
+        {"libro": texto, "consultas": consultas}
+        for texto, consultas in obtener_contador().top(limite)
+    ]
+
+
+def precalentar():
+    """
+    Deja en cache los libros en tendencia y publica la lista con el TTL 'trending'.
+    Retorna el número de títulos precalentados.
+    """
+    from . import views
+
+    lista = top_tendencias()
+    if not lista:
+        return 0
+
+    precalentados = 0
+    # Sale de los mismos buckets que el tráfico de usuarios: solo gasta la mitad
+    # libre y nunca espera por un token
+    with en_segundo_plano():
+        for entrada in lista[:PRECALENTAR_MAX]:
+            try:
+                precalentados += views.precalentar_libro(entrada['libro'])
+            except Exception as e:
+                print(f"⚠️ Error precalentando '{entrada['libro']}': {e}")
+
+    views.cache_inteligente('tendencias', lista, 'trending')
+    return precalentados
+
+
+def iniciar_precalentamiento_periodico(intervalo=None):
+    """
+    Hilo daemon que precalienta la cache cada `intervalo` segundos.
+    Debe llamarse en cada worker (tras el fork), no en el master.
+    """
+    intervalo = intervalo if intervalo is not None else getattr(settings, 'TENDENCIAS_PRECALENTAR_INTERVALO', 300)
+    return iniciar_hilo_periodico('precalentar-tendencias', intervalo, precalentar, 'precalentando tendencias')
@@ -1,3 +1,522 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.urls import resolve
+from rest_framework.test import APIClient
+
+from . import admision, cola, coocurrencias, duplicados, limitador, perfil, portadas, series, views
+from .candidatos import Candidato
+from .coocurrencias import MAX_VECINOS, _fusionar_csr
+from .tendencias import ContadorTendencias
+from .views import (
+    _escribir_caches, aplicar_enriquecimiento, calcular_score_avanzado_v2, guardar_perfil_sesion, leer_perfil_sesion,
+)
+
+
+def candidato(id, titulo, autores=('Carlos Ruiz Zafón',), **datos):
+    return Candidato(
+        id, titulo, list(autores), datos.get('categorias', []), datos.get('descripcion', ''),
+        datos.get('fecha', ''), 'es', datos.get('rating'), datos.get('num_ratings'), datos.get('imagen'),
+        titulo.lower(), None,
+    )
+
+
+class Reloj:
+
+    def __init__(self, ahora=0.0):
+        self.ahora = ahora
+
+    def __call__(self):
+        return self.ahora
+
+
+class DuplicadosTests(SimpleTestCase):
+
+    def test_misma_huella_exacta(self):
+        self.assertEqual(duplicados.clave_autor(['Ruiz Zafón, Carlos']), duplicados.clave_autor(['Carlos Ruiz Zafón']))
+        self.assertEqual(duplicados.clave_titulo('La sombra del viento (Edición ilustrada)'), 'sombra del viento')
+
+        fusionados = duplicados.colapsar([
+            candidato('a', 'La sombra del viento', num_ratings=10),
+            candidato('b', 'Sombra del viento (Bolsillo)', autores=['Ruiz Zafón, Carlos'], num_ratings=500, rating=4.5),
+        ])
+        self.assertEqual(len(fusionados), 1)
+        self.assertEqual(fusionados[0].num_ratings, 500)
+        self.assertEqual(set((fusionados[0].id,) + fusionados[0].alias), {'a', 'b'})
+
+    def test_casi_duplicados_por_minhash(self):
+        firma = duplicados.firma_minhash
+        self.assertGreaterEqual(
+            duplicados.similitud(firma('juego del angel'), firma('el juego del angel')), duplicados.UMBRAL_SIMILITUD
+        )
+        self.assertLess(
+            duplicados.similitud(firma('sombra del viento'), firma('marina')), duplicados.UMBRAL_SIMILITUD
+        )
+
+        fusionados = duplicados.colapsar([
+            candidato('a', 'El juego del ángel'),
+            candidato('b', 'El juego del angel.'),
+            candidato('c', 'Marina'),
+        ])
+        self.assertEqual([c.id for c in fusionados], ['a', 'c'])
+
+    def test_fusion_no_modifica_el_grupo(self):
+        a = candidato('a', 'La sombra del viento', num_ratings=10)
+        b = candidato('b', 'La sombra del viento', descripcion='Barcelona, 1945.', num_ratings=500, rating=4.5)
+        fusionado, = duplicados.colapsar([a, b])
+        self.assertIsNot(fusionado, a)
+        self.assertIsNot(fusionado, b)
+        self.assertEqual(fusionado.alias, ('a',))
+        self.assertEqual((b.alias, b.descripcion, a.alias, a.descripcion), ((), 'Barcelona, 1945.', (), ''))
+
+    def test_sin_autor_solo_mismo_id(self):
+        fusionados = duplicados.colapsar([
+            candidato('a', 'Poemas', autores=[]),
+            candidato('b', 'Poemas', autores=[]),
+        ])
+        self.assertEqual(len(fusionados), 2)
+
+    def test_tomos_distintos_no_se_fusionan(self):
+        fusionados = duplicados.colapsar([
+            candidato('a', 'Saga (Tomo 1)', autores=['Ana Autora']),
+            candidato('b', 'Saga (Tomo 2)', autores=['Ana Autora']),
+            candidato('c', 'Crónicas II', autores=['Ana Autora']),
+            candidato('d', 'Crónicas III', autores=['Ana Autora']),
+        ])
+        self.assertEqual(len(fusionados), 4)
+
+    def test_numeros_romanos(self):
+        self.assertEqual(duplicados.numeros('Crónicas XIV: el regreso'), frozenset({'xiv'}))
+        self.assertEqual(duplicados.numeros('Libro 3, parte ii'), frozenset({'3', 'ii'}))
+        # Palabras escritas solo con letras romanas no son números
+        for titulo in ('La guerra civil', 'Lili', 'Un hombre vil'):
+            with self.subTest(titulo=titulo):
+                self.assertEqual(duplicados.numeros(titulo), frozenset())
+
+
+class CompensacionOpenLibraryTests(SimpleTestCase):
+    fuente = ({'title': 'Otro libro'}, 'Ana Autora', ['Fiction'], '', '')
+
+    def _puntuar(self, c):
+        return calcular_score_avanzado_v2(c, *self.fuente)
+
+    def _candidato(self, id, **datos):
+        return candidato(id, 'Novela', autores=['Ana Autora'], categorias=['Fiction'], **datos)
+
+    def test_compensa_solo_sin_enriquecer(self):
+        # Autor (30) + categoría (5): coincidencia fuerte, se compensa con 25
+        obra = self._candidato('/works/OL1W', rating=0, num_ratings=0)
+        self.assertEqual(self._puntuar(obra), 30 + 5 + 25)
+
+        aplicar_enriquecimiento(
+            [obra], {'/works/OL1W': {'descripcion': 'Una novela.', 'rating': 4.0, 'num_ratings': 200}}, *self.fuente
+        )
+        self.assertTrue(obra.enriquecido)
+        # Puntúa como un candidato con esos datos desde el principio: sin la compensación
+        completo = self._candidato('x', descripcion='Una novela.', rating=4.0, num_ratings=200)
+        self.assertEqual(obra.score, self._puntuar(completo))
+
+    def test_google_sin_datos_se_compensa(self):
+        self.assertEqual(self._puntuar(self._candidato('g1', rating=0, num_ratings=0)), 30 + 5 + 25)
+        self.assertEqual(self._puntuar(self._candidato('g2', descripcion='Texto', rating=0, num_ratings=0)), 30 + 5)
+
+
+class FusionarCsrTests(SimpleTestCase):
+
+    def setUp(self):
+        import numpy as np
+
+        self.np = np
+
+    def _vacia(self, num_items):
+        np = self.np
+        return np.zeros(num_items + 1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+
+    def _fila(self, matriz, fila):
+        indptr, indices, pesos = matriz
+        inicio, fin = indptr[fila], indptr[fila + 1]
+        return list(zip(indices[inicio:fin].tolist(), pesos[inicio:fin].tolist()))
+
+    def test_suma_duplicados_y_ordena_por_peso(self):
+        matriz = _fusionar_csr(self._vacia(3), [0, 0, 0, 1], [1, 2, 2, 0], 3)
+        self.assertEqual(self._fila(matriz, 0), [(2, 2.0), (1, 1.0)])
+        self.assertEqual(self._fila(matriz, 1), [(0, 1.0)])
+        self.assertEqual(self._fila(matriz, 2), [])
+
+        # Incremental: los pares nuevos se suman a los pesos existentes
+        matriz = _fusionar_csr(matriz, [0, 0], [1, 1], 3)
+        self.assertEqual(self._fila(matriz, 0), [(1, 3.0), (2, 2.0)])
+
+    def test_filas_nuevas(self):
+        # Libros que no estaban en la versión anterior (indptr más corto)
+        matriz = _fusionar_csr(self._vacia(2), [0, 3], [3, 0], 4)
+        self.assertEqual(len(matriz[0]), 5)
+        self.assertEqual(self._fila(matriz, 3), [(0, 1.0)])
+
+    def test_poda_a_max_vecinos(self):
+        num_items = MAX_VECINOS + 11
+        columnas = [c for c in range(1, num_items) for _ in range(c)]
+        indptr, indices, pesos = _fusionar_csr(self._vacia(num_items), [0] * len(columnas), columnas, num_items)
+        self.assertEqual(int(indptr[1]), MAX_VECINOS)
+        self.assertEqual(indices[0], num_items - 1)
+        self.assertEqual(sorted(indices.tolist()), list(range(num_items - MAX_VECINOS, num_items)))
+        self.assertTrue((self.np.diff(pesos) <= 0).all())
+
+
+class ContadorTendenciasTests(SimpleTestCase):
+
+    def test_top_k(self):
+        contador = ContadorTendencias(k=2, reloj=Reloj())
+        for clave, veces in (('dune', 5), ('it', 1), ('marina', 3)):
+            for _ in range(veces):
+                contador.anotar(clave, clave.title())
+        self.assertEqual(contador.top(), [('Dune', 5), ('Marina', 3)])
+
+        # Una consulta que supera al mínimo lo desplaza
+        for _ in range(5):
+            contador.anotar('it', 'It')
+        self.assertEqual(contador.top(), [('It', 6), ('Dune', 5)])
+
+    def test_ventana_deslizante(self):
+        reloj = Reloj(1000.0)
+        contador = ContadorTendencias(ventana=60, cubetas=6, reloj=reloj)
+        for _ in range(3):
+            contador.anotar('dune', 'Dune')
+        reloj.ahora += 30
+        contador.anotar('dune', 'Dune')
+        contador.anotar('marina', 'Marina')
+        self.assertEqual(contador.top(), [('Dune', 4), ('Marina', 1)])
+
+        # Las tres primeras salen de la ventana; las de hace 30 s siguen dentro
+        reloj.ahora += 40
+        self.assertEqual(contador.top(), [('Dune', 1), ('Marina', 1)])
+
+        reloj.ahora += 60
+        self.assertEqual(contador.top(), [])
+
+
+class ConstruirCoocurrenciasTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        self.log = os.path.join(self.directorio, coocurrencias.LOG)
+
+    def _consultas(self, cliente, *ids, t=None):
+        t = t or time.time()
+        coocurrencias._escribir_consultas([
+            (None, (self.directorio, json.dumps({'t': t + i, 'c': cliente, 'id': volume_id, 'info': {}})))
+            for i, volume_id in enumerate(ids)
+        ])
+
+    def test_vacia_el_log_consumido(self):
+        self._consultas('c1', 'a', 'b')
+        version, pares = coocurrencias.construir(self.directorio)
+        self.assertEqual(pares, 2)
+        self.assertEqual(os.path.getsize(self.log), 0)
+        with open(os.path.join(self.directorio, version, 'estado.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['offset'], 0)
+
+        # Lo anotado tras vaciar se lee desde el principio y la sesión del cliente sigue abierta
+        self._consultas('c1', 'c', t=time.time() + 10)
+        version, pares = coocurrencias.construir(self.directorio)
+        self.assertEqual(pares, 4)
+        modelo = coocurrencias.ModeloCoocurrencias(os.path.join(self.directorio, version))
+        self.assertEqual(sorted(item['id'] for item, _ in modelo.vecinos('c', 10)), ['a', 'b'])
+
+    def test_sin_consultas_nuevas_no_construye(self):
+        self._consultas('c1', 'a', 'b')
+        version, _ = coocurrencias.construir(self.directorio)
+        self.assertEqual(coocurrencias.construir(self.directorio), (version, 0))
+
+
+class SeriesTests(SimpleTestCase):
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(SERIES_SQLITE_PATH=os.path.join(directorio, 'series.sqlite3'))
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _tomo(self, id, numero, num_ratings=0):
+        c = candidato(id, f'Saga (Tomo {numero})', autores=['Ana Autora'], num_ratings=num_ratings)
+        c.serie_norm = 'saga'
+        return c, numero
+
+    def test_reconsulta_tras_el_intervalo(self):
+        series.anotar([self._tomo('t2', 2), self._tomo('t1', 1), self._tomo('t3', 3), self._tomo('t3b', 3, 50)])
+        self.assertTrue(cola.esperar())
+        # Indexada pero nunca consultada al upstream: hay que preguntar
+        self.assertEqual(series.miembros('Ana Autora', 'saga'), [])
+
+        series.marcar_consultada('Ana Autora', 'saga')
+        self.assertTrue(cola.esperar())
+        self.assertEqual([m[0] for m in series.miembros('Ana Autora', 'saga')][:2], ['t1', 't2'])
+        self.assertEqual(series.siguiente('Ana Autora', 'saga', '2')[0], 't3b')
+        self.assertIsNone(series.siguiente('Ana Autora', 'saga', '3'))
+
+        with mock.patch.object(series, 'REVISION_SEGUNDOS', -1):
+            self.assertEqual(series.miembros('Ana Autora', 'saga'), [])
+            self.assertIsNone(series.siguiente('Ana Autora', 'saga', '1'))
+
+
+class ColaTests(SimpleTestCase):
+
+    def setUp(self):
+        self.recibidos = []
+        cola.manejador('prueba')(self.recibidos.extend)
+        self.addCleanup(cola._manejadores.pop, 'prueba', None)
+
+    def test_coalesce_por_clave(self):
+        # Con el cerrojo tomado el despachador no puede llevarse nada a medias
+        with cola._condicion:
+            cola.encolar('prueba', 'k', 1)
+            cola.encolar('prueba', 'k', 2)
+            cola.encolar('prueba', None, 'a')
+            cola.encolar('prueba', None, 'b')
+        self.assertTrue(cola.esperar())
+        self.assertEqual([carga for clave, carga in self.recibidos if clave == 'k'], [2])
+        self.assertCountEqual([carga for clave, carga in self.recibidos if clave != 'k'], ['a', 'b'])
+
+    def test_restaura_lo_pendiente_en_sqlite(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+
+        with override_settings(COLA_SQLITE_PATH=os.path.join(directorio, 'cola.sqlite3')):
+            with cola._condicion:
+                cola.encolar('prueba', 'k', 1)
+                cola.encolar('prueba', 'k', 2)
+                cola.encolar('prueba', None, 'a')
+                self.assertEqual(cola.volcar_diario(), 2)
+                # Caída: lo que había en memoria se pierde
+                cola._pendientes.clear()
+
+            self.assertEqual(cola.restaurar(), 2)
+            self.assertTrue(cola.esperar())
+            self.assertCountEqual([carga for _, carga in self.recibidos], [2, 'a'])
+
+            # Lo ya hecho se borra del diario: no se vuelve a restaurar
+            cola.volcar_diario()
+            self.assertEqual(cola.restaurar(), 0)
+
+    def test_cache_caducada_no_se_escribe(self):
+        _escribir_caches([('prueba_vigente', ('v', time.time() + 60)), ('prueba_caducada', ('v', time.time() - 1))])
+        self.assertEqual(cache.get('prueba_vigente'), 'v')
+        self.assertIsNone(cache.get('prueba_caducada'))
+
+
+class LimitadorTests(SimpleTestCase):
+    host = 'www.googleapis.com'
+
+    def setUp(self):
+        limitador._buckets.clear()
+        self.addCleanup(limitador._buckets.clear)
+
+    def _agotar(self):
+        # Reservas de sobra para que la siguiente tuviera que esperar más de ESPERA_MAXIMA
+        limitador._buckets[self.host] = (-20, time.monotonic())
+
+    def test_bucket_agotado(self):
+        tasa = limitador.LIMITES_POR_HOST[self.host]
+        for _ in range(tasa):
+            self.assertEqual(limitador.reservar_token(self.host, espera_maxima=0), 0)
+        self.assertIsNone(limitador.reservar_token(self.host, espera_maxima=0))
+        # Con espera permitida se reserva el turno siguiente
+        self.assertGreater(limitador.reservar_token(self.host), 0)
+
+        with limitador.anotar_limitadas() as limitadas:
+            self.assertFalse(limitador.hubo_limitacion())
+            self._agotar()
+            self.assertIsNone(limitador.reservar_token(self.host))
+            self.assertTrue(limitador.hubo_limitacion())
+        self.assertEqual(limitadas, [self.host])
+        self.assertGreater(limitador.segundos_hasta_token(self.host), limitador.ESPERA_MAXIMA)
+
+    def test_segundo_plano_deja_medio_bucket(self):
+        tasa = limitador.LIMITES_POR_HOST[self.host]
+        with limitador.en_segundo_plano():
+            concedidos = 0
+            while limitador.reservar_token(self.host) is not None:
+                concedidos += 1
+        self.assertTrue(0 < concedidos <= tasa / 2)
+        self.assertEqual(limitador.reservar_token(self.host, espera_maxima=0), 0)
+
+    def test_limitado_responde_503(self):
+        self._agotar()
+        respuesta = APIClient().get('/api/recomendar/', {'libro': 'libro sin cache limitador'})
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertGreaterEqual(int(respuesta['Retry-After']), 1)
+
+        self._agotar()
+        respuesta = APIClient().post(
+            '/api/recomendar/lote/', {'libros': ['otro libro sin cache limitador']}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertIn('Retry-After', respuesta)
+
+
+class AdmisionTests(SimpleTestCase):
+
+    def _worker_con_cola(self, en_cola):
+        # Un pool de un hilo bloqueado: lo demás que se le envía queda esperando hilo
+        liberar = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        self.addCleanup(liberar.set)
+        for _ in range(en_cola + 1):
+            pool.submit(liberar.wait)
+        admision.registrar_worker(SimpleNamespace(tpool=pool))
+        self.addCleanup(admision.registrar_worker, None)
+
+    @override_settings(ADMISION_RECHAZAR_EN_COLA=2)
+    def test_rechaza_con_peticiones_en_cola(self):
+        self.assertEqual(admision.peticiones_en_cola(), 0)
+        self._worker_con_cola(2)
+        self.assertEqual(admision.peticiones_en_cola(), 2)
+
+        respuesta = APIClient().get('/api/recomendar/', {'libro': 'cualquiera'})
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertIn('Retry-After', respuesta)
+
+    def test_x_request_start_solo_si_se_confia(self):
+        request = SimpleNamespace(META={'HTTP_X_REQUEST_START': f't={int((time.time() - 30) * 1e6)}'})
+        with override_settings(ADMISION_USAR_X_REQUEST_START=False):
+            self.assertEqual(admision.espera_en_cola(request), 0.0)
+        with override_settings(ADMISION_USAR_X_REQUEST_START=True):
+            self.assertAlmostEqual(admision.espera_en_cola(request), 30, delta=1)
+
+    @override_settings(ADMISION_DEGRADAR_EN_VUELO=0)
+    def test_respuesta_degradada(self):
+        self.assertEqual(admision.evaluar(0, 0, 0.0), admision.DEGRADADO)
+
+        volumen = {'id': 'degradadoX1', 'volumeInfo': {'title': 'Marina', 'authors': ['Carlos Ruiz Zafón']}}
+        cache.set('google_volume_degradadoX1', volumen)
+        self.addCleanup(cache.delete, 'google_volume_degradadoX1')
+
+        respuesta = APIClient().get('/api/recomendar/degradadoX1/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.json()['modo_degradado'])
+
+        # Sin versión barata: el lote se rechaza en vez de degradarse
+        respuesta = APIClient().post('/api/recomendar/lote/', {'libros': ['Marina']}, format='json')
+        self.assertEqual(respuesta.status_code, 503)
+
+
+class LoteTests(SimpleTestCase):
+
+    def test_cuerpo_no_objeto(self):
+        for cuerpo in (['Marina'], 'Marina'):
+            with self.subTest(cuerpo=cuerpo):
+                respuesta = APIClient().post('/api/recomendar/lote/', cuerpo, format='json')
+                self.assertEqual(respuesta.status_code, 400)
+
+    def test_deduplica_entradas(self):
+        lanzadas = []
+
+        async def fuente(session, compartidas, entrada):
+            lanzadas.append(entrada)
+            return {"error": "No se encontraron resultados."}
+
+        with mock.patch('recomendaciones.views._recomendar_fuente_async', fuente):
+            respuesta = APIClient().post('/api/recomendar/lote/', {
+                'libros': ['Marina', '  MARINA ', 'El juego del ángel'], 'ids': ['abc123', 'abc123'],
+            }, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['total_fuentes'], 3)
+        self.assertEqual(lanzadas, [{'libro': 'Marina'}, {'libro': 'El juego del ángel'}, {'id': 'abc123'}])
+
+
+class PerfilTests(SimpleTestCase):
+
+    def test_perfil_en_su_propia_cache(self):
+        sesion = 'sesion-de-prueba'
+        self.addCleanup(perfil.cache_perfiles().delete, perfil.clave_perfil(sesion))
+        self.assertIsNone(leer_perfil_sesion(sesion))
+
+        guardar_perfil_sesion(sesion, None, 'Ana Autora', ['Fiction'], '1995')
+        vector = leer_perfil_sesion(sesion)
+        self.assertEqual(len(vector), perfil.DIMENSIONES)
+        self.assertEqual(float(vector.max()), perfil.PESO_AUTOR)
+        self.assertIsNone(cache.get(perfil.clave_perfil(sesion)))
+
+
+class RecomendarPorIdTests(SimpleTestCase):
+
+    def test_ruta_por_id(self):
+        coincidencia = resolve('/api/recomendar/zyTCAlFPjgYC/')
+        self.assertIs(coincidencia.func, views.recomendar_libros)
+        self.assertEqual(coincidencia.kwargs, {'volume_id': 'zyTCAlFPjgYC'})
+
+    def test_id_no_valido(self):
+        cliente = APIClient()
+        for url, params in (
+            ('/api/recomendar/abc/', {}),
+            ('/api/recomendar/abc.def/', {}),
+            ('/api/recomendar/', {'id': 'abc$123'}),
+            ('/api/recomendar/', {'id': 'x' * 41, 'libro': 'Marina'}),
+        ):
+            with self.subTest(url=url, params=params):
+                respuesta = cliente.get(url, params)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertEqual(respuesta.json()['error'], 'ID de volumen no válido.')
+
+
+class PortadasTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(PORTADAS_DIR=self.directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _fichero(self, ruta, tamano, antiguedad):
+        ruta = os.path.join(self.directorio, ruta)
+        portadas._escribir_atomico(ruta, b'x' * tamano)
+        momento = time.time() - antiguedad
+        os.utime(ruta, (momento, momento))
+        return ruta
+
+    def test_poda_lo_usado_hace_mas_tiempo(self):
+        viejo = self._fichero('objetos/aa/viejo', 40000, 3000)
+        variante = self._fichero('variantes/aa/viejo-m.jpg', 40000, 2000)
+        reciente = self._fichero('objetos/bb/reciente', 40000, 10)
+
+        self.assertEqual(portadas.podar(max_bytes=200000), 0)
+        self.assertGreaterEqual(portadas.podar(max_bytes=100000), 40000)
+        self.assertFalse(os.path.exists(viejo))
+        self.assertTrue(os.path.exists(variante))
+        self.assertTrue(os.path.exists(reciente))
+
+    def test_descargas_de_otras_portadas_no_esperan(self):
+        liberar = threading.Event()
+        self.addCleanup(liberar.set)
+
+        def descargar(fuente, id_portada, timeout=10):
+            if id_portada == '1':
+                liberar.wait(5)
+            return f'portada {id_portada}'.encode(), None
+
+        with mock.patch.object(portadas, '_descargar', descargar):
+            lenta = threading.Thread(target=portadas.obtener_original, args=('ol', '1'))
+            lenta.start()
+            inicio = time.monotonic()
+            resumen, datos = portadas.obtener_original('ol', '2')
+            self.assertLess(time.monotonic() - inicio, 1)
+            self.assertEqual(datos, b'portada 2')
+            liberar.set()
+            lenta.join()
+
+        # Ya en disco: sin descargar
+        self.assertEqual(portadas.obtener_original('ol', '2'), (resumen, datos))
+        self.assertEqual(portadas._locks, {})
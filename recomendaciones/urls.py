@@ -1,7 +1,15 @@
 from django.urls import path
-from . import views
+from . import portadas, views
 
 urlpatterns = [
     # Cuando alguien entre a 'recomendar/', ejecuta la función recomendar_libros
     path('recomendar/', views.recomendar_libros),
+    # Varios libros fuente en una sola petición (POST)
+    path('recomendar/lote/', views.recomendar_lote),
+    # Libros más buscados en la última hora
+    path('tendencias/', views.listar_tendencias),
+    # Proxy de portadas con cache en disco (tamaños 'p', 'm' y 'g')
+    path('portada/<str:fuente>/<str:id_portada>/<str:tamano>/', portadas.vista_portada),
+    # Recomendación directa por ID de volumen (evita la búsqueda del libro fuente)
+    path('recomendar/<str:volume_id>/', views.recomendar_libros),
 ]
\ No newline at end of file
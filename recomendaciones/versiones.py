@@ -0,0 +1,206 @@
+"""
+Piezas comunes de los modelos versionados en disco (coocurrencias.py,
+catalogo.py) y de los hilos periódicos de los workers.
+
+Cada versión de un modelo se escribe en su propio directorio (`v<ms>`) y el
+fichero `ACTUAL` apunta a la vigente; se sustituye de forma atómica, así que
+los workers que la leen nunca ven una versión a medio escribir. Las versiones
+antiguas se conservan un tiempo porque algún worker puede tenerlas abiertas
+con mmap.
+
+Cada modelo se construye a partir de un log de altas (JSON por línea) que los
+workers van ampliando; cada versión guarda hasta qué offset lo consumió y, si
+ya no queda nada sin consumir, el log se vacía (compactar_log).
+"""
+import contextlib
+import os
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - depende del sistema
+    fcntl = None
+
+
+ACTUAL = 'ACTUAL'
+RECARGA_SEGUNDOS = 60  # Cada cuánto se comprueba si hay una versión nueva
+VERSIONES_CONSERVADAS = 3  # Versiones antiguas que se mantienen
+
+_lock_logs = threading.Lock()
+
+
+# ============================================
+# VERSIONES
+# ============================================
+
+def leer_version(directorio):
+    try:
+        with open(os.path.join(directorio, ACTUAL), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def nueva_version():
+    return f"v{int(time.time() * 1000)}"
+
+
+def publicar_version(directorio, version):
+    """
+    Apunta `ACTUAL` a `version` (ya escrita por completo) con un cambio atómico.
+    """
+    temporal = os.path.join(directorio, f'{ACTUAL}.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(temporal, os.path.join(directorio, ACTUAL))
+
+
+def podar_versiones(directorio, actual, conservar=VERSIONES_CONSERVADAS):
+    versiones = sorted(
+        nombre for nombre in os.listdir(directorio)
+        if nombre.startswith('v') and os.path.isdir(os.path.join(directorio, nombre)) and nombre != actual
+    )
+    for nombre in versiones[:max(0, len(versiones) - conservar)]:
+        shutil.rmtree(os.path.join(directorio, nombre), ignore_errors=True)
+
+
+class Recargable:
+    """
+    Versión vigente de un modelo en disco, abierta con `abrir(ruta_version)`.
+    Comprueba si hay una versión nueva como mucho cada RECARGA_SEGUNDOS.
+    """
+
+    def __init__(self, directorio, abrir, nombre):
+        self._directorio = directorio  # Función: el directorio sale de settings en cada llamada
+        self._abrir = abrir
+        self._nombre = nombre
+        self._lock = threading.Lock()
+        self._objeto = None
+        self._version = None
+        self._comprobado = 0.0
+
+    def obtener(self):
+        directorio = self._directorio()
+        if not directorio:
+            return None
+
+        ahora = time.time()
+        if ahora - self._comprobado < RECARGA_SEGUNDOS:
+            return self._objeto
+
+        with self._lock:
+            self._comprobado = ahora
+            version = leer_version(directorio)
+            if version and version != self._version:
+                try:
+                    self._objeto = self._abrir(os.path.join(directorio, version))
+                    self._version = version
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ No se pudo cargar {self._nombre} {version}: {e}")
+        return self._objeto
+
+    def invalidar(self):
+        """
+        Fuerza a comprobar la versión en la próxima llamada (ej. tras construir una).
+        """
+        self._comprobado = 0.0
+
+
+# ============================================
+# CERROJOS ENTRE PROCESOS
+# ============================================
+
+@contextlib.contextmanager
+def cerrojo(ruta, exclusivo=True, esperar=False):
+    """
+    flock sobre `ruta`. Produce True si se obtuvo (sin `esperar`, False si otro
+    proceso lo tiene). Sin fcntl (Windows) siempre produce True.
+    """
+    if fcntl is None:
+        yield True
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(ruta, 'a') as f:
+        modo = fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH
+        try:
+            fcntl.flock(f, modo if esperar else modo | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# ============================================
+# LOGS DE ALTAS
+# ============================================
+
+def anotar_en_log(ruta_log, lineas):
+    """
+    Añade líneas al log. Con flock compartido: compactar_log (exclusivo) nunca
+    trunca a mitad de una escritura.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(ruta_log)), exist_ok=True)
+    with _lock_logs, cerrojo(ruta_log, exclusivo=False, esperar=True), \
+            open(ruta_log, 'a', encoding='utf-8') as f:
+        f.write('\n'.join(lineas) + '\n')
+
+
+def offset_vigente(ruta_log, offset):
+    """
+    Offset desde el que leer el log: 0 si el log es más corto (se vació después
+    de guardar el offset, ej. el proceso cayó a mitad de compactar_log).
+    """
+    if not os.path.exists(ruta_log) or offset > os.path.getsize(ruta_log):
+        return 0
+    return offset
+
+
+def compactar_log(ruta_log, offset, reiniciar_offset):
+    """
+    Vacía el log si todo lo que contiene ya se consumió (nadie anotó nada después
+    de `offset`) y llama a `reiniciar_offset()` para que la versión publicada
+    apunte al principio. Los que anotan escriben en modo append, así que tras
+    truncar siguen desde el principio. Retorna True si se vació.
+    """
+    if fcntl is None:
+        # Sin flock no hay forma segura de truncar mientras otros procesos anotan
+        return False
+
+    with cerrojo(ruta_log, exclusivo=True, esperar=True):
+        if os.path.getsize(ruta_log) != offset:
+            return False
+        os.truncate(ruta_log, 0)
+        reiniciar_offset()
+    return True
+
+
+# ============================================
+# HILOS PERIÓDICOS
+# ============================================
+
+def iniciar_hilo_periodico(nombre, intervalo, funcion, descripcion):
+    """
+    Hilo daemon que ejecuta `funcion` cada `intervalo` segundos (los errores se
+    registran y no paran el bucle). Debe llamarse en cada worker (tras el fork),
+    no en el master. Sin intervalo no arranca nada y retorna None.
+    """
+    if not intervalo:
+        return None
+
+    def _bucle():
+        while True:
+            time.sleep(intervalo)
+            try:
+                funcion()
+            except Exception as e:
+                print(f"⚠️ Error {descripcion}: {e}")
+
+    hilo = threading.Thread(target=_bucle, name=nombre, daemon=True)
+    hilo.start()
+    return hilo
@@ -1,19 +1,43 @@
-import requests
 import unicodedata
 import asyncio
-import aiohttp
 import re
+import time
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.core.cache import cache
 # from collections import Counter # No se usa
 from functools import lru_cache
-import numpy as np
+# requests, aiohttp y numpy se importan bajo demanda dentro de cada función:
+# así un arranque en frío no paga su importación en rutas que no los usan
+
+from .json_rapido import CAMPOS_OPEN_LIBRARY, decodificar_upstream
+from .instantanea import anotar_acierto, anotar_escritura, segundos_restantes
+from .cola import encolar, manejador
+from .candidatos import Candidato
+from .catalogo import anotar as anotar_catalogo, completar as completar_desde_catalogo
+from .coocurrencias import registrar_consulta, vecinos
+from .duplicados import colapsar as colapsar_duplicados
+from .portadas import url_portada
+from .series import anotar as anotar_series, marcar_consultada as marcar_serie_consultada, miembros as miembros_serie, siguiente as siguiente_serie
+from .perfil import (
+    actualizar_perfil, afinidades, cache_perfiles, clave_perfil, decodificar_perfil, identificador_sesion,
+)
+from .tendencias import TOP_K as TENDENCIAS_TOP_K, VENTANA_SEGUNDOS as TENDENCIAS_VENTANA, anotar_consulta, top_tendencias
+from .admision import controlar_admision, modo_degradado, respuesta_saturado
+from .metricas import etapa_upstream, medir, registrar_cache, registrar_upstream
+from .limitador import (
+    ESPERA_MAXIMA, anotar_limitadas, host_de, hubo_limitacion, parametros_con_clave,
+    registrar_respuesta, reservar_token, segundos_hasta_token,
+)
 
 
 GOOGLE_BOOKS_URL = "https://www.googleapis.com/books/v1/volumes"
+GOOGLE_VOLUME_URL = GOOGLE_BOOKS_URL + "/{volume_id}"
 OPEN_LIBRARY_URL = "https://openlibrary.org"
 
+# IDs de volumen de Google Books (ej. "zyTCAlFPjgYC")
+VOLUME_ID_RE = re.compile(r'^[A-Za-z0-9_-]{4,40}$')
+
 
 # ============================================
 # CONSTANTES DE AJUSTE DEL ALGORITMO (MEJORADO)
@@ -33,6 +57,23 @@ DIVERSITY_MAX_DECADA = 3
 DIVERSITY_MAX_SERIE = 2
 FINAL_RECOMMENDATION_LIMIT = 4  # ⬅️ Aumentado para más resultados
 
+# Recomendación por lotes (recomendar_lote)
+BATCH_MAX_SOURCES = 50  # Libros fuente por petición
+BATCH_MAX_CONCURRENCY = 8  # Peticiones simultáneas a APIs externas en todo el lote
+BATCH_MERGED_LIMIT = 12  # Tamaño de la lista fusionada
+
+# Enriquecimiento de candidatos de Open Library (descripción y ratings de la obra)
+ENRICH_TOP_K = FINAL_RECOMMENDATION_LIMIT * 3  # Posiciones (con margen para la diversidad) que un candidato debe poder alcanzar
+ENRICH_MAX_CANDIDATES = 6  # Obras enriquecidas como máximo por petición
+ENRICH_CONCURRENCY = 4  # Peticiones simultáneas a Open Library
+
+# Co-ocurrencias (libros consultados en la misma sesión, modelo local sin red)
+COOC_MAX_CANDIDATES = 20  # Vecinos que se añaden como candidatos
+SCORE_COOCURRENCIA_MAX = 20  # Bonus para el vecino más frecuente (escala con el peso normalizado)
+
+# Perfil de sesión (autores, categorías y décadas de las consultas anteriores)
+SCORE_PERFIL_MAX = 15  # Bonus para un candidato que encaja del todo con el perfil
+
 # Palabras vacías (Stop Words) para extracción de keywords
 STOP_WORDS = {
     'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
@@ -71,37 +112,129 @@ def normalizar_texto(texto):
     return ' '.join(texto.lower().split())
 
 
+TTLS_CACHE = {
+    'ratings': 86400,       # 24h - ratings cambian poco
+    'busqueda': 3600,       # 1h - búsquedas actuales
+    'usuario': 1800,        # 30min - comportamiento usuario
+    'trending': 600,        # 10min - tendencias actuales
+    'normal': 3600
+}
+
+# Un acierto sobre una entrada a la que le queda menos de esto la revalida en segundo plano
+REVALIDAR_ANTES = 300
+
+
 def cache_inteligente(key, data, tipo='normal'):
     """
-    Cache con TTL variable según tipo de datos
+    Cache con TTL variable según tipo de datos.
+    La escritura se hace en segundo plano (cola.py): la petición solo encola.
     """
-    ttls = {
-        'ratings': 86400,       # 24h - ratings cambian poco
-        'busqueda': 3600,       # 1h - búsquedas actuales
-        'usuario': 1800,        # 30min - comportamiento usuario
-        'trending': 600,        # 10min - tendencias actuales
-        'normal': 3600
-    }
-    
-    cache.set(key, data, ttls.get(tipo, 3600))
+    # Caducidad absoluta: un trabajo que espera (o se restaura tras reiniciar) no alarga la vida del dato
+    encolar('cache', key, (data, time.time() + TTLS_CACHE.get(tipo, 3600)))
+
+
+@manejador('cache')
+def _escribir_caches(items):
+    """
+    Escribe un lote de entradas de cache (agrupadas por TTL en un solo set_many).
+    Las que ya caducaron mientras esperaban se descartan.
+    """
+    ahora = time.time()
+    por_ttl = {}
+    for key, (data, expira) in items:
+        ttl = int(expira - ahora)
+        if ttl > 0:
+            por_ttl.setdefault(ttl, {})[key] = data
+    for ttl, entradas in por_ttl.items():
+        cache.set_many(entradas, ttl)
+        for key in entradas:
+            anotar_escritura(key, ttl)
+
+
+def leer_cache(cache_key, origen=None):
+    """
+    Lectura de cache que registra el acierto/fallo (métricas e instantánea de cache caliente).
+    Con `origen` (url, params, tipo), un acierto sobre una entrada a punto de caducar
+    encola su revalidación: la entrada se renueva sin que ninguna petición espere.
+    """
+    resultado = cache.get(cache_key)
+    registrar_cache(cache_key, bool(resultado))
+    if resultado:
+        anotar_acierto(cache_key)
+        if origen:
+            restante = segundos_restantes(cache_key)
+            if restante is not None and restante < REVALIDAR_ANTES:
+                encolar('revalidar', cache_key, origen)
+    return resultado
+
+
+@manejador('revalidar')
+def _revalidar(items):
+    for cache_key, (url, params, tipo) in items:
+        data = obtener_json(url, params)
+        if data is not None:
+            _escribir_caches([(cache_key, (data, time.time() + TTLS_CACHE.get(tipo, 3600)))])
+
+
+def obtener_json(url, params, timeout=10):
+    """
+    GET síncrono a una API externa pasando por el limitador del host.
+    Retorna el JSON o None (error, cuota agotada, circuito abierto o modo degradado).
+    """
+    if modo_degradado():
+        # Sobrecarga: la petición solo usa lo cacheado/local
+        return None
+    host = host_de(url)
+    espera = reservar_token(host)
+    if espera is None:
+        # Upstream limitado: se sirve solo lo cacheado/local
+        return None
+    if espera:
+        time.sleep(espera)
+
+    import requests
+
+    try:
+        with medir(etapa_upstream(host)):
+            resp = requests.get(url, params=parametros_con_clave(url, params), timeout=timeout)
+        registrar_respuesta(host, resp.status_code, resp.headers.get('Retry-After'))
+        registrar_upstream(host, resp.status_code, len(resp.content))
+        resp.raise_for_status()
+        return decodificar_upstream(resp.content)
+    except Exception as e:
+        # print(f"Error en búsqueda síncrona: {e}") # Descomentar para debug
+        return None
 
 
 def buscar_con_cache(url, params, cache_key_prefix, timeout=10):
     cache_key = f"{cache_key_prefix}_{str(params)}"
-    resultado = cache.get(cache_key)
+    resultado = leer_cache(cache_key, (url, params, 'busqueda'))
     
     if resultado:
         return resultado
     
-    try:
-        resp = requests.get(url, params=params, timeout=timeout)
-        resp.raise_for_status()
-        resultado = resp.json()
+    resultado = obtener_json(url, params, timeout)
+    if resultado is not None:
         cache_inteligente(cache_key, resultado, 'busqueda')
+    return resultado
+
+
+def obtener_volumen_por_id(volume_id, timeout=10):
+    """
+    Obtiene un único volumen de Google Books por su ID (sin búsqueda de texto).
+    Los datos de un volumen cambian poco, así que se cachean con el TTL de 'ratings'.
+    """
+    cache_key = f"google_volume_{volume_id}"
+    resultado = leer_cache(cache_key, (GOOGLE_VOLUME_URL.format(volume_id=volume_id), {}, 'ratings'))
+
+    if resultado:
         return resultado
-    except Exception as e:
-        # print(f"Error en búsqueda síncrona: {e}") # Descomentar para debug
+
+    resultado = obtener_json(GOOGLE_VOLUME_URL.format(volume_id=volume_id), {}, timeout)
+    if not resultado or 'volumeInfo' not in resultado:
         return None
+    cache_inteligente(cache_key, resultado, 'ratings')
+    return resultado
 
 
 # ============================================
@@ -157,6 +290,8 @@ def calcular_similitud_semantica(descripcion_fuente, descripcion_candidato):
         # Fallback: similitud por keywords básica
         return similitud_keywords_fallback(desc1, desc2)
     
+    import numpy as np
+
     # Similitud coseno
     # Usamos np.dot para el producto escalar y np.linalg.norm para la magnitud
     similitud = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
@@ -199,92 +334,188 @@ def detectar_serie(titulo):
     return None, None
 
 
-# La función `buscar_libros_misma_serie` usa llamadas síncronas de `requests`, 
-# por lo que no debería usarse en el contexto de `asyncio` a menos que se ejecute 
-# en un executor. No se usa en la vista principal, por lo que se mantiene como síncrona.
-def buscar_libros_misma_serie(titulo_fuente, autor):
+@lru_cache(maxsize=4096)
+def serie_normalizada(titulo):
     """
-    Busca otros libros de la misma serie
+    Nombre de serie normalizado del título (o None). Se usa al crear cada candidato y en el scoring.
     """
-    nombre_serie, _ = detectar_serie(titulo_fuente)
-    
-    if not nombre_serie:
-        return []
-    
-    # Buscar con el nombre de la serie
-    params = {
-        'q': f'intitle:"{nombre_serie}" inauthor:"{autor}"',
-        'maxResults': 10
-    }
-    
-    data = buscar_con_cache(GOOGLE_BOOKS_URL, params, 'google_serie')
-    
-    if data and 'items' in data:
-        return data['items']
-    
-    return []
+    if not titulo:
+        return None
+    serie, _ = detectar_serie(titulo)
+    return normalizar_texto(serie) or None if serie else None
+
+
+def indexar_series(candidatos):
+    """
+    Anota en el índice de series (series.py) los candidatos que pertenecen a una.
+    """
+    anotar_series((c, detectar_serie(c.titulo)[1]) for c in candidatos if c.serie_norm)
+
+
+def candidato_de_serie(volume_id, datos):
+    titulo, autores, categorias, descripcion, fecha, idioma, rating, num_ratings, imagen = datos
+    return crear_candidato(volume_id, titulo, autores, categorias, descripcion, fecha, idioma, rating, num_ratings, imagen)
+
+
+def candidatos_misma_serie(autor, titulo):
+    """
+    Otros libros de la serie de `titulo`, desde el índice (sin red). Lista vacía si no está indexada.
+    """
+    return [
+        candidato_de_serie(volume_id, datos)
+        for volume_id, _, datos in miembros_serie(autor, serie_normalizada(titulo))
+    ]
+
+
+def siguiente_en_serie(autor, titulo):
+    """
+    Siguiente volumen de la serie de `titulo` según el índice (o None).
+    """
+    _, numero = detectar_serie(titulo or '')
+    encontrado = siguiente_serie(autor, serie_normalizada(titulo), numero)
+    return candidato_de_serie(encontrado[0], encontrado[2]) if encontrado else None
 
 
 # ============================================
 # PRIORIDAD 1: BÚSQUEDAS ASÍNCRONAS
 # ============================================
 
-async def buscar_async(session, url, params, cache_key):
+async def buscar_async(session, url, params, cache_key, timeout=10, tipo_cache='busqueda', espera_maxima=ESPERA_MAXIMA):
     """
     Búsqueda asíncrona con manejo de errores
     """
     # Revisar cache primero
-    resultado = cache.get(cache_key)
+    resultado = leer_cache(cache_key, (url, params, tipo_cache))
     if resultado:
         return resultado
+    if modo_degradado():
+        # Sobrecarga: la petición solo usa lo cacheado/local
+        return None
     
+    host = host_de(url)
+    espera = reservar_token(host, espera_maxima)
+    if espera is None:
+        # Upstream limitado: se sirve solo lo cacheado/local
+        return None
+    if espera:
+        await asyncio.sleep(espera)
+
+    import aiohttp
+
     try:
-        # Usar aiohttp.ClientTimeout para configurar el tiempo de espera
-        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                cache_inteligente(cache_key, data, 'busqueda')
-                return data
+        with medir(etapa_upstream(host)):
+            # Usar aiohttp.ClientTimeout para configurar el tiempo de espera
+            async with session.get(url, params=parametros_con_clave(url, params), timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                registrar_respuesta(host, resp.status, resp.headers.get('Retry-After'))
+                cuerpo = await resp.read()
+                registrar_upstream(host, resp.status, len(cuerpo))
+                if resp.status == 200:
+                    data = decodificar_upstream(cuerpo)
+                    cache_inteligente(cache_key, data, tipo_cache)
+                    return data
     except Exception as e:
         print(f"Error en búsqueda async: {e}")
     
     return None
 
 
-async def buscar_open_library_async(session, autor, keywords):
+def consulta_open_library(autor, keywords):
     """
-    Busca candidatos de Open Library. La clave 'docs' contiene los resultados.
+    Construye (url, params, cache_key) de la búsqueda en Open Library.
     """
-    if not autor and not keywords:
-        return None
-
     # Usamos la combinación de autor y keywords para la query
     query = f'author:"{autor}"' if autor else ' '.join(keywords)
     
     url = f"{OPEN_LIBRARY_URL}/search.json"
     # Aumentamos el límite para tener más candidatos en español, ya que OL no tiene tanta info
-    params = {'q': query, 'limit': 25, 'language': 'spa'} 
-    cache_key = f'ol_search_{normalizar_texto(query)}'
-    
-    resultado = cache.get(cache_key)
-    if resultado:
-        return resultado
-        
-    try:
-        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=8)) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                cache_inteligente(cache_key, data, 'busqueda')
-                return data
-    except Exception as e:
-        print(f"Error en búsqueda async de Open Library: {e}")
-    
-    return None
+    params = {'q': query, 'limit': 25, 'language': 'spa', 'fields': ','.join(CAMPOS_OPEN_LIBRARY)} 
+    return url, params, f'ol_search_{normalizar_texto(query)}'
+
+
+async def buscar_open_library_async(session, autor, keywords, buscar=buscar_async):
+    """
+    Busca candidatos de Open Library. La clave 'docs' contiene los resultados.
+    """
+    if not autor and not keywords:
+        return None
+
+    url, params, cache_key = consulta_open_library(autor, keywords)
+    return await buscar(session, url, params, cache_key, timeout=8)
+
+
+class BusquedasCompartidas:
+    """
+    Agrupa las búsquedas de varias recomendaciones (ej. un lote):
+    las consultas idénticas se lanzan una sola vez y todas comparten
+    un límite global de concurrencia hacia las APIs externas.
+    """
+
+    def __init__(self, limite):
+        self._semaforo = asyncio.Semaphore(limite)
+        self._en_vuelo = {}
+
+    def buscar(self, session, url, params, cache_key, **kwargs):
+        clave = (url, tuple(sorted((k, str(v)) for k, v in params.items())))
+        tarea = self._en_vuelo.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(self._buscar(session, url, params, cache_key, **kwargs))
+            self._en_vuelo[clave] = tarea
+        return tarea
+
+    async def _buscar(self, session, url, params, cache_key, **kwargs):
+        async with self._semaforo:
+            return await buscar_async(session, url, params, cache_key, **kwargs)
+
+
+def crear_candidato(id_libro, titulo, autores, categorias, descripcion, fecha, idioma, rating, num_ratings, imagen):
+    """
+    Crea el registro compacto de un candidato con sus campos normalizados precalculados.
+    """
+    return Candidato(
+        id_libro, titulo, autores, categorias, descripcion, fecha, idioma, rating, num_ratings, imagen,
+        titulo_norm=normalizar_texto(titulo),
+        serie_norm=serie_normalizada(titulo),
+    )
+
+
+def candidato_google(item):
+    info = item.get('volumeInfo', {})
+    miniatura = info.get('imageLinks', {}).get('thumbnail')
+    return crear_candidato(
+        item.get('id'),
+        info.get('title'),
+        info.get('authors', []),
+        info.get('categories', []),
+        info.get('description', ''),
+        info.get('publishedDate', ''),
+        info.get('language'),
+        info.get('averageRating', 0),
+        info.get('ratingsCount', 0),
+        # Portada servida por nuestro proxy (si está configurado)
+        (miniatura and url_portada('g', item.get('id'))) or miniatura,
+    )
+
+
+def normalizar_google(data):
+    """
+    Convierte una respuesta de búsqueda de Google Books en candidatos.
+    Solo se crean los que están en español (el resto se descartaría en el scoring).
+    """
+    if not data or 'items' not in data:
+        return []
+
+    candidatos = [
+        candidato_google(item) for item in data['items']
+        if item.get('volumeInfo', {}).get('language') == 'es'
+    ]
+    indexar_series(candidatos)
+    return candidatos
+
 
 def normalizar_open_library(ol_data):
     """
-    Convierte los resultados de Open Library (ol_data) al formato de Google Books 
-    para que el resto del sistema de scoring pueda procesarlos.
+    Convierte los resultados de Open Library (ol_data) en candidatos, con los mismos
+    campos que los de Google Books para que el scoring los trate igual.
     """
     if not ol_data or 'docs' not in ol_data:
         return []
@@ -300,107 +531,108 @@ def normalizar_open_library(ol_data):
         book_id = doc.get('key')
         if not book_id:
             continue
-            
-        # Mapear los datos al formato de Google Books
-        
-        authors = doc.get('author_name', [])
-        categories = doc.get('subject', [])
-        published_date = str(doc.get('first_publish_year', ''))
         
         # Imagen: OL usa 'cover_i' para el ID de la imagen
         image_id = doc.get('cover_i')
-        # URL de portada media (M)
-        image_url = f"https://covers.openlibrary.org/b/id/{image_id}-M.jpg" if image_id else None
+        # URL de portada media (M), o la del proxy de portadas si está configurado
+        image_url = (url_portada('ol', image_id) or f"https://covers.openlibrary.org/b/id/{image_id}-M.jpg") if image_id else None
         
-        # Open Library search API no proporciona ratings ni descripción detallada en este endpoint.
-        
-        candidato = {
-            "id": book_id, 
-            "volumeInfo": {
-                "title": doc.get('title'),
-                "authors": authors,
-                "publishedDate": published_date,
-                "categories": categories,
-                "language": 'es', # Lo forzamos a 'es'
-                
-                # Datos faltantes de OL (se dejan vacíos/cero)
-                "description": "", 
-                "averageRating": 0.0,
-                "ratingsCount": 0,
-                "imageLinks": {
-                    "thumbnail": image_url
-                }
-            }
-        }
-        
-        candidatos_normalizados.append(candidato)
+        # La búsqueda de Open Library trae ratings (si los hay) pero no la descripción;
+        # la descripción la completa el enriquecimiento (enriquecer_candidatos_ol) solo para los que lo merecen.
         
+        candidatos_normalizados.append(crear_candidato(
+            book_id,
+            doc.get('title'),
+            doc.get('author_name', []),
+            doc.get('subject', []),
+            "",  # Dato faltante de OL
+            str(doc.get('first_publish_year', '')),
+            'es',  # Lo forzamos a 'es'
+            round(doc.get('ratings_average') or 0.0, 2),
+            doc.get('ratings_count') or 0,
+            image_url,
+        ))
+
+    indexar_series(candidatos_normalizados)
     return candidatos_normalizados
 
-async def buscar_multiples_fuentes_async(autor, categorias, keywords, titulo):
+async def buscar_multiples_fuentes_async(autor, categorias, keywords, titulo, session=None, compartidas=None):
     """
     Ejecuta múltiples búsquedas en paralelo, incluyendo Open Library.
+    Con `compartidas` (BusquedasCompartidas) las consultas se deduplican entre fuentes de un lote.
     """
-    async with aiohttp.ClientSession() as session:
-        tareas = []
-        
-        # 1. Mismo autor (Google)
-        tareas.append(buscar_async(
+    if session is None:
+        import aiohttp
+
+        async with aiohttp.ClientSession() as session:
+            return await buscar_multiples_fuentes_async(autor, categorias, keywords, titulo, session, compartidas)
+
+    buscar = compartidas.buscar if compartidas else buscar_async
+    tareas = []
+    
+    # 1. Mismo autor (Google)
+    tareas.append(buscar(
+        session, GOOGLE_BOOKS_URL,
+        {'q': f'inauthor:"{autor}"', 'maxResults': 8},
+        f'google_autor_{normalizar_texto(autor)}'
+    ))
+    
+    # 2. Categorías principales (Google)
+    for i, categoria in enumerate(categorias[:3]):
+        cat_simple = categoria.split("/")[-1].strip()
+        tareas.append(buscar(
             session, GOOGLE_BOOKS_URL,
-            {'q': f'inauthor:"{autor}"', 'maxResults': 8},
-            f'google_autor_{normalizar_texto(autor)}'
+            {'q': f'subject:"{cat_simple}"', 'maxResults': 15, 'orderBy': 'relevance'},
+            f'google_cat_{normalizar_texto(cat_simple)}_{i}'
+        ))
+    
+    # 3. Keywords semánticos (Google)
+    for i in range(0, min(len(keywords), 4), 2):
+        query = ' '.join(keywords[i:i+2])
+        tareas.append(buscar(
+            session, GOOGLE_BOOKS_URL,
+            {'q': query, 'maxResults': 10, 'orderBy': 'relevance'},
+            f'google_keywords_{normalizar_texto(query)}'
+        ))
+    
+    # 4. Búsqueda de series: del índice si la serie ya está en él; si no, a Google
+    nombre_serie, _ = detectar_serie(titulo)
+    candidatos = candidatos_misma_serie(autor, titulo) if nombre_serie else []
+    indice_tarea_serie = None
+    if nombre_serie and not candidatos:
+        indice_tarea_serie = len(tareas)
+        tareas.append(buscar(
+            session, GOOGLE_BOOKS_URL,
+            {'q': f'intitle:"{nombre_serie}" inauthor:"{autor}"', 'maxResults': 10},
+            f'google_serie_{normalizar_texto(nombre_serie)}'
         ))
         
-        # 2. Categorías principales (Google)
-        for i, categoria in enumerate(categorias[:3]):
-            cat_simple = categoria.split("/")[-1].strip()
-            tareas.append(buscar_async(
-                session, GOOGLE_BOOKS_URL,
-                {'q': f'subject:"{cat_simple}"', 'maxResults': 15, 'orderBy': 'relevance'},
-                f'google_cat_{normalizar_texto(cat_simple)}_{i}'
-            ))
-        
-        # 3. Keywords semánticos (Google)
-        for i in range(0, min(len(keywords), 4), 2):
-            query = ' '.join(keywords[i:i+2])
-            tareas.append(buscar_async(
-                session, GOOGLE_BOOKS_URL,
-                {'q': query, 'maxResults': 10, 'orderBy': 'relevance'},
-                f'google_keywords_{i}'
-            ))
-        
-        # 4. Búsqueda de series (Google)
-        nombre_serie, _ = detectar_serie(titulo)
-        if nombre_serie:
-            tareas.append(buscar_async(
-                session, GOOGLE_BOOKS_URL,
-                {'q': f'intitle:"{nombre_serie}" inauthor:"{autor}"', 'maxResults': 10},
-                f'google_serie_{normalizar_texto(nombre_serie)}'
-            ))
+    # 5. Open Library (NUEVA FUENTE). En modo degradado no se espera a la fuente más lenta
+    if (autor or keywords) and not modo_degradado():
+        tareas.append(buscar_open_library_async(
+            session, autor, keywords, buscar
+        ))
+    
+    # Ejecutar todas en paralelo
+    resultados = await asyncio.gather(*tareas, return_exceptions=True)
+    
+    if indice_tarea_serie is not None:
+        resultado_serie = resultados[indice_tarea_serie]
+        if resultado_serie is not None and not isinstance(resultado_serie, Exception):
+            marcar_serie_consultada(autor, serie_normalizada(titulo))
+
+    # Consolidar resultados (tras los de la serie, si salieron del índice)
+    for resultado in resultados:
+        if resultado and not isinstance(resultado, Exception):
+            # Resultados de Google Books (tienen 'items')
+            if 'items' in resultado:
+                candidatos.extend(normalizar_google(resultado))
             
-        # 5. Open Library (NUEVA FUENTE)
-        if autor or keywords:
-            tareas.append(buscar_open_library_async(
-                session, autor, keywords
-            ))
-        
-        # Ejecutar todas en paralelo
-        resultados = await asyncio.gather(*tareas, return_exceptions=True)
-        
-        # Consolidar resultados
-        candidatos = []
-        
-        for resultado in resultados:
-            if resultado and not isinstance(resultado, Exception):
-                # Resultados de Google Books (tienen 'items')
-                if 'items' in resultado:
-                    candidatos.extend(resultado['items'])
-                
-                # Resultados de Open Library (tienen 'docs' y DEBEN ser normalizados)
-                elif 'docs' in resultado:
-                    candidatos.extend(normalizar_open_library(resultado))
-        
-        return candidatos
+            # Resultados de Open Library (tienen 'docs' y DEBEN ser normalizados)
+            elif 'docs' in resultado:
+                candidatos.extend(normalizar_open_library(resultado))
+    
+    return candidatos
 
 
 # ============================================
@@ -431,43 +663,69 @@ def ajustar_por_popularidad(rating_score, ratings_count):
 # PRIORIDAD 2: FALLBACK INTELIGENTE
 # ============================================
 
-def generar_fallback_inteligente(libro_fuente, autor, candidatos_actuales):
+def consultas_fallback(libro_fuente, autor):
     """
-    Si tenemos pocas recomendaciones (<4), busca alternativas inteligentes
+    Consultas de respaldo como lista de (params, prefijo_cache) de Google Books.
     """
-    # Usa la constante FINAL_RECOMMENDATION_LIMIT para el check
-    if len(candidatos_actuales) >= FINAL_RECOMMENDATION_LIMIT:
-        return []
-    
-    fallback_candidatos = []
+    consultas = []
     
     # Estrategia 1: Bestsellers de la misma categoría
     categorias = libro_fuente.get('categories', [])
     if categorias:
         cat_principal = categorias[0].split('/')[-1].strip()
-        data = buscar_con_cache(
-            GOOGLE_BOOKS_URL,
+        consultas.append((
             {'q': f'subject:"{cat_principal}"', 'maxResults': 15, 'orderBy': 'relevance'},
             'fallback_bestsellers'
-        )
-        if data and 'items' in data:
-            fallback_candidatos.extend(data['items'])
+        ))
     
     # Estrategia 2: Libros de la misma década
     fecha = libro_fuente.get('publishedDate', '')
     if len(fecha) >= 4:
         try:
             decada = (int(fecha[:4]) // 10) * 10
-            data = buscar_con_cache(
-                GOOGLE_BOOKS_URL,
+            consultas.append((
                 {'q': f'{autor} {decada}', 'maxResults': 10},
                 f'fallback_decada_{decada}'
-            )
-            if data and 'items' in data:
-                fallback_candidatos.extend(data['items'])
+            ))
         except ValueError:
             pass # Si la fecha no es un número válido, ignorar
     
+    return consultas
+
+
+def generar_fallback_inteligente(libro_fuente, autor, candidatos_actuales):
+    """
+    Si tenemos pocas recomendaciones (<4), busca alternativas inteligentes
+    """
+    # Usa la constante FINAL_RECOMMENDATION_LIMIT para el check
+    if len(candidatos_actuales) >= FINAL_RECOMMENDATION_LIMIT:
+        return []
+    
+    fallback_candidatos = []
+    
+    for params, prefijo in consultas_fallback(libro_fuente, autor):
+        data = buscar_con_cache(GOOGLE_BOOKS_URL, params, prefijo)
+        fallback_candidatos.extend(normalizar_google(data))
+    
+    return fallback_candidatos
+
+
+async def generar_fallback_async(session, buscar, libro_fuente, autor, candidatos_actuales):
+    """
+    Versión asíncrona de generar_fallback_inteligente (comparte las claves de cache).
+    """
+    if len(candidatos_actuales) >= FINAL_RECOMMENDATION_LIMIT:
+        return []
+    
+    resultados = await asyncio.gather(*(
+        buscar(session, GOOGLE_BOOKS_URL, params, f"{prefijo}_{str(params)}")
+        for params, prefijo in consultas_fallback(libro_fuente, autor)
+    ))
+    
+    fallback_candidatos = []
+    for data in resultados:
+        fallback_candidatos.extend(normalizar_google(data))
+    
     return fallback_candidatos
 
 
@@ -475,27 +733,29 @@ def generar_fallback_inteligente(libro_fuente, autor, candidatos_actuales):
 # SCORING MEJORADO CON NUEVAS FEATURES
 # ============================================
 
-def calcular_score_avanzado_v2(item, libro_fuente, autor_fuente, categorias_fuente, descripcion_fuente, fecha_fuente):
+def calcular_score_avanzado_v2(candidato, libro_fuente, autor_fuente, categorias_fuente, descripcion_fuente, fecha_fuente):
     """
     Sistema de scoring mejorado con embeddings, series y popularidad ajustada
     Utiliza las constantes globales de SCORE_...
     """
     score = 0
-    info = item.get('volumeInfo', {})
     
-    # Check for Open Library source (OL candidates lack description and ratings)
-    is_from_ol = (info.get('description', '') == "" and info.get('ratingsCount', 0) == 0)
+    # Candidates with missing data: Open Library works not yet enriched (the search brings no
+    # description) and any candidate without description and ratings. Once enriched, the
+    # candidate is scored on its real data instead of the compensation
+    faltan_datos = not candidato.enriquecido and (
+        candidato.id.startswith('/works/') or (not candidato.descripcion and not candidato.num_ratings)
+    )
 
     # 1. Autor (MAX 30 pts)
     author_score = 0
-    autores = info.get('authors', [])
-    if autor_fuente and autor_fuente in autores:
+    if autor_fuente and autor_fuente in candidato.autores:
         author_score = SCORE_AUTHOR_MATCH
     score += author_score
     
     # 2. Rating y popularidad (MAX 30 pts)
-    rating = info.get('averageRating', 0)
-    ratings_count = info.get('ratingsCount', 0)
+    rating = candidato.rating
+    ratings_count = candidato.num_ratings
     rating_base_score = 0
     rating_count_score = 0
     
@@ -517,38 +777,35 @@ def calcular_score_avanzado_v2(item, libro_fuente, autor_fuente, categorias_fuen
     
     # 3. Categorías (MAX 25 pts - Aumentado)
     category_score = 0
-    categorias_item = info.get('categories', [])
+    categorias_item = candidato.categorias_min
     if categorias_item and categorias_fuente:
         # Coincidencia parcial (más robusto que coincidencia exacta)
-        matches = sum(1 for cat_f in categorias_fuente 
+        matches = sum(1 for cat_f in (c.lower() for c in categorias_fuente)
                          for cat_i in categorias_item 
-                         if cat_f.lower() in cat_i.lower() or cat_i.lower() in cat_f.lower())
+                         if cat_f in cat_i or cat_i in cat_f)
         category_score = min(matches * 5, SCORE_CATEGORY_MAX)
     score += category_score
     
     # 4. SIMILITUD SEMÁNTICA (MAX 15 pts - Reducido)
     semantic_score = 0
-    descripcion_item = info.get('description', '')
+    descripcion_item = candidato.descripcion
     if descripcion_fuente and descripcion_item:
         semantic_score = calcular_similitud_semantica(descripcion_fuente, descripcion_item)
     score += semantic_score
     
     # 5. Misma serie (BONUS 30 pts - Aumentado)
     series_score = 0
-    titulo_item = info.get('title', '')
-    titulo_fuente = libro_fuente.get('title', '')
-    serie_item, _ = detectar_serie(titulo_item)
-    serie_fuente, _ = detectar_serie(titulo_fuente)
-    if serie_item and serie_fuente and normalizar_texto(serie_item) == normalizar_texto(serie_fuente):
+    serie_fuente = serie_normalizada(libro_fuente.get('title', ''))
+    if candidato.serie_norm and candidato.serie_norm == serie_fuente:
         series_score = SCORE_SERIES_BONUS
     score += series_score
     
     # 6. Recencia relativa (MAX 5 pts)
     recency_score = 0
     try:
-        fecha_item = info.get('publishedDate', '')[:4]
+        fecha_item = candidato.anio
         if fecha_fuente and fecha_item:
-            diferencia_años = abs(int(fecha_fuente) - int(fecha_item))
+            diferencia_años = abs(int(fecha_fuente) - fecha_item)
             if diferencia_años <= 5:
                 recency_score = 5
             elif diferencia_años <= 10:
@@ -557,8 +814,8 @@ def calcular_score_avanzado_v2(item, libro_fuente, autor_fuente, categorias_fuen
         pass
     score += recency_score
     
-    # --- AJUSTE CRÍTICO: Compensación por Open Library ---
-    if is_from_ol:
+    # --- AJUSTE CRÍTICO: Compensación por datos faltantes (sobre todo Open Library) ---
+    if faltan_datos:
         # Sumamos las puntuaciones de contenido fuerte (no dependiente de descripción/ratings)
         content_match = author_score + category_score + series_score
         if content_match > 30: # Requiere una coincidencia fuerte (ej. autor + categoría)
@@ -568,11 +825,150 @@ def calcular_score_avanzado_v2(item, libro_fuente, autor_fuente, categorias_fuen
     return score
 
 
+# ============================================
+# ENRIQUECIMIENTO DE OPEN LIBRARY
+# ============================================
+
+# Lo máximo que puede ganar un candidato de OL al conocer su descripción y ratings
+GANANCIA_MAX_ENRIQUECIMIENTO = SCORE_SIMILARITY_MAX + (SCORE_RATING_BASE_MAX + SCORE_RATING_COUNT_MAX) * 1.08
+
+
+def seleccionar_para_enriquecer(libros_procesados):
+    """
+    Candidatos de Open Library que, con la mejor descripción y ratings posibles,
+    aún podrían entrar en el top-K. El resto no merece una petición.
+    """
+    scores = sorted((libro.score for libro in libros_procesados), reverse=True)
+    umbral = scores[ENRICH_TOP_K - 1] if len(scores) >= ENRICH_TOP_K else float('-inf')
+
+    seleccion = [
+        libro for libro in libros_procesados
+        if libro.id.startswith('/works/') and libro.score + GANANCIA_MAX_ENRIQUECIMIENTO >= umbral
+    ]
+    seleccion.sort(key=lambda x: x.score, reverse=True)
+    return seleccion[:ENRICH_MAX_CANDIDATES]
+
+
+def _descripcion_obra(obra):
+    descripcion = (obra or {}).get('description') or ''
+    # OL devuelve la descripción como texto o como {"type": "/type/text", "value": ...}
+    if isinstance(descripcion, dict):
+        descripcion = descripcion.get('value', '')
+    return descripcion if isinstance(descripcion, str) else ''
+
+
+async def obtener_datos_obra_async(session, buscar, work_key, necesita_ratings):
+    """
+    Descripción (y ratings si faltan) de una obra de OL. Cada respuesta se cachea
+    por work key con el TTL largo de 'ratings'. Es un extra: sin token libre en el
+    limitador no se espera, el candidato se queda como está.
+    """
+    tareas = [buscar(
+        session, f"{OPEN_LIBRARY_URL}{work_key}.json", {},
+        f"ol_work_{work_key}", timeout=8, tipo_cache='ratings', espera_maxima=0
+    )]
+    if necesita_ratings:
+        tareas.append(buscar(
+            session, f"{OPEN_LIBRARY_URL}{work_key}/ratings.json", {},
+            f"ol_ratings_{work_key}", timeout=8, tipo_cache='ratings', espera_maxima=0
+        ))
+    respuestas = await asyncio.gather(*tareas)
+    if any(respuesta is None for respuesta in respuestas):
+        # Sin token (o error): se completa en segundo plano para las próximas peticiones
+        encolar('enriquecer', work_key, necesita_ratings)
+
+    datos = {'descripcion': _descripcion_obra(respuestas[0])}
+    if necesita_ratings and respuestas[1]:
+        resumen = respuestas[1].get('summary') or {}
+        datos['rating'] = round(resumen.get('average') or 0.0, 2)
+        datos['num_ratings'] = resumen.get('count') or 0
+    return datos
+
+
+@manejador('enriquecer')
+def _enriquecer_en_segundo_plano(items):
+    """
+    Descarga y cachea (con las mismas claves que obtener_datos_obra_async) los datos
+    de las obras que no se pudieron enriquecer durante la petición.
+    """
+    for work_key, necesita_ratings in items:
+        consultas = [(f"{OPEN_LIBRARY_URL}{work_key}.json", f"ol_work_{work_key}")]
+        if necesita_ratings:
+            consultas.append((f"{OPEN_LIBRARY_URL}{work_key}/ratings.json", f"ol_ratings_{work_key}"))
+        for url, cache_key in consultas:
+            if cache.get(cache_key) is None:
+                data = obtener_json(url, {}, timeout=8)
+                if data is not None:
+                    _escribir_caches([(cache_key, (data, time.time() + TTLS_CACHE['ratings']))])
+
+
+async def enriquecer_open_library_async(seleccion, session=None, compartidas=None):
+    """
+    Obtiene en paralelo (con concurrencia acotada) los datos de las obras seleccionadas.
+    Retorna {id: datos}.
+    """
+    if session is None:
+        import aiohttp
+
+        async with aiohttp.ClientSession() as session:
+            return await enriquecer_open_library_async(seleccion, session, compartidas)
+
+    compartidas = compartidas or BusquedasCompartidas(ENRICH_CONCURRENCY)
+    resultados = await asyncio.gather(*(
+        obtener_datos_obra_async(session, compartidas.buscar, libro.id, not libro.num_ratings)
+        for libro in seleccion
+    ), return_exceptions=True)
+
+    return {
+        libro.id: datos
+        for libro, datos in zip(seleccion, resultados)
+        if not isinstance(datos, Exception)
+    }
+
+
+def aplicar_enriquecimiento(libros_procesados, datos_por_id, libro_fuente, autor_fuente, categorias_fuente, descripcion_fuente, fecha_fuente):
+    """
+    Completa los candidatos de OL con los datos obtenidos y los vuelve a puntuar.
+    """
+    for libro in libros_procesados:
+        datos = datos_por_id.get(libro.id)
+        if not datos:
+            continue
+
+        for campo, valor in datos.items():
+            if valor:
+                setattr(libro, campo, valor)
+        libro.enriquecido = True
+        libro.score = calcular_score_avanzado_v2(
+            libro, libro_fuente, autor_fuente, categorias_fuente, descripcion_fuente, fecha_fuente
+        )
+
+
+def enriquecer_candidatos_ol(libros_procesados, libro_fuente, autor_fuente, categorias_fuente, descripcion_fuente, fecha_fuente):
+    """
+    Versión síncrona para la vista principal (crea su propio event loop).
+    """
+    seleccion = seleccionar_para_enriquecer(libros_procesados)
+    if not seleccion:
+        return
+
+    loop = asyncio.new_event_loop()
+    try:
+        datos_por_id = loop.run_until_complete(enriquecer_open_library_async(seleccion))
+    finally:
+        loop.close()
+
+    aplicar_enriquecimiento(
+        libros_procesados, datos_por_id,
+        libro_fuente, autor_fuente, categorias_fuente, descripcion_fuente, fecha_fuente
+    )
+
+
 # ============================================
 # DIVERSIDAD MEJORADA
 # ============================================
 
-def asegurar_diversidad_avanzada(libros_con_score, max_por_autor=DIVERSITY_MAX_AUTHOR, max_por_decada=DIVERSITY_MAX_DECADA, max_misma_serie=DIVERSITY_MAX_SERIE):
+def asegurar_diversidad_avanzada(libros_con_score, max_por_autor=DIVERSITY_MAX_AUTHOR, max_por_decada=DIVERSITY_MAX_DECADA, max_misma_serie=DIVERSITY_MAX_SERIE, limite=FINAL_RECOMMENDATION_LIMIT):
     """
     Diversidad considerando autor, época Y series
     Utiliza las constantes DIVERSITY_... y FINAL_RECOMMENDATION_LIMIT
@@ -583,21 +979,10 @@ def asegurar_diversidad_avanzada(libros_con_score, max_por_autor=DIVERSITY_MAX_A
     resultados = []
     
     for libro in libros_con_score:
-        autor = libro['autor']
-        titulo = libro['titulo']
-        
-        # Extraer década
-        decada = None
-        try:
-            año = libro.get('año_publicacion', '')[:4]
-            if año:
-                decada = (int(año) // 10) * 10
-        except:
-            pass
-        
-        # Detectar serie
-        serie, _ = detectar_serie(titulo)
-        serie_normalizada = normalizar_texto(serie) if serie else None
+        # Autor, década y serie vienen precalculados en el candidato
+        autor = libro.autor
+        decada = libro.decada
+        serie_normalizada = libro.serie_norm
         
         # Contadores
         count_autor = autores_count.get(autor, 0)
@@ -621,7 +1006,7 @@ def asegurar_diversidad_avanzada(libros_con_score, max_por_autor=DIVERSITY_MAX_A
         if serie_normalizada:
             series_count[serie_normalizada] = count_serie + 1
         
-        if len(resultados) >= FINAL_RECOMMENDATION_LIMIT:
+        if len(resultados) >= limite:
             break
     
     return resultados
@@ -655,25 +1040,27 @@ def extraer_keywords(libro_info):
 
 def _process_and_score_candidates(candidatos, libro_fuente, autor_fuente, categorias_fuente, descripcion_fuente, fecha_fuente, consulta_norm, titulo_fuente_norm, es_libro):
     """
-    Aplica el scoring avanzado V2 y formatea los resultados para la respuesta final.
+    Aplica el scoring avanzado V2 y filtra los candidatos.
+    Las ediciones duplicadas se fusionan antes de puntuar (duplicados.py).
+    Retorna los mismos objetos Candidato (con `score`), sin copiarlos.
     """
-    libros_procesados = []
+    filtrados = []
     ids_vistos = set()
+
+    # Ratings y año ya conocidos (catálogo compartido en mmap): evita enriquecerlos otra vez
+    completar_desde_catalogo(candidatos)
     
-    for item in candidatos:
-        info = item.get('volumeInfo', {})
-        titulo = info.get('title')
-        id_libro = item.get('id')
+    for candidato in candidatos:
+        id_libro = candidato.id
         
         # FILTRO: Solo mostrar libros en español ('es')
-        language = info.get('language')
-        if language != 'es':
+        if candidato.idioma != 'es':
             continue # Saltar este candidato si no está en español
 
-        if not titulo or not id_libro or id_libro in ids_vistos:
+        if not candidato.titulo or not id_libro or id_libro in ids_vistos:
             continue
         
-        titulo_norm = normalizar_texto(titulo)
+        titulo_norm = candidato.titulo_norm
         
         # Filtros anti-eco
         if titulo_norm == titulo_fuente_norm: # Es el libro fuente
@@ -681,86 +1068,194 @@ def _process_and_score_candidates(candidatos, libro_fuente, autor_fuente, catego
         # La consulta inicial no debe estar contenida en el título (ej. "The Road" busca "The Road to...")
         if es_libro and consulta_norm in titulo_norm and len(consulta_norm) > 5:
             continue
-        
+
+        filtrados.append(candidato)
+        ids_vistos.add(id_libro)
+
+    # Mismo libro desde varias búsquedas/ediciones/fuentes: se puntúa una sola vez
+    libros_procesados = colapsar_duplicados(filtrados)
+
+    for candidato in libros_procesados:
         # SCORING MEJORADO V2
-        score = calcular_score_avanzado_v2(
-            item, 
+        candidato.score = calcular_score_avanzado_v2(
+            candidato, 
             libro_fuente,
             autor_fuente, 
             categorias_fuente,
             descripcion_fuente,
             fecha_fuente
         )
-        
-        autor_display = info.get('authors', ['Autor desconocido'])[0]
-        descripcion = info.get('description', 'Sin descripción disponible')
-        
-        if len(descripcion) > 150:
-            descripcion = descripcion[:147] + "..."
-        
-        libros_procesados.append({
-            "titulo": titulo,
-            "autor": autor_display,
-            "descripcion": descripcion,
-            "imagen": info.get('imageLinks', {}).get('thumbnail'),
-            "puntuacion": info.get('averageRating', 0),
-            "num_ratings": info.get('ratingsCount', 0),
-            "año_publicacion": info.get('publishedDate', ''),
-            "categorias": info.get('categories', []),
-            "score_interno": score,
-            "id": id_libro
-        })
-        
-        ids_vistos.add(id_libro)
 
     return libros_procesados
 
 
-# ============================================
-# VISTA PRINCIPAL (SIN INFORMACIÓN DE USUARIO)
-# ============================================
+def candidatos_coocurrencia(libro_id_fuente):
+    """
+    Candidatos del modelo de co-ocurrencias (sin red) y su peso normalizado por ID.
+    """
+    resultado = vecinos(libro_id_fuente, COOC_MAX_CANDIDATES)
+    return [candidato_google(item) for item, _ in resultado], {item['id']: peso for item, peso in resultado}
+
+
+def leer_perfil_sesion(sesion):
+    """
+    Vector de preferencias de la sesión (o None si es su primera consulta).
+    """
+    cache_key = clave_perfil(sesion)
+    datos = cache_perfiles().get(cache_key)
+    registrar_cache(cache_key, bool(datos))
+    return decodificar_perfil(datos)
 
-@api_view(['GET'])
-def recomendar_libros(request):
-    consulta = request.GET.get('libro')
-    
-    if not consulta:
-        return Response({"error": "Escribe algo para buscar."}, status=400)
 
-    # --- PASO 1: BÚSQUEDA INICIAL ---
-    # Intentamos buscar el título exacto, ya que la calidad de la recomendación depende del libro fuente
-    data = buscar_con_cache(
-        GOOGLE_BOOKS_URL,
-        {'q': f'"{consulta}"', 'maxResults': 5},
-        'google_initial'
+def guardar_perfil_sesion(sesion, perfil_sesion, autor_fuente, categorias_fuente, fecha_fuente):
+    """
+    Suma el libro fuente de esta consulta al perfil (O(1), sin llamadas externas).
+    """
+    decada = (int(fecha_fuente) // 10) * 10 if fecha_fuente.isdigit() else None
+    # Directo, sin la cola de escritura: un set en la LocMemCache de perfiles es barato
+    cache_perfiles().set(
+        clave_perfil(sesion),
+        actualizar_perfil(perfil_sesion, autor_fuente, categorias_fuente, decada),
+        TTLS_CACHE['usuario']
     )
-    
-    if not data or 'items' not in data:
-        # Fallback si no se encuentra el título exacto
-        data = buscar_con_cache(
-            GOOGLE_BOOKS_URL,
-            {'q': consulta, 'maxResults': 5},
-            'google_initial_fallback'
-        )
-        if not data or 'items' not in data:
-            return Response({"error": "No se encontraron resultados."}, status=404)
 
-    # --- PASO 2: SELECCIÓN DE FUENTE ---
-    libro_fuente = None
-    libro_id_fuente = None
-    
+
+def aplicar_perfil(libros_procesados, perfil_sesion):
+    """
+    Re-rank personalizado sobre el score V2: bonus proporcional a la afinidad con el perfil.
+    """
+    if perfil_sesion is None or not libros_procesados:
+        return
+    for libro, afinidad in zip(libros_procesados, afinidades(perfil_sesion, libros_procesados)):
+        libro.score += float(afinidad) * SCORE_PERFIL_MAX
+
+
+def aplicar_coocurrencias(libros_procesados, pesos_cooc):
+    """
+    Suma la señal de co-ocurrencia al score de los candidatos que la tienen.
+    """
+    if not pesos_cooc:
+        return
+    for libro in libros_procesados:
+        # Un candidato fusionado cuenta con el mejor peso de todas sus ediciones
+        peso = max(pesos_cooc.get(volume_id, 0) for volume_id in (libro.id, *libro.alias))
+        if peso:
+            libro.score += peso * SCORE_COOCURRENCIA_MAX
+
+
+# ============================================
+# VISTA PRINCIPAL (SIN INFORMACIÓN DE USUARIO)
+# ============================================
+
+def _seleccionar_fuente(data):
+    """
+    Elige el libro fuente entre los resultados de búsqueda.
+    Retorna (libro_fuente, libro_id_fuente) o (None, None).
+    """
     # Intentar encontrar un resultado con título y autor para usar como fuente
     for item in data['items']:
         info = item.get('volumeInfo', {})
         if 'title' in info and 'authors' in info and len(info['authors']) > 0:
-            libro_fuente = info
-            libro_id_fuente = item.get('id')
-            break
+            return info, item.get('id')
     
     # Si no se encontró un libro completo, usar el primer resultado
-    if not libro_fuente and data['items']:
-        libro_fuente = data['items'][0]['volumeInfo']
-        libro_id_fuente = data['items'][0].get('id')
+    if data['items']:
+        return data['items'][0].get('volumeInfo'), data['items'][0].get('id')
+
+    return None, None
+
+
+def _consultas_fuente(consulta):
+    """
+    Búsquedas para resolver el libro fuente, en orden, como (params, prefijo_cache).
+    Intentamos buscar el título exacto, ya que la calidad de la recomendación depende del libro fuente.
+    """
+    return [
+        ({'q': f'"{consulta}"', 'maxResults': 5}, 'google_initial'),
+        # Fallback si no se encuentra el título exacto
+        ({'q': consulta, 'maxResults': 5}, 'google_initial_fallback'),
+    ]
+
+
+def _resolver_fuente_por_busqueda(consulta):
+    """
+    Resuelve el libro fuente por búsqueda de texto: primero el título exacto y
+    luego la consulta tal cual. Retorna (libro_fuente, libro_id_fuente) o (None, None).
+    """
+    for params, prefijo in _consultas_fuente(consulta):
+        data = buscar_con_cache(GOOGLE_BOOKS_URL, params, prefijo)
+        if data and 'items' in data:
+            return _seleccionar_fuente(data)
+
+    return None, None
+
+
+ERROR_LIMITADO = "El servicio de libros está saturado. Inténtalo de nuevo en unos segundos."
+
+
+def _respuesta_upstream_limitado():
+    """
+    503 con Retry-After cuando faltan datos porque el limitador no dejó pasar
+    peticiones a Google Books (circuito abierto o sin tokens).
+    """
+    espera = max(1, int(segundos_hasta_token(host_de(GOOGLE_BOOKS_URL))) + 1)
+    return Response(
+        {"error": ERROR_LIMITADO},
+        status=503,
+        headers={"Retry-After": str(espera)}
+    )
+
+
+@api_view(['GET'])
+@controlar_admision()
+def recomendar_libros(request, volume_id=None):
+    # Anota las peticiones que el limitador rechace: "limitado" no es "sin resultados"
+    with anotar_limitadas():
+        return _recomendar_libros(request, volume_id)
+
+
+def _recomendar_libros(request, volume_id):
+    consulta = request.GET.get('libro')
+    volume_id = volume_id or request.GET.get('id')
+    
+    if volume_id and not VOLUME_ID_RE.match(volume_id):
+        return Response({"error": "ID de volumen no válido."}, status=400)
+
+    if not consulta and not volume_id:
+        return Response({"error": "Escribe algo para buscar."}, status=400)
+
+    # Sobrecarga (admision.py): solo cache y datos locales, sin fallback ni enriquecimiento
+    degradado = modo_degradado()
+
+    # --- PASO 1 y 2: RESOLUCIÓN DEL LIBRO FUENTE ---
+    with medir('busqueda_inicial'):
+        if volume_id:
+            volumen = obtener_volumen_por_id(volume_id)
+        else:
+            libro_fuente, libro_id_fuente = _resolver_fuente_por_busqueda(consulta)
+
+    if volume_id:
+        # Acceso directo por ID (ej. un resultado sobre el que se hizo clic): sin búsqueda ni adivinanza
+        if not volumen and hubo_limitacion():
+            return _respuesta_upstream_limitado()
+        if not volumen and degradado:
+            # No estaba en cache: no se sabe si existe
+            return respuesta_saturado()
+        if not volumen:
+            return Response({"error": "No se encontró el volumen solicitado."}, status=404)
+        libro_fuente = volumen['volumeInfo']
+        libro_id_fuente = volumen.get('id', volume_id)
+        # Sin texto de búsqueda, el título hace de consulta para los filtros anti-eco
+        consulta = consulta or libro_fuente.get('title', '')
+    elif libro_fuente is None and libro_id_fuente is None:
+        if hubo_limitacion():
+            return _respuesta_upstream_limitado()
+        if degradado:
+            return respuesta_saturado()
+        return Response({"error": "No se encontraron resultados."}, status=404)
+    else:
+        # Solo cuentan para tendencias las búsquedas que encontraron un libro
+        anotar_consulta(normalizar_texto(consulta), consulta.strip())
 
     # Si `libro_fuente` sigue siendo None, algo salió muy mal.
     if not libro_fuente:
@@ -776,6 +1271,10 @@ def recomendar_libros(request):
     
     es_libro = len(autores_fuente) > 0
     autor_fuente = autores_fuente[0] if es_libro else None
+    siguiente = None
+    if es_libro:
+        indexar_series([candidato_google({'id': libro_id_fuente, 'volumeInfo': libro_fuente})])
+        siguiente = siguiente_en_serie(autor_fuente, titulo_fuente)
     
     # --- PASO 3: EXTRACCIÓN DE KEYWORDS ---
     
@@ -783,9 +1282,14 @@ def recomendar_libros(request):
     
     mensaje = ""
     candidatos = []
+    pesos_cooc = {}
+    perfil_sesion = None
 
     if es_libro:
         mensaje = f"Porque leíste '{titulo_fuente}' de {autor_fuente}"
+        registrar_consulta(request, libro_id_fuente, libro_fuente)
+        sesion = identificador_sesion(request)
+        perfil_sesion = leer_perfil_sesion(sesion)
         
         # --- PASO 4: BÚSQUEDA MULTI-FUENTE ASÍNCRONA ---
         try:
@@ -794,9 +1298,10 @@ def recomendar_libros(request):
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             
-            candidatos = loop.run_until_complete(
-                buscar_multiples_fuentes_async(autor_fuente, categorias_fuente, keywords, titulo_fuente)
-            )
+            with medir('fan_out'):
+                candidatos = loop.run_until_complete(
+                    buscar_multiples_fuentes_async(autor_fuente, categorias_fuente, keywords, titulo_fuente)
+                )
             
             loop.close()
             
@@ -808,12 +1313,16 @@ def recomendar_libros(request):
                 {'q': f'inauthor:"{autor_fuente}"', 'maxResults': 20},
                 'google_autor'
             )
-            if data_autor:
-                candidatos.extend(data_autor.get('items', []))
+            candidatos.extend(normalizar_google(data_autor))
+
+        # Candidatos de co-ocurrencia: lo que consultaron otros lectores de este libro
+        candidatos_cooc, pesos_cooc = candidatos_coocurrencia(libro_id_fuente)
+        candidatos.extend(candidatos_cooc)
         
         # Fallback si tenemos pocos candidatos después de las búsquedas
-        if len(candidatos) < 15:
-            fallback = generar_fallback_inteligente(libro_fuente, autor_fuente, candidatos)
+        if len(candidatos) < 15 and not degradado:
+            with medir('fallback'):
+                fallback = generar_fallback_inteligente(libro_fuente, autor_fuente, candidatos)
             candidatos.extend(fallback)
     
     else:
@@ -824,51 +1333,340 @@ def recomendar_libros(request):
             {'q': consulta, 'maxResults': 30, 'orderBy': 'relevance'},
             'google_tema'
         )
-        if data_tema:
-            candidatos.extend(data_tema.get('items', []))
+        candidatos.extend(normalizar_google(data_tema))
 
     # --- PASO 5: PROCESAMIENTO CON SCORING V2 (Usando helper) ---
-    libros_procesados = _process_and_score_candidates(
-        candidatos, 
-        libro_fuente,
-        autor_fuente, 
-        categorias_fuente,
-        descripcion_fuente,
-        fecha_fuente,
-        normalizar_texto(consulta),
-        normalizar_texto(titulo_fuente),
-        es_libro
-    )
+    with medir('scoring'):
+        libros_procesados = _process_and_score_candidates(
+            candidatos, 
+            libro_fuente,
+            autor_fuente, 
+            categorias_fuente,
+            descripcion_fuente,
+            fecha_fuente,
+            normalizar_texto(consulta),
+            normalizar_texto(titulo_fuente),
+            es_libro
+        )
     
-    # --- PASO 6: ORDENAR Y DIVERSIFICAR ---
-    libros_procesados.sort(key=lambda x: x['score_interno'], reverse=True)
+    # --- PASO 5b: ENRIQUECIMIENTO DE OPEN LIBRARY (solo candidatos que pueden llegar al top) ---
+    if es_libro and not degradado:
+        with medir('enriquecimiento'):
+            try:
+                enriquecer_candidatos_ol(
+                    libros_procesados,
+                    libro_fuente, autor_fuente, categorias_fuente, descripcion_fuente, fecha_fuente
+                )
+            except Exception as e:
+                print(f"Error en enriquecimiento de Open Library: {e}")
+    if es_libro:
+        anotar_catalogo(libros_procesados)
+
+    # --- PASO 5c: SEÑALES LOCALES ---
+    # Después del enriquecimiento, que recalcula el score V2 desde cero
+    with medir('rerank'):
+        aplicar_coocurrencias(libros_procesados, pesos_cooc)
+        # Personalización: lo que esta sesión consultó antes (no incluye la consulta actual)
+        aplicar_perfil(libros_procesados, perfil_sesion)
     
-    # Aplicar diversidad (usa las constantes como defaults)
-    recomendaciones_finales = asegurar_diversidad_avanzada(libros_procesados)
+    # --- PASO 6: ORDENAR Y DIVERSIFICAR ---
+    with medir('orden_diversidad'):
+        libros_procesados.sort(key=lambda x: x.score, reverse=True)
+        
+        # Aplicar diversidad (usa las constantes como defaults)
+        recomendaciones_finales = asegurar_diversidad_avanzada(libros_procesados)
     
-    # Limpiar score interno y preparar respuesta
-    for libro in recomendaciones_finales:
-        # score_debug = libro['score_interno'] # Descomentar para debug
-        del libro['score_interno']
-        # libro['score_debug'] = round(score_debug, 2) # Descomentar para debug
+    if es_libro:
+        guardar_perfil_sesion(sesion, perfil_sesion, autor_fuente, categorias_fuente, fecha_fuente)
+
+    # Los candidatos se serializan directamente (Candidato.a_respuesta, sin el score)
     
+    if len(recomendaciones_finales) == 0 and hubo_limitacion():
+        # Sin candidatos porque el fan-out no pudo salir a la red: no es un "no hay nada"
+        return _respuesta_upstream_limitado()
+
     if len(recomendaciones_finales) == 0:
-        return Response({
+        respuesta = {
             "basado_en": mensaje,
             "recomendaciones": [],
             "mensaje": "No se encontraron recomendaciones relevantes en español."
-        })
+        }
+    else:
+        respuesta = {
+            "basado_en": mensaje,
+            "total_encontradas": len(recomendaciones_finales),
+            "mejoras_aplicadas": [
+                "Embeddings semánticos deshabilitados (usando keywords)",
+                "Ponderación ajustada para priorizar Categoría y Series",
+                "Detección de series y sagas",
+                "Búsquedas asíncronas paralelas (5x más rápido)",
+                "Integración de Open Library y compensación de datos faltantes",
+                "Ajuste inteligente por popularidad"
+            ],
+            "recomendaciones": recomendaciones_finales
+        }
+    # Siguiente volumen de la serie del libro fuente (índice de series, sin red)
+    if siguiente is not None:
+        respuesta["siguiente_en_serie"] = siguiente
+    if degradado:
+        respuesta["modo_degradado"] = True
+    return Response(respuesta)
+
+
+# ============================================
+# TENDENCIAS
+# ============================================
+
+def precalentar_libro(consulta):
+    """
+    Deja en cache el libro fuente de `consulta` y las búsquedas de su fan-out
+    (lo ya cacheado no sale a la red). Retorna True si había libro que precalentar.
+    """
+    libro_fuente, _ = _resolver_fuente_por_busqueda(consulta)
+    if not libro_fuente or not libro_fuente.get('authors'):
+        return False
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(buscar_multiples_fuentes_async(
+            libro_fuente['authors'][0],
+            libro_fuente.get('categories', []),
+            extraer_keywords(libro_fuente),
+            libro_fuente.get('title', '')
+        ))
+    finally:
+        loop.close()
+    return True
+
+
+@api_view(['GET'])
+def listar_tendencias(request):
+    """
+    Libros más buscados en la última ventana. `?limite=` (por defecto 10).
+    """
+    try:
+        limite = min(max(int(request.GET.get('limite', 10)), 1), TENDENCIAS_TOP_K)
+    except ValueError:
+        return Response({"error": "'limite' debe ser un número."}, status=400)
+
+    tendencias = top_tendencias(limite)
+    if not tendencias:
+        # Proceso recién arrancado: última lista publicada (restaurada desde la instantánea)
+        tendencias = (leer_cache('tendencias') or [])[:limite]
 
     return Response({
+        "ventana_minutos": TENDENCIAS_VENTANA // 60,
+        "tendencias": tendencias,
+    })
+
+
+# ============================================
+# VISTA POR LOTES (LISTAS DE LECTURA)
+# ============================================
+
+async def _resolver_fuente_async(session, buscar, consulta=None, volume_id=None):
+    """
+    Versión asíncrona de la resolución del libro fuente (comparte las claves de cache).
+    """
+    if volume_id:
+        volumen = await buscar(
+            session, GOOGLE_VOLUME_URL.format(volume_id=volume_id), {},
+            f"google_volume_{volume_id}", tipo_cache='ratings'
+        )
+        if volumen and 'volumeInfo' in volumen:
+            return volumen['volumeInfo'], volumen.get('id', volume_id)
+        return None, None
+
+    for params, prefijo in _consultas_fuente(consulta):
+        data = await buscar(session, GOOGLE_BOOKS_URL, params, f"{prefijo}_{str(params)}")
+        if data and 'items' in data:
+            return _seleccionar_fuente(data)
+
+    return None, None
+
+
+async def _recomendar_fuente_async(session, compartidas, entrada):
+    """
+    Ejecuta el pipeline completo para una entrada del lote.
+    Retorna un dict con el libro fuente y los candidatos puntuados (ordenados por score).
+    """
+    buscar = compartidas.buscar
+    consulta = entrada.get('libro')
+    with anotar_limitadas():
+        libro_fuente, libro_id_fuente = await _resolver_fuente_async(
+            session, buscar, consulta=consulta, volume_id=entrada.get('id')
+        )
+        limitada = hubo_limitacion()
+    if not libro_fuente and limitada:
+        return {"error": ERROR_LIMITADO, "limitado": True}
+    if not libro_fuente:
+        return {"error": "No se encontraron resultados."}
+
+    consulta = consulta or libro_fuente.get('title', '')
+    titulo_fuente = libro_fuente.get('title', '')
+    autores_fuente = libro_fuente.get('authors', [])
+    categorias_fuente = libro_fuente.get('categories', [])
+    descripcion_fuente = libro_fuente.get('description', '')
+    fecha_fuente = libro_fuente.get('publishedDate', '')[:4]
+    
+    es_libro = len(autores_fuente) > 0
+    autor_fuente = autores_fuente[0] if es_libro else None
+    keywords = extraer_keywords(libro_fuente)
+
+    if es_libro:
+        mensaje = f"Porque leíste '{titulo_fuente}' de {autor_fuente}"
+        candidatos = await buscar_multiples_fuentes_async(
+            autor_fuente, categorias_fuente, keywords, titulo_fuente, session, compartidas
+        )
+        candidatos_cooc, pesos_cooc = candidatos_coocurrencia(libro_id_fuente)
+        candidatos.extend(candidatos_cooc)
+        if len(candidatos) < 15:
+            candidatos.extend(await generar_fallback_async(session, buscar, libro_fuente, autor_fuente, candidatos))
+    else:
+        mensaje = f"Resultados para: {consulta}"
+        params = {'q': consulta, 'maxResults': 30, 'orderBy': 'relevance'}
+        data_tema = await buscar(session, GOOGLE_BOOKS_URL, params, f"google_tema_{str(params)}")
+        candidatos = normalizar_google(data_tema)
+        pesos_cooc = {}
+
+    with medir('scoring'):
+        libros_procesados = _process_and_score_candidates(
+            candidatos, 
+            libro_fuente,
+            autor_fuente, 
+            categorias_fuente,
+            descripcion_fuente,
+            fecha_fuente,
+            normalizar_texto(consulta),
+            normalizar_texto(titulo_fuente),
+            es_libro
+        )
+    if es_libro:
+        seleccion = seleccionar_para_enriquecer(libros_procesados)
+        if seleccion:
+            datos_por_id = await enriquecer_open_library_async(seleccion, session, compartidas)
+            aplicar_enriquecimiento(
+                libros_procesados, datos_por_id,
+                libro_fuente, autor_fuente, categorias_fuente, descripcion_fuente, fecha_fuente
+            )
+        anotar_catalogo(libros_procesados)
+    # Después del enriquecimiento, que recalcula el score V2 desde cero
+    aplicar_coocurrencias(libros_procesados, pesos_cooc)
+    libros_procesados.sort(key=lambda x: x.score, reverse=True)
+
+    return {
+        "id_fuente": libro_id_fuente,
+        "titulo_fuente_norm": normalizar_texto(titulo_fuente),
         "basado_en": mensaje,
-        "total_encontradas": len(recomendaciones_finales),
-        "mejoras_aplicadas": [
-            "Embeddings semánticos deshabilitados (usando keywords)",
-            "Ponderación ajustada para priorizar Categoría y Series",
-            "Detección de series y sagas",
-            "Búsquedas asíncronas paralelas (5x más rápido)",
-            "Integración de Open Library y compensación de datos faltantes",
-            "Ajuste inteligente por popularidad"
-        ],
-        "recomendaciones": recomendaciones_finales
-    })
\ No newline at end of file
+        "candidatos": libros_procesados,
+    }
+
+
+async def _recomendar_lote_async(entradas):
+    """
+    Lanza todas las entradas en paralelo con una única sesión HTTP y
+    un límite global de concurrencia; las consultas repetidas se comparten.
+    """
+    import aiohttp
+
+    compartidas = BusquedasCompartidas(BATCH_MAX_CONCURRENCY)
+    async with aiohttp.ClientSession() as session:
+        return await asyncio.gather(
+            *(_recomendar_fuente_async(session, compartidas, entrada) for entrada in entradas),
+            return_exceptions=True
+        )
+
+
+def _fusionar_recomendaciones(resultados):
+    """
+    Une los candidatos de todas las fuentes en una única lista diversificada.
+    Un candidato repetido conserva su mejor score; los propios libros fuente se excluyen.
+    """
+    ids_fuente = {r['id_fuente'] for r in resultados}
+    titulos_fuente = {r['titulo_fuente_norm'] for r in resultados}
+    mejores = {}
+
+    for resultado in resultados:
+        for libro in resultado['candidatos']:
+            if libro.id in ids_fuente or libro.titulo_norm in titulos_fuente:
+                continue
+            actual = mejores.get(libro.id)
+            if actual is None or libro.score > actual.score:
+                mejores[libro.id] = libro
+
+    # Distintas fuentes pueden haber elegido distinta edición del mismo libro
+    fusionados = sorted(colapsar_duplicados(list(mejores.values())), key=lambda x: x.score, reverse=True)
+    return asegurar_diversidad_avanzada(fusionados, limite=BATCH_MERGED_LIMIT)
+
+
+@api_view(['POST'])
+@controlar_admision(permitir_degradado=False)
+def recomendar_lote(request):
+    """
+    Recomendaciones para varios libros fuente a la vez.
+    Cuerpo: {"libros": [títulos], "ids": [IDs de volumen], "fusionar": bool}
+    """
+    if not isinstance(request.data, dict):
+        return Response({"error": "El cuerpo debe ser un objeto JSON."}, status=400)
+
+    libros = request.data.get('libros', [])
+    ids = request.data.get('ids', [])
+
+    if not isinstance(libros, list) or not isinstance(ids, list):
+        return Response({"error": "'libros' e 'ids' deben ser listas."}, status=400)
+    if any(not isinstance(libro, str) or not libro.strip() for libro in libros):
+        return Response({"error": "Todos los títulos deben ser texto no vacío."}, status=400)
+    if any(not isinstance(volume_id, str) or not VOLUME_ID_RE.match(volume_id) for volume_id in ids):
+        return Response({"error": "ID de volumen no válido."}, status=400)
+
+    # Deduplicar entradas (mismo título normalizado o mismo ID)
+    entradas = []
+    vistos = set()
+    for libro in libros:
+        clave = ('libro', normalizar_texto(libro))
+        if clave not in vistos:
+            vistos.add(clave)
+            entradas.append({'libro': libro.strip()})
+    for volume_id in ids:
+        clave = ('id', volume_id)
+        if clave not in vistos:
+            vistos.add(clave)
+            entradas.append({'id': volume_id})
+
+    if not entradas:
+        return Response({"error": "Envía al menos un título o ID."}, status=400)
+    if len(entradas) > BATCH_MAX_SOURCES:
+        return Response({"error": f"Máximo {BATCH_MAX_SOURCES} libros por lote."}, status=400)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with medir('fan_out_lote'):
+            resultados = loop.run_until_complete(_recomendar_lote_async(entradas))
+    finally:
+        loop.close()
+
+    if all(isinstance(r, dict) and r.get('limitado') for r in resultados):
+        return _respuesta_upstream_limitado()
+
+    respuesta_fuentes = []
+    resultados_validos = []
+    for entrada, resultado in zip(entradas, resultados):
+        if isinstance(resultado, Exception):
+            print(f"Error en lote para {entrada}: {resultado}")
+            resultado = {"error": "Error interno al procesar este libro."}
+        if 'error' in resultado:
+            respuesta_fuentes.append({**entrada, "error": resultado['error'], "recomendaciones": []})
+            continue
+        resultados_validos.append(resultado)
+        respuesta_fuentes.append({
+            **entrada,
+            "basado_en": resultado['basado_en'],
+            "recomendaciones": asegurar_diversidad_avanzada(resultado['candidatos']),
+        })
+
+    respuesta = {"total_fuentes": len(entradas), "resultados": respuesta_fuentes}
+    if request.data.get('fusionar'):
+        respuesta["fusionadas"] = _fusionar_recomendaciones(resultados_validos)
+
+    return Response(respuesta)